@@ -39,6 +39,10 @@ urlpatterns = [
     path('api/flights/', views.get_flights_for_airport, name='get_flights'),
     path('api/airports-in-radius/', views.airports_in_radius, name='airports_in_radius'), 
     path('api/flights-with-radius/',views.get_flights_with_radius,name='get_flights_with_radius'),# API для получения аэропортов в радиусе 
+    # Async-версии для ASGI
+    path('api/async/airport-autocomplete/', views.autocomplete_airports_async, name='airport_autocomplete_async'),
+    path('api/async/flights/', views.get_flights_for_airport_async, name='get_flights_async'),
+    path('api/async/flights-with-radius/', views.get_flights_with_radius_async, name='get_flights_with_radius_async'),
     path('api/', include('flights.urls')) 
 
    
@@ -0,0 +1,176 @@
+import bisect
+import heapq
+import itertools
+import re
+import unicodedata
+
+from .models import Airport
+from .spatial_index import INDEX_FIELDS
+from .versioning import AirportsVersionedValue
+
+# Поля, по которым ищет автодополнение
+SEARCH_FIELDS = ('name', 'city', 'country', 'icao_code', 'iata_code')
+
+_WORD_SPLIT = re.compile(r'[\s\-/(),.\']+')
+
+# Префикс, под который попадает больше MAX_MERGED_TOKENS слов, ищется не
+# слиянием их списков, а по заранее собранным первым PREFIX_TOP_POSITIONS
+# позициям: иначе "syn" на 70 тыс. аэропортов сливает тысячи списков
+MAX_MERGED_TOKENS = 32
+PREFIX_TOP_POSITIONS = 50
+
+
+# Нижний регистр без диакритики: "Zürich" -> "zurich"
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).casefold().strip()
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class AirportAutocompleteIndex:
+    """Индекс для автодополнения аэропортов.
+
+    Результаты ранжируются так: точное совпадение ICAO/IATA кода, затем
+    совпадение с началом слова в названии, городе, стране или коде, затем
+    вхождение подстроки (по триграммам, только для запросов от 3 символов).
+    Внутри группы - по названию.
+    """
+
+    def __init__(self, airports):
+        # Позиция в списке = место аэропорта при сортировке по названию,
+        # все списки позиций ниже заполняются по порядку и уже отсортированы
+        self._airports = sorted(airports, key=lambda a: a['name'])
+        self._codes = {}
+        self._texts = []
+        self._trigrams = {}
+        postings = {}
+
+        for position, airport in enumerate(self._airports):
+            fields = [normalize(airport[field]) for field in SEARCH_FIELDS]
+
+            for code in {fields[3], fields[4]} - {''}:
+                self._codes.setdefault(code, []).append(position)
+
+            # Отдельные слова полей; коды - тоже слова (поле из одного слова)
+            words = set()
+            for field in fields:
+                words.update(_WORD_SPLIT.split(field))
+            for word in words - {''}:
+                postings.setdefault(word, []).append(position)
+
+            # Поля разделены \x00, чтобы подстрока не склеивала соседние поля
+            text = '\x00'.join(fields)
+            self._texts.append(text)
+            for gram in trigrams(text):
+                self._trigrams.setdefault(gram, []).append(position)
+
+        self._token_keys = sorted(postings)
+        self._postings = [postings[token] for token in self._token_keys]
+        self._prefix_top = self._build_prefix_top()
+
+    def _token_range(self, prefix):
+        start = bisect.bisect_left(self._token_keys, prefix)
+        return start, bisect.bisect_left(self._token_keys, prefix + '\U0010ffff', lo=start)
+
+    def _merged(self, start, end):
+        # Позиции слов start..end по возрастанию, без повторов (у аэропорта
+        # может быть несколько слов с одним префиксом)
+        last = None
+        for position in heapq.merge(*self._postings[start:end]):
+            if position != last:
+                last = position
+                yield position
+
+    def _build_prefix_top(self):
+        """Первые PREFIX_TOP_POSITIONS позиций для префиксов, под которые
+        попадает больше MAX_MERGED_TOKENS слов.
+
+        Обход дерева префиксов по отсортированным словам: список префикса
+        собирается из уже готовых списков его продолжений на один символ,
+        поэтому каждое слово просматривается один раз на каждой длине.
+        """
+        top = {}
+
+        def collect(start, end, length):
+            if end - start <= MAX_MERGED_TOKENS:
+                return list(itertools.islice(self._merged(start, end), PREFIX_TOP_POSITIONS))
+            prefix = self._token_keys[start][:length]
+            lists = []
+            # Само слово, равное префиксу, идет в диапазоне первым
+            if len(self._token_keys[start]) == length:
+                lists.append(self._postings[start][:PREFIX_TOP_POSITIONS])
+                start += 1
+            while start < end:
+                char = self._token_keys[start][length]
+                child_end = start + 1
+                while child_end < end and self._token_keys[child_end][length] == char:
+                    child_end += 1
+                lists.append(collect(start, child_end, length + 1))
+                start = child_end
+            positions = []
+            for position in heapq.merge(*lists):
+                if not positions or position != positions[-1]:
+                    positions.append(position)
+                    if len(positions) == PREFIX_TOP_POSITIONS:
+                        break
+            if prefix:
+                top[prefix] = positions
+            return positions
+
+        if self._token_keys:
+            collect(0, len(self._token_keys), 0)
+        return top
+
+    def __len__(self):
+        return len(self._airports)
+
+    # Все функции поиска отдают позиции по возрастанию (т.е. по названию),
+    # поэтому search может остановиться, как только набрал limit результатов
+    def _code_matches(self, query):
+        return iter(self._codes.get(query, ()))
+
+    def _prefix_matches(self, query):
+        start, end = self._token_range(query)
+        top = self._prefix_top.get(query)
+        if top is None:
+            yield from self._merged(start, end)
+            return
+        yield from top
+        if len(top) == PREFIX_TOP_POSITIONS:
+            # Нужно больше, чем собрано заранее (большой limit) - полное слияние
+            yield from (position for position in self._merged(start, end) if position > top[-1])
+
+    def _substring_matches(self, query):
+        if len(query) < 3:
+            return iter(())
+        postings = [self._trigrams.get(gram, ()) for gram in trigrams(query)]
+        shortest = min(postings, key=len)
+        return (position for position in shortest if query in self._texts[position])
+
+    def search(self, query, limit=10):
+        query = normalize(query)
+        if not query:
+            return []
+
+        found = []
+        seen = set()
+        for matcher in (self._code_matches, self._prefix_matches, self._substring_matches):
+            for position in matcher(query):
+                if position in seen:
+                    continue
+                seen.add(position)
+                found.append(self._airports[position])
+                if len(found) >= limit:
+                    return found
+        return found
+
+
+_index = AirportsVersionedValue(lambda: AirportAutocompleteIndex(Airport.objects.values(*INDEX_FIELDS)))
+
+
+# Индекс строится при первом запросе и пересобирается при изменении аэропортов
+def get_autocomplete_index():
+    return _index.get()
@@ -0,0 +1,133 @@
+import math
+import statistics
+import time
+import tracemalloc
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Наборы данных по умолчанию: имя -> (аэропортов, рейсов)
+DATASET_SIZES = {
+    'small': (1000, 20000),
+    'medium': (10000, 200000),
+    'large': (100000, 1000000),
+}
+
+# Метрики, по которым ищутся регрессии. Для задержек и памяти хуже - больше,
+# для пропускной способности - меньше. p99 только записывается: на сотнях
+# запросов это одно-два значения, и сравнение по нему шумит
+HIGHER_IS_WORSE = ('p50_ms', 'p90_ms', 'peak_memory_kb')
+LOWER_IS_WORSE = ('rows_per_second',)
+
+# У импорта окон загрузки мало и их время зависит от планировщика потоков,
+# поэтому для него сравниваются только пропускная способность и память
+GATED_METRICS = {
+    'ingest': ('rows_per_second', 'peak_memory_kb'),
+}
+
+# Изменения задержки меньше этого, мс, считаются шумом даже при большом проценте
+MIN_LATENCY_DELTA_MS = 1.0
+
+
+def parse_sizes(value):
+    """'small,medium' или '5000:50000' (аэропорты:рейсы) -> {имя: (аэропорты, рейсы)}."""
+    sizes = {}
+    for name in value.split(','):
+        name = name.strip()
+        if name in DATASET_SIZES:
+            sizes[name] = DATASET_SIZES[name]
+        elif ':' in name:
+            airports, flights = name.split(':')
+            sizes[name] = (int(airports), int(flights))
+        elif name:
+            raise ValueError(f'Неизвестный размер набора: {name}')
+    return sizes
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(len(sorted_values) * fraction) - 1))]
+
+
+def summarize(times_ms, queries=None):
+    times = sorted(times_ms)
+    result = {
+        'requests': len(times),
+        'p50_ms': round(percentile(times, 0.5), 3),
+        'p90_ms': round(percentile(times, 0.9), 3),
+        'p99_ms': round(percentile(times, 0.99), 3),
+        'mean_ms': round(statistics.mean(times), 3) if times else 0.0,
+        'max_ms': round(times[-1], 3) if times else 0.0,
+    }
+    if queries is not None:
+        result['queries_mean'] = round(statistics.mean(queries), 2) if queries else 0.0
+        result['queries_max'] = max(queries, default=0)
+    return result
+
+
+def measure(call, cases, memory_cases=20):
+    """Задержки и число SQL-запросов call(case) по всем cases, затем пиковая
+    память на первых memory_cases отдельным проходом: tracemalloc замедляет
+    выполнение в разы и не должен попадать в задержки.
+
+    call возвращает True, если запрос успешен.
+    """
+    times = []
+    queries = []
+    errors = 0
+    for case in cases:
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            ok = call(case)
+            times.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+        errors += not ok
+
+    result = summarize(times, queries)
+    result['errors'] = errors
+    result['peak_memory_kb'] = peak_memory_kb(lambda: [call(case) for case in cases[:memory_cases]])
+    return result
+
+
+def peak_memory_kb(run):
+    tracemalloc.start()
+    try:
+        run()
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def compare(results, baseline, threshold):
+    """Регрессии results относительно baseline.
+
+    Задержки, память и пропускная способность сравниваются с допуском
+    threshold (доля, 0.2 = 20%), число SQL-запросов - точно: лишний запрос
+    на каждый вызов - регрессия при любом наборе. Наборы и бенчмарки, которых
+    нет в baseline, пропускаются. Возвращает список словарей с описанием.
+    """
+    regressions = []
+    for size, benchmarks in results.items():
+        for name, current in benchmarks.items():
+            base = baseline.get(size, {}).get(name)
+            if not base:
+                continue
+            for metric in GATED_METRICS.get(name, HIGHER_IS_WORSE + LOWER_IS_WORSE + ('queries_max',)):
+                if metric not in current or metric not in base:
+                    continue
+                old, new = base[metric], current[metric]
+                if metric == 'queries_max':
+                    worse = new > old
+                elif metric in HIGHER_IS_WORSE:
+                    worse = new > old * (1 + threshold)
+                    if metric.endswith('_ms'):
+                        worse = worse and new - old >= MIN_LATENCY_DELTA_MS
+                else:
+                    worse = new < old / (1 + threshold)
+                if worse:
+                    regressions.append({
+                        'size': size, 'benchmark': name, 'metric': metric, 'baseline': old, 'current': new,
+                        'change_percent': round((new - old) / old * 100, 1) if old else None,
+                    })
+    return regressions
@@ -0,0 +1,78 @@
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371  # радиус Земли в км
+
+
+# Вычисляет расстояние между двумя точками на Земле в км
+def haversine_distance(lat1, lon1, lat2, lon2):
+
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    delta_lat = math.radians(lat2 - lat1)
+    delta_lon = math.radians(lon2 - lon1)
+
+    a = (math.sin(delta_lat/2)**2 +
+         math.cos(lat1_rad) * math.cos(lat2_rad) *
+         math.sin(delta_lon/2)**2)
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+
+    return EARTH_RADIUS_KM * c
+
+
+# Прямоугольник широт/долгот, в который целиком попадает круг радиуса radius_km.
+# Возвращает (lat_min, lat_max, lon_ranges): если круг пересекает 180-й меридиан,
+# диапазонов долготы два, если накрывает полюс - берется вся долгота
+def bounding_box(lat, lon, radius_km):
+    angular = radius_km / EARTH_RADIUS_KM
+    delta_lat = math.degrees(angular)
+    lat_min = lat - delta_lat
+    lat_max = lat + delta_lat
+
+    if lat_min <= -90 or lat_max >= 90:
+        return max(lat_min, -90.0), min(lat_max, 90.0), [(-180.0, 180.0)]
+
+    delta_lon = math.degrees(math.asin(min(1.0, math.sin(angular) / math.cos(math.radians(lat)))))
+    lon_min = lon - delta_lon
+    lon_max = lon + delta_lon
+
+    if delta_lon >= 180:
+        return lat_min, lat_max, [(-180.0, 180.0)]
+    if lon_min < -180:
+        return lat_min, lat_max, [(lon_min + 360, 180.0), (-180.0, lon_max)]
+    if lon_max > 180:
+        return lat_min, lat_max, [(lon_min, 180.0), (-180.0, lon_max - 360)]
+    return lat_min, lat_max, [(lon_min, lon_max)]
+
+
+# Векторные версии haversine_distance на массивах NumPy.
+# Принимают числа, списки или массивы в градусах и поддерживают broadcasting
+
+# Поэлементное расстояние между (lat1[i], lon1[i]) и (lat2[i], lon2[i])
+def haversine_pairs(lat1, lon1, lat2, lon2):
+    lat1 = np.radians(np.asarray(lat1, dtype=np.float64))
+    lon1 = np.radians(np.asarray(lon1, dtype=np.float64))
+    lat2 = np.radians(np.asarray(lat2, dtype=np.float64))
+    lon2 = np.radians(np.asarray(lon2, dtype=np.float64))
+
+    a = (np.sin((lat2 - lat1) / 2)**2 +
+         np.cos(lat1) * np.cos(lat2) *
+         np.sin((lon2 - lon1) / 2)**2)
+    a = np.clip(a, 0.0, 1.0)
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+# Расстояния от одной точки до массива точек
+def haversine_many(lat, lon, latitudes, longitudes):
+    return haversine_pairs(lat, lon, latitudes, longitudes)
+
+
+# Матрица попарных расстояний n x n для набора точек
+def haversine_matrix(latitudes, longitudes):
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    return haversine_pairs(
+        latitudes[:, np.newaxis], longitudes[:, np.newaxis],
+        latitudes[np.newaxis, :], longitudes[np.newaxis, :]
+    )
@@ -0,0 +1,308 @@
+import logging
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from flights.distance import bounding_box, haversine_many
+from flights.management.opensky_service import STATE_FIELDS, OpenSkyService, RateLimited
+
+logger = logging.getLogger(__name__)
+
+# Как часто обновляется снимок состояний, сек
+LIVE_STATE_INTERVAL = 10
+
+# Сколько первый запрос ждет первого снимка, сек
+FIRST_SNAPSHOT_TIMEOUT = 15
+
+# Через сколько секунд без обращений к get() опрос останавливается
+LIVE_STATE_IDLE_TIMEOUT = 300
+
+# Предельная пауза между запросами после ошибок подряд, сек
+LIVE_STATE_MAX_BACKOFF = 600
+
+# Колонки снимка: поле -> тип массива. Строки хранятся байтами фиксированной
+# длины, измерения - float32 (None -> NaN), координаты - float64
+COLUMNS = {
+    'icao24': 'S6',
+    'callsign': 'S8',
+    'latitude': np.float64,
+    'longitude': np.float64,
+    'geo_altitude': np.float32,
+    'baro_altitude': np.float32,
+    'velocity': np.float32,
+    'true_track': np.float32,
+    'vertical_rate': np.float32,
+    'on_ground': np.bool_,
+    'time_position': np.int64,
+    'last_contact': np.int64,
+}
+
+
+class LiveStateSnapshot:
+    """Состояния всех самолетов на момент одного запроса /states/all.
+
+    Хранится по колонкам в массивах NumPy: фильтры по области, радиусу и
+    позывному считаются векторно, а словари собираются только для строк,
+    попавших в ответ. Страна хранится кодами в список countries.
+    Снимок не меняется после создания, поэтому читается из любых потоков
+    без блокировок; обновление - это замена ссылки на новый снимок.
+    """
+
+    def __init__(self, columns, countries, time_, fetched_at):
+        self.columns = columns
+        self.countries = countries
+        self.time = time_
+        self.fetched_at = fetched_at
+
+    @classmethod
+    def from_states(cls, states, time_=None, fetched_at=None):
+        positions = {field: i for i, field in enumerate(STATE_FIELDS)}
+        columns = {}
+        for field, dtype in COLUMNS.items():
+            i = positions[field]
+            if field == 'callsign':
+                values = [(state[i] or '').strip().upper().encode() for state in states]
+            elif dtype == 'S6':
+                values = [(state[i] or '').encode() for state in states]
+            elif dtype == np.int64:
+                values = [state[i] or 0 for state in states]
+            else:
+                values = [state[i] for state in states]
+            columns[field] = np.array(values, dtype=dtype)
+
+        countries, country_codes = np.unique(
+            np.array([state[positions['origin_country']] or '' for state in states], dtype=object).astype(str),
+            return_inverse=True
+        )
+        columns['origin_country'] = country_codes.astype(np.uint16)
+        return cls(columns, countries.tolist(), time_, fetched_at if fetched_at is not None else time.time())
+
+    @property
+    def age(self):
+        return time.time() - self.fetched_at
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+    def __len__(self):
+        return len(self.columns['icao24'])
+
+    # Словари для строк indices: колонки выбираются целиком и переводятся
+    # в списки Python за один вызов, без обращения к скалярам NumPy по одному
+    def aircraft(self, indices, distances=None):
+        columns = self.columns
+        values = {
+            'icao24': [value.decode() for value in columns['icao24'][indices].tolist()],
+            'callsign': [value.decode() for value in columns['callsign'][indices].tolist()],
+            'origin_country': [self.countries[code] for code in columns['origin_country'][indices].tolist()],
+            'on_ground': columns['on_ground'][indices].tolist(),
+            'last_contact': columns['last_contact'][indices].tolist(),
+        }
+        for field in ('latitude', 'longitude'):
+            values[field] = columns[field][indices].tolist()
+        for field in ('geo_altitude', 'baro_altitude', 'velocity', 'true_track', 'vertical_rate'):
+            values[field] = np.round(columns[field][indices].astype(np.float64), 2).tolist()
+        if distances is not None:
+            values['distance_km'] = np.round(distances, 2).tolist()
+
+        fields = list(values)
+        rows = [dict(zip(fields, row)) for row in zip(*values.values())]
+        # NaN (нет данных) -> None
+        for row in rows:
+            for field, value in row.items():
+                if value != value:
+                    row[field] = None
+        return rows
+
+    # Маска строк по области и началу позывного.
+    # Сравнения с NaN ложны - самолеты без координат отсекаются областью
+    def mask(self, bbox=None, callsign=None):
+        lat = self.columns['latitude']
+        lon = self.columns['longitude']
+        mask = np.ones(len(self), dtype=bool)
+
+        if bbox is not None:
+            lamin, lomin, lamax, lomax = bbox
+            mask &= (lat >= lamin) & (lat <= lamax)
+            if lomin <= lomax:
+                mask &= (lon >= lomin) & (lon <= lomax)
+            else:
+                mask &= (lon >= lomin) | (lon <= lomax)
+
+        if callsign:
+            mask &= np.char.startswith(self.columns['callsign'], callsign.strip().upper().encode())
+        return mask
+
+    # Компактные позиции для потока обновлений: icao24 -> (позывной, широта,
+    # долгота, высота, скорость, курс, на земле). Округление убирает изменения
+    # меньше ~10 м, чтобы они не попадали в дельты
+    def positions(self, bbox=None, callsign=None, limit=None):
+        mask = self.mask(bbox, callsign) & ~np.isnan(self.columns['latitude'])
+        indices = np.flatnonzero(mask)[:limit]
+        columns = self.columns
+        altitude = columns['geo_altitude'][indices]
+        altitude = np.where(np.isnan(altitude), columns['baro_altitude'][indices], altitude)
+        return dict(zip(
+            [value.decode() for value in columns['icao24'][indices].tolist()],
+            zip(
+                [value.decode() for value in columns['callsign'][indices].tolist()],
+                np.round(columns['latitude'][indices], 4).tolist(),
+                np.round(columns['longitude'][indices], 4).tolist(),
+                self._rounded(altitude, 0),
+                self._rounded(columns['velocity'][indices], 1),
+                self._rounded(columns['true_track'][indices], 0),
+                columns['on_ground'][indices].tolist(),
+            )
+        ))
+
+    @staticmethod
+    def _rounded(values, decimals):
+        values = np.round(values.astype(np.float64), decimals)
+        return [None if value != value else value for value in values.tolist()]
+
+    def query(self, bbox=None, callsign=None, center=None, radius_km=None, limit=None):
+        """Самолеты по фильтрам. Возвращает (найдено всего, первые limit самолетов).
+
+        bbox = (lamin, lomin, lamax, lomax), при lomin > lomax область пересекает
+        180-й меридиан; callsign - начало позывного без учета регистра;
+        center = (lat, lon) и radius_km - круг, результаты по расстоянию.
+        """
+        lat = self.columns['latitude']
+        lon = self.columns['longitude']
+        mask = self.mask(bbox, callsign)
+        distances = None
+        if center is not None and radius_km is not None:
+            lat_min, lat_max, lon_ranges = bounding_box(center[0], center[1], radius_km)
+            in_lon = np.zeros(len(self), dtype=bool)
+            for lon_min, lon_max in lon_ranges:
+                in_lon |= (lon >= lon_min) & (lon <= lon_max)
+            mask &= (lat >= lat_min) & (lat <= lat_max) & in_lon
+
+            indices = np.flatnonzero(mask)
+            distances = haversine_many(center[0], center[1], lat[indices], lon[indices])
+            inside = distances <= radius_km
+            indices, distances = indices[inside], distances[inside]
+            order = np.argsort(distances, kind='stable')
+            indices, distances = indices[order], distances[order]
+        else:
+            indices = np.flatnonzero(mask)
+
+        total = len(indices)
+        if limit is not None:
+            indices = indices[:limit]
+            if distances is not None:
+                distances = distances[:limit]
+        return total, self.aircraft(indices, distances)
+
+
+class LiveStateRefresher:
+    """Фоновый поток, который раз в interval секунд забирает /states/all.
+
+    Запросы к /api/data/ читают последний снимок из памяти и не ходят в OpenSky.
+    Поток запускается при первом обращении к get() и останавливается, если
+    get() не вызывали дольше idle_timeout. После ошибок пауза удваивается
+    до max_backoff, на 429 - не меньше указанного OpenSky retry_after.
+    """
+
+    def __init__(self, fetch, interval=LIVE_STATE_INTERVAL, idle_timeout=LIVE_STATE_IDLE_TIMEOUT,
+                 max_backoff=LIVE_STATE_MAX_BACKOFF):
+        self.fetch = fetch
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.max_backoff = max_backoff
+        self.snapshot = None
+        # Функции, вызываемые с каждым новым снимком в потоке обновления (например, запись треков)
+        self.listeners = []
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_used = time.monotonic()
+
+    def start(self):
+        with self._lock:
+            self._last_used = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='live-state-refresher', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def refresh(self):
+        data = self.fetch()
+        if not data:
+            return None
+        # Новый снимок строится целиком и подменяется одним присваиванием
+        snapshot = self.snapshot = LiveStateSnapshot.from_states(data.get('states') or [], data.get('time'))
+        self._ready.set()
+        for listener in self.listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logger.error(f"Ошибка обработки снимка состояний: {e}")
+        return snapshot
+
+    # Пауза до следующего запроса после failures ошибок подряд
+    def delay(self, failures, retry_after=None):
+        delay = min(self.interval * 2 ** failures, max(self.interval, self.max_backoff))
+        return max(delay, retry_after or 0)
+
+    def _idle(self):
+        # Проверка и сброс _thread под одной блокировкой со start(): get(),
+        # пришедший после остановки, запустит новый поток
+        with self._lock:
+            if time.monotonic() - self._last_used < self.idle_timeout:
+                return False
+            self._thread = None
+            # Снимок устареет, пока поток стоит: следующий get() дождется свежего
+            self._ready.clear()
+            return True
+
+    def _run(self):
+        failures = 0
+        while not self._stopped.is_set() and not self._idle():
+            started = time.monotonic()
+            retry_after = None
+            try:
+                ok = self.refresh() is not None
+            except RateLimited as e:
+                logger.warning(str(e))
+                ok, retry_after = False, e.retry_after
+            except Exception as e:
+                logger.error(f"Ошибка обновления состояний самолетов: {e}")
+                ok = False
+            failures = 0 if ok else failures + 1
+            self._stopped.wait(max(0.0, self.delay(failures, retry_after) - (time.monotonic() - started)))
+
+    # Последний снимок; пока первого снимка нет, ждет его не дольше timeout.
+    # Каждый вызов продлевает работу потока опроса
+    def get(self, timeout=FIRST_SNAPSHOT_TIMEOUT):
+        self.start()
+        self._ready.wait(timeout)
+        return self.snapshot
+
+
+_refresher = None
+_refresher_lock = threading.Lock()
+
+
+def get_live_state_refresher():
+    global _refresher
+
+    with _refresher_lock:
+        if _refresher is None:
+            opensky = OpenSkyService()
+            _refresher = LiveStateRefresher(
+                opensky.get_states,
+                interval=getattr(settings, 'LIVE_STATE_INTERVAL', LIVE_STATE_INTERVAL),
+                idle_timeout=getattr(settings, 'LIVE_STATE_IDLE_TIMEOUT', LIVE_STATE_IDLE_TIMEOUT),
+                max_backoff=getattr(settings, 'LIVE_STATE_MAX_BACKOFF', LIVE_STATE_MAX_BACKOFF),
+            )
+            if getattr(settings, 'TRACK_RECORDING', False):
+                from flights.tracks import TrackRecorder
+                _refresher.listeners.append(TrackRecorder())
+    return _refresher
@@ -0,0 +1,72 @@
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+
+# Как часто поток проверяет, не появился ли новый снимок, сек
+STREAM_POLL_INTERVAL = 1.0
+
+# Комментарий-пинг, чтобы прокси не закрывали тихое соединение, сек
+KEEPALIVE_INTERVAL = 15.0
+
+
+# Разница между позициями двух снимков: новые и изменившиеся самолеты
+# целиком, исчезнувшие - списком icao24. None, если ничего не изменилось
+def diff_positions(previous, current):
+    changed = {
+        icao24: position for icao24, position in current.items()
+        if previous.get(icao24) != position
+    }
+    removed = [icao24 for icao24 in previous if icao24 not in current]
+    if not changed and not removed:
+        return None
+    return {'changed': changed, 'removed': removed}
+
+
+def sse_event(event, data, event_id=None):
+    lines = [f'event: {event}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append('data: ' + json.dumps(data, separators=(',', ':'), ensure_ascii=False))
+    return '\n'.join(lines) + '\n\n'
+
+
+async def aircraft_events(refresher, bbox=None, callsign=None, limit=None,
+                          poll_interval=STREAM_POLL_INTERVAL, keepalive_interval=KEEPALIVE_INTERVAL):
+    """Server-Sent Events с позициями самолетов в области просмотра.
+
+    Первое событие snapshot содержит все самолеты области, дальше на каждый
+    новый снимок LiveStateRefresher приходит delta только с изменившимися
+    и исчезнувшими самолетами. Позиция: [позывной, широта, долгота, высота,
+    скорость, курс, на земле]. Чтобы сменить область, клиент переподключается
+    с новыми параметрами.
+    """
+    fields = ['callsign', 'latitude', 'longitude', 'altitude', 'velocity', 'true_track', 'on_ground']
+    # Первый снимок может еще загружаться - ждем его не в цикле событий
+    snapshot = await sync_to_async(refresher.get, thread_sensitive=False)()
+    sent_snapshot = None
+    positions = None
+    last_sent = time.monotonic()
+
+    while True:
+        if snapshot is not None and snapshot is not sent_snapshot:
+            current = snapshot.positions(bbox, callsign, limit)
+            if positions is None:
+                yield sse_event('snapshot', {'time': snapshot.time, 'fields': fields, 'aircraft': current}, snapshot.time)
+                last_sent = time.monotonic()
+            else:
+                delta = diff_positions(positions, current)
+                if delta is not None:
+                    yield sse_event('delta', {'time': snapshot.time, **delta}, snapshot.time)
+                    last_sent = time.monotonic()
+            positions = current
+            sent_snapshot = snapshot
+
+        if time.monotonic() - last_sent >= keepalive_interval:
+            yield ': keepalive\n\n'
+            last_sent = time.monotonic()
+
+        await asyncio.sleep(poll_interval)
+        # get без ожидания: открытый поток держит опрос OpenSky активным
+        snapshot = refresher.get(timeout=0)
@@ -0,0 +1,84 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from flights.management.commands.import_opensky_data import Command as ImportCommand
+from flights.management.ingest import DEFAULT_BATCH_SIZE, FlightWriter
+from flights.management.opensky_standin import OpenSkyStandin, StandinConfig, synthetic_airport_codes
+from flights.management.rate_limit import TokenBucket
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк импорта рейсов на локальной заглушке OpenSky: пропускная способность и задержки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--airports', type=int, default=50, help='Сколько аэропортов импортировать')
+        parser.add_argument('--hours', type=int, default=24, help='Окно импорта на аэропорт')
+        parser.add_argument('--chunk-hours', type=int, default=24, help='Максимальное окно одного запроса')
+        parser.add_argument('--flights', type=int, default=500, help='Рейсов в ответе заглушки')
+        parser.add_argument('--latency', type=float, default=0.05, help='Задержка ответа заглушки, сек')
+        parser.add_argument('--jitter', type=float, default=0.02, help='Разброс задержки, сек')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов 503')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--base-url', type=str, default=None, help='Уже запущенная заглушка вместо встроенной')
+        parser.add_argument('--record-dir', type=str, default=None, help='Записанные ответы для встроенной заглушки')
+        parser.add_argument('--commit', action='store_true', help='Оставить импортированные рейсы в БД')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        airports = synthetic_airport_codes(options['airports'])
+        config = StandinConfig(
+            latency=options['latency'],
+            jitter=options['jitter'],
+            error_rate=options['error_rate'],
+            flights=options['flights'],
+            airports=airports,
+            record_dir=options['record_dir'],
+            seed=options['seed'],
+        )
+
+        standin = None
+        base_url = options['base_url']
+        if not base_url:
+            standin = OpenSkyStandin(config).start()
+            base_url = standin.base_url
+
+        importer = ImportCommand()
+        writer = FlightWriter(batch_size=options['batch_size'])
+        windows = importer.plan_windows(airports, options['hours'], full=True, chunk_seconds=options['chunk_hours'] * 3600)
+        # Ограничение частоты не мешает измерению
+        bucket = TokenBucket(rate=1e9, capacity=1_000_000)
+
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                importer.import_concurrently(windows, writer, options['concurrency'], bucket, base_url=base_url)
+                elapsed = time.perf_counter() - started
+                if not options['commit']:
+                    transaction.set_rollback(True)
+        finally:
+            if standin:
+                standin.stop()
+
+        requests_total = sum(len(chunks) for chunks in windows.values())
+        self.stdout.write(
+            f'Аэропортов: {len(airports)}, запросов: {requests_total}, успешных: {len(importer.fetch_seconds)}, '
+            f'потоков: {options["concurrency"]}, задержка заглушки: {options["latency"] * 1000:.0f} мс'
+        )
+        self.stdout.write(
+            f'Записано {writer.rows_written} рейсов за {elapsed:.2f} с: {writer.rows_written / elapsed:.0f} строк/с, '
+            f'{requests_total / elapsed:.1f} запросов/с; запись в БД {writer.rows_per_second:.0f} строк/с'
+        )
+        if importer.fetch_seconds:
+            self.report('Загрузка окна', [s * 1000 for s in importer.fetch_seconds])
+
+    def report(self, title, times):
+        times = sorted(times)
+        p99 = times[min(len(times) - 1, int(len(times) * 0.99))]
+        self.stdout.write(
+            f'{title}: {len(times)}, среднее {statistics.mean(times):.1f} мс, '
+            f'p50 {statistics.median(times):.1f} мс, p99 {p99:.1f} мс'
+        )
@@ -0,0 +1,93 @@
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from flights.live_state import LiveStateSnapshot
+from flights.management.opensky_service import STATE_FIELDS
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк снимка состояний самолетов: список словарей против колонок NumPy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--aircraft', type=int, default=10000, help='Самолетов в снимке')
+        parser.add_argument('--queries', type=int, default=200, help='Запросов по области')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        states = [self.random_state(rng, i) for i in range(options['aircraft'])]
+        boxes = []
+        for _ in range(options['queries']):
+            lat, lon = rng.uniform(-60, 60), rng.uniform(-170, 170)
+            boxes.append((lat - 5, lon - 10, lat + 5, lon + 10))
+
+        rows, rows_bytes, rows_ms = self.measure(lambda: [dict(zip(STATE_FIELDS, state)) for state in states])
+        snapshot, snapshot_bytes, snapshot_ms = self.measure(lambda: LiveStateSnapshot.from_states(states))
+
+        rows_times = []
+        snapshot_times = []
+        for bbox in boxes:
+            started = time.perf_counter()
+            expected = self.rows_query(rows, bbox)
+            rows_times.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            total, found = snapshot.query(bbox=bbox, limit=100)
+            snapshot_times.append((time.perf_counter() - started) * 1000)
+
+            if total != len(expected):
+                self.stderr.write(self.style.ERROR(f'Расхождение результатов для области {bbox}'))
+                return
+
+        self.stdout.write(f'Самолетов: {len(states)}, запросов: {len(boxes)}')
+        self.stdout.write(f'Список словарей: память {rows_bytes / 1024:.0f} КБ, построение {rows_ms:.1f} мс')
+        self.stdout.write(
+            f'Колонки NumPy: память {snapshot_bytes / 1024:.0f} КБ (массивы {snapshot.nbytes / 1024:.0f} КБ), '
+            f'построение {snapshot_ms:.1f} мс'
+        )
+        self.report('Запрос по области, список', rows_times)
+        self.report('Запрос по области, колонки', snapshot_times)
+        self.stdout.write(self.style.SUCCESS(
+            f'Память: в {rows_bytes / snapshot_bytes:.1f} раза меньше, '
+            f'запрос (медиана): в {statistics.median(rows_times) / statistics.median(snapshot_times):.1f} раза быстрее'
+        ))
+
+    # Результат и сколько памяти осталось занято после построения
+    def measure(self, build):
+        tracemalloc.start()
+        started = time.perf_counter()
+        result = build()
+        elapsed = (time.perf_counter() - started) * 1000
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return result, size, elapsed
+
+    # Так работала первая версия снимка: перебор словарей, первые 100 результатов
+    def rows_query(self, rows, bbox):
+        lamin, lomin, lamax, lomax = bbox
+        found = [
+            row for row in rows
+            if row['latitude'] is not None and lamin <= row['latitude'] <= lamax and lomin <= row['longitude'] <= lomax
+        ]
+        return found
+
+    def report(self, title, times):
+        times = sorted(times)
+        p99 = times[min(len(times) - 1, int(len(times) * 0.99))]
+        self.stdout.write(
+            f'{title}: среднее {statistics.mean(times):.3f} мс, '
+            f'p50 {statistics.median(times):.3f} мс, p99 {p99:.3f} мс'
+        )
+
+    def random_state(self, rng, i):
+        on_ground = rng.random() < 0.1
+        return [
+            f'{i:06x}', f'AB{rng.randrange(10000):04d}  ', rng.choice(['Russia', 'Germany', 'United States', 'China']),
+            1700000000, 1700000000, rng.uniform(-180, 180), rng.uniform(-70, 70),
+            None if on_ground else rng.uniform(1000, 12000), on_ground, rng.uniform(0, 260),
+            rng.uniform(0, 360), rng.uniform(-10, 10), None, rng.uniform(1000, 12000), '1000', False, 0,
+        ]
@@ -0,0 +1,86 @@
+import math
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from flights.distance import haversine_distance
+from flights.spatial_index import AirportSpatialIndex
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк поиска аэропортов в радиусе: полный перебор против пространственного индекса'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--airports', type=int, default=70000, help='Количество синтетических аэропортов')
+        parser.add_argument('--queries', type=int, default=1000, help='Количество запросов к индексу')
+        parser.add_argument('--linear-queries', type=int, default=20, help='Количество запросов полным перебором')
+        parser.add_argument('--radius', type=float, default=500, help='Радиус поиска в км')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        radius = options['radius']
+
+        airports = [self.random_airport(rng, i) for i in range(options['airports'])]
+        centers = [self.random_point(rng) for _ in range(options['queries'])]
+
+        started = time.perf_counter()
+        index = AirportSpatialIndex(airports)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        linear_times = []
+        for lat, lon in centers[:options['linear_queries']]:
+            started = time.perf_counter()
+            expected = self.linear_query(airports, lat, lon, radius)
+            linear_times.append((time.perf_counter() - started) * 1000)
+
+            found = {a['icao_code'] for a, _ in index.query(lat, lon, radius)}
+            if found != expected:
+                self.stderr.write(self.style.ERROR(f'Расхождение результатов в точке {lat:.3f}, {lon:.3f}'))
+                return
+
+        index_times = []
+        for lat, lon in centers:
+            started = time.perf_counter()
+            index.query(lat, lon, radius)
+            index_times.append((time.perf_counter() - started) * 1000)
+
+        self.stdout.write(f'Аэропортов: {len(airports)}, радиус: {radius} км, построение индекса: {build_ms:.1f} мс')
+        self.report('Полный перебор', linear_times)
+        self.report('Индекс', index_times)
+        self.stdout.write(self.style.SUCCESS(
+            f'Ускорение (медиана): {statistics.median(linear_times) / statistics.median(index_times):.0f}x'
+        ))
+
+    def report(self, title, times):
+        times = sorted(times)
+        p99 = times[min(len(times) - 1, int(len(times) * 0.99))]
+        self.stdout.write(
+            f'{title}: запросов {len(times)}, среднее {statistics.mean(times):.3f} мс, '
+            f'p50 {statistics.median(times):.3f} мс, p99 {p99:.3f} мс'
+        )
+
+    # Так же, как раньше работали views: расстояние до каждого аэропорта
+    def linear_query(self, airports, lat, lon, radius):
+        return {
+            a['icao_code'] for a in airports
+            if haversine_distance(lat, lon, a['latitude'], a['longitude']) <= radius
+        }
+
+    # Равномерное распределение по сфере, а не по прямоугольнику широт/долгот
+    def random_point(self, rng):
+        return math.degrees(math.asin(rng.uniform(-1, 1))), rng.uniform(-180, 180)
+
+    def random_airport(self, rng, i):
+        lat, lon = self.random_point(rng)
+        return {
+            'icao_code': f'B{i:06d}',
+            'iata_code': '',
+            'name': f'Benchmark {i}',
+            'city': '',
+            'country': '',
+            'latitude': lat,
+            'longitude': lon,
+        }
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from flights.tracks import DOWNSAMPLE_STEP, FULL_RESOLUTION_SECONDS, downsample_tracks
+
+
+class Command(BaseCommand):
+    help = 'Прореживание старых точек треков: полное разрешение за последний час, дальше точка в минуту'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full-resolution', type=int, default=FULL_RESOLUTION_SECONDS, help='Сколько последних секунд не трогать')
+        parser.add_argument('--step', type=int, default=DOWNSAMPLE_STEP, help='Одна точка на столько секунд')
+        parser.add_argument('--window-hours', type=int, default=24, help='Сколько часов до границы обработать')
+        parser.add_argument('--retention-days', type=int, default=0, help='Удалить точки старше N дней (0 - хранить)')
+
+    def handle(self, *args, **options):
+        deleted = downsample_tracks(
+            full_resolution=options['full_resolution'],
+            step=options['step'],
+            window=options['window_hours'] * 3600,
+            retention=options['retention_days'] * 86400 or None,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Удалено точек: {deleted}'))
@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from flights.models import Airport, Flight
+from flights.synthetic import SyntheticDataset, insert_flights
+from flights.versioning import bump_airports_version, bump_flights_versions
+
+
+class Command(BaseCommand):
+    help = (
+        'Синтетический набор данных для нагрузочных проверок: аэропорты кластерами, '
+        'рейсы с распределением по хабам, загрузка пачками INSERT'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--airports', type=int, default=10000, help='Количество аэропортов')
+        parser.add_argument('--flights', type=int, default=1000000, help='Количество рейсов')
+        parser.add_argument('--days', type=int, default=30, help='За сколько последних дней рейсы')
+        parser.add_argument('--clusters', type=int, default=None, help='Количество кластеров (по умолчанию аэропорты / 250)')
+        parser.add_argument('--prefix', default='X', help='Префикс кодов аэропортов набора')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000, help='Аэропортов в одном INSERT')
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Рейсов в одной транзакции')
+        parser.add_argument('--clear', action='store_true', help='Сначала удалить набор с тем же префиксом')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if options['airports'] < 2:
+            raise CommandError('Нужно хотя бы 2 аэропорта')
+
+        existing = Airport.objects.filter(icao_code__startswith=prefix)
+        if options['clear']:
+            deleted, _ = Flight.objects.filter(
+                Q(departure_airport__in=existing) | Q(arrival_airport__in=existing)
+            ).delete()
+            existing.delete()
+            self.stdout.write(f'Удален прежний набор {prefix}*: {deleted} рейсов')
+        elif existing.exists():
+            raise CommandError(f'Аэропорты с префиксом {prefix} уже есть, используйте --clear или другой --prefix')
+
+        started = time.perf_counter()
+        dataset = SyntheticDataset(options['airports'], seed=options['seed'], prefix=prefix, clusters=options['clusters'])
+        with transaction.atomic():
+            Airport.objects.bulk_create(dataset.airports(), batch_size=options['batch_size'])
+        self.stdout.write(f'Аэропортов: {dataset.count} за {time.perf_counter() - started:.1f} с')
+
+        started = time.perf_counter()
+        end = int(time.time())
+        begin = end - options['days'] * 24 * 3600
+        written = 0
+        for batch in dataset.flights(options['flights'], begin, end, chunk_size=options['chunk_size']):
+            with transaction.atomic():
+                insert_flights(batch)
+            written += len(batch)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'Рейсов: {written}/{options["flights"]}, {written / elapsed:.0f} строк/с')
+
+        # bulk_create не посылает сигналов: кэши индексов и результатов сбрасываются по версиям
+        bump_airports_version()
+        bump_flights_versions(dataset.codes)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {dataset.count} аэропортов, {written} рейсов за {time.perf_counter() - started:.1f} с. '
+            f'Расстояния маршрутов: python manage.py refresh_route_distances'
+        ))
@@ -1,110 +1,155 @@
-from django.core.management.base import BaseCommand
-from django.utils import timezone
-from flights.models import Airport, Flight
-from flights.management.opensky_service import OpenSkyService
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from flights.models import Airport
+from flights.management.opensky_service import MAX_INTERVAL_SECONDS, OpenSkyService, time_chunks
+from flights.management.ingest import (
+    DEFAULT_BATCH_SIZE,
+    FlightWriter,
+    WatermarkTracker,
+    load_watermarks,
+    parse_flight_stream,
+    save_watermark,
+)
+from flights.management.rate_limit import DEFAULT_BURST, DEFAULT_RATE, TokenBucket
 import logging
+import queue
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 class Command(BaseCommand):
     help = 'Импорт данных из OpenSky API'
-    
+
     def add_arguments(self, parser):
         parser.add_argument('--airport', type=str, help='ICAO код аэропорта')
-        parser.add_argument('--hours', type=int, default=24, help='Количество часов')
-    
+        parser.add_argument('--hours', type=int, default=24, help='Количество часов (если для аэропорта еще нет watermark)')
+        parser.add_argument('--full', action='store_true', help='Игнорировать watermark и загрузить все --hours часов')
+        parser.add_argument('--chunk-hours', type=int, default=MAX_INTERVAL_SECONDS // 3600, help='Максимальное окно одного запроса')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Рейсов в одной транзакции')
+        parser.add_argument('--limit', type=int, default=10, help='Сколько аэропортов из БД обойти (0 - все)')
+        parser.add_argument('--concurrency', type=int, default=1, help='Параллельных запросов к OpenSky')
+        parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help='Запросов к OpenSky в секунду')
+        parser.add_argument('--burst', type=int, default=DEFAULT_BURST, help='Запросов подряд без ожидания')
+        parser.add_argument('--base-url', type=str, default=None, help='Адрес API OpenSky (по умолчанию OPENSKY_BASE_URL или opensky-network.org)')
+
     def handle(self, *args, **options):
-        opensky = OpenSkyService()
-        
-        airport_icao = options['airport']
+        try:
+            bucket = TokenBucket(rate=options['rate'], capacity=options['burst'])
+        except ValueError as e:
+            raise CommandError(f'--rate/--burst: {e}')
+        started = time.perf_counter()
+        writer = FlightWriter(batch_size=options['batch_size'])
         hours = options['hours']
-        
-        if airport_icao:
+
+        if options['airport']:
             # Импорт для конкретного аэропорта
-            self.import_flights_for_airport(opensky, airport_icao, hours)
+            airports = [options['airport'].upper()]
         else:
-            # Импорт для всех аэропортов в БД
-            airports = Airport.objects.all()[:10]  # Ограничим для теста
-            for airport in airports:
-                self.import_flights_for_airport(opensky, airport.icao_code, hours)
-    
-    def import_flights_for_airport(self, opensky, airport_icao, hours):
-        """Импорт рейсов для конкретного аэропорта"""
-        logger.info(f"Импорт рейсов для {airport_icao} за последние {hours} часов")
-        
+            # Импорт для аэропортов в БД
+            airports = Airport.objects.values_list('icao_code', flat=True)
+            if options['limit']:
+                airports = airports[:options['limit']]
+            airports = list(airports)
+
+        windows = self.plan_windows(airports, hours, full=options['full'], chunk_seconds=options['chunk_hours'] * 3600)
+        self.import_concurrently(
+            windows, writer,
+            concurrency=options['concurrency'],
+            bucket=bucket,
+            base_url=options['base_url']
+        )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Записано {writer.rows_written} рейсов за {elapsed:.2f} с "
+            f"({writer.rows_written / elapsed:.0f} строк/с), "
+            f"из них запись в БД {writer.seconds:.2f} с ({writer.rows_per_second:.0f} строк/с)"
+        )
+
+    def plan_windows(self, airports, hours, full=False, chunk_seconds=MAX_INTERVAL_SECONDS, now=None):
+        """Окна загрузки по аэропортам: от watermark (или now - hours) до now, порезанные на части"""
+        now = int(now if now is not None else time.time())
+        watermarks = {} if full else load_watermarks(airports)
+        return {
+            airport_icao: time_chunks(watermarks.get(airport_icao, now - hours * 3600), now, chunk_seconds)
+            for airport_icao in airports
+        }
+
+    def import_concurrently(self, windows, writer, concurrency, bucket, base_url=None):
+        """Загрузка из OpenSky в пуле потоков, запись в БД только из текущего потока.
+
+        Потоки читают ответы потоково и передают рейсы пачками через
+        ограниченную очередь, так что в памяти одновременно не больше
+        нескольких пачек, сколько бы рейсов ни было в окне.
+
+        Ошибки отдельных окон пишутся в лог и не прерывают импорт остальных.
+        Возвращает множество аэропортов, у которых хотя бы одно окно не
+        загрузилось или не записалось.
+        """
+        local = threading.local()
+        tracker = WatermarkTracker(windows)
+        results = queue.Queue(maxsize=max(1, concurrency) * 2)
+        # Время загрузки каждого окна от запроса до конца ответа, сек
+        self.fetch_seconds = []
+
+        def fetch(airport_icao, begin, end):
+            ok = False
+            try:
+                # requests.Session не гарантирует потокобезопасность - своя на каждый поток
+                if not hasattr(local, 'opensky'):
+                    local.opensky = OpenSkyService(base_url=base_url)
+                bucket.acquire()
+                started = time.perf_counter()
+                records = local.opensky.iter_flights_by_airport(airport_icao, begin=begin, end=end)
+                batch = []
+                for row in parse_flight_stream(records, airport_icao):
+                    batch.append(row)
+                    if len(batch) >= writer.batch_size:
+                        results.put(('rows', airport_icao, end, batch))
+                        batch = []
+                if batch:
+                    results.put(('rows', airport_icao, end, batch))
+                self.fetch_seconds.append(time.perf_counter() - started)
+                ok = True
+            except Exception as e:
+                logger.error(f"Ошибка загрузки для {airport_icao}: {e}")
+            finally:
+                results.put(('done', airport_icao, end, ok))
+
+        remaining = sum(len(chunks) for chunks in windows.values())
+        failed = set()
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            for airport_icao, chunks in windows.items():
+                for begin, end in chunks:
+                    pool.submit(fetch, airport_icao, begin, end)
+
+            while remaining:
+                kind, airport_icao, end, payload = results.get()
+                if kind == 'rows':
+                    try:
+                        writer.write(payload)
+                    except Exception as e:
+                        logger.error(f"Ошибка импорта для {airport_icao}: {e}")
+                        failed.add((airport_icao, end))
+                    continue
+
+                remaining -= 1
+                if not payload or (airport_icao, end) in failed or not self.complete_window(writer, tracker, airport_icao, end):
+                    failed.add((airport_icao, end))
+
+        return {airport_icao for airport_icao, _ in failed}
+
+    def complete_window(self, writer, tracker, airport_icao, end):
+        # Окно загружено целиком - можно сдвинуть watermark
         try:
-            data = opensky.get_flights_by_airport(airport_icao, hours)
-            
-            if not data or 'arrivals' not in data or 'departures' not in data:
-                logger.warning(f"Нет данных для {airport_icao}")
-                return
-            
-            airport, _ = Airport.objects.get_or_create(
-                icao_code=airport_icao,
-                defaults={
-                    'name': f'Аэропорт {airport_icao}',
-                    'city': 'Неизвестно',
-                    'country': 'Неизвестно',
-                    'latitude': 0,
-                    'longitude': 0
-                }
-            )
-            
-            # Обрабатываем вылеты
-            for flight_data in data.get('departures', []):
-                self.create_or_update_flight(flight_data, airport, is_departure=True)
-            
-            # Обрабатываем прилеты
-            for flight_data in data.get('arrivals', []):
-                self.create_or_update_flight(flight_data, airport, is_departure=False)
-            
+            # Аэропорт выборки тоже попадает в ensure_airports, отдельный get_or_create не нужен
+            writer.ensure_airports({airport_icao})
+            watermark = tracker.complete(airport_icao, end)
+            if watermark is not None:
+                save_watermark(airport_icao, watermark)
             logger.info(f"Импорт завершен для {airport_icao}")
-            
+            return True
         except Exception as e:
             logger.error(f"Ошибка импорта для {airport_icao}: {e}")
-    
-    def create_or_update_flight(self, flight_data, airport, is_departure):
-        """Создание или обновление записи о рейсе"""
-        try:
-            callsign = flight_data.get('callsign', '').strip()
-            if not callsign:
-                return
-            
-            # Получаем аэропорт назначения/отправления
-            other_airport_icao = flight_data.get('estArrivalAirport' if is_departure else 'estDepartureAirport')
-            
-            if not other_airport_icao:
-                return
-            
-            other_airport, _ = Airport.objects.get_or_create(
-                icao_code=other_airport_icao,
-                defaults={
-                    'name': f'Аэропорт {other_airport_icao}',
-                    'city': 'Неизвестно',
-                    'country': 'Неизвестно',
-                    'latitude': 0,
-                    'longitude': 0
-                }
-            )
-            
-            # Создаем или обновляем рейс
-            flight, created = Flight.objects.update_or_create(
-                callsign=callsign,
-                icao24=flight_data.get('icao24'),
-                departure_airport=airport if is_departure else other_airport,
-                arrival_airport=other_airport if is_departure else airport,
-                defaults={
-                    'first_seen': timezone.datetime.fromtimestamp(flight_data.get('firstSeen', 0)),
-                    'last_seen': timezone.datetime.fromtimestamp(flight_data.get('lastSeen', 0)),
-                    'duration_minutes': (flight_data.get('lastSeen', 0) - flight_data.get('firstSeen', 0)) // 60,
-                    'opensky_data': flight_data
-                }
-            )
-            
-            if created:
-                logger.debug(f"Создан рейс: {flight}")
-            else:
-                logger.debug(f"Обновлен рейс: {flight}")
-                
-        except Exception as e:
-            logger.error(f"Ошибка создания рейса: {e}")
\ No newline at end of file
+            return False
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from flights.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Перестроение поискового индекса аэропортов (FTS5 в SQLite)'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Индекс перестроен: {type(backend).__name__}'))
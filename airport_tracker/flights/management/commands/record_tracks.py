@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from flights.live_state import LIVE_STATE_INTERVAL, LiveStateRefresher
+from flights.management.opensky_service import OpenSkyService, RateLimited
+from flights.tracks import TrackRecorder
+
+
+class Command(BaseCommand):
+    help = 'Запись треков самолетов из /states/all без веб-сервера (в вебе - настройка TRACK_RECORDING)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=LIVE_STATE_INTERVAL, help='Период опроса, сек')
+        parser.add_argument('--base-url', type=str, default=None, help='Адрес API OpenSky')
+
+    def handle(self, *args, **options):
+        opensky = OpenSkyService(base_url=options['base_url'])
+        recorder = TrackRecorder()
+        refresher = LiveStateRefresher(opensky.get_states, interval=options['interval'])
+
+        self.stdout.write('Запись треков запущена')
+        try:
+            failures = 0
+            while True:
+                started = time.monotonic()
+                retry_after = None
+                try:
+                    snapshot = refresher.refresh()
+                except RateLimited as e:
+                    self.stderr.write(str(e))
+                    snapshot, retry_after = None, e.retry_after
+                if snapshot is not None:
+                    self.stdout.write(f'Самолетов: {len(snapshot)}, новых точек: {recorder.record(snapshot)}')
+                    failures = 0
+                else:
+                    failures += 1
+                # После ошибок пауза растет так же, как в фоновом потоке веб-сервера
+                time.sleep(max(0.0, refresher.delay(failures, retry_after) - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            pass
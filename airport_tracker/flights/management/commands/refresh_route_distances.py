@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from flights.routes import refresh_route_distances
+
+
+class Command(BaseCommand):
+    help = 'Пересчет таблицы расстояний маршрутов и Flight.distance_km (после загрузки аэропортов)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--airport', type=str, action='append', help='ICAO код аэропорта (можно несколько)')
+
+    def handle(self, *args, **options):
+        airports = [icao.upper() for icao in options['airport']] if options['airport'] else None
+        updated = refresh_route_distances(airports)
+        self.stdout.write(self.style.SUCCESS(f'Обновлено рейсов: {updated}'))
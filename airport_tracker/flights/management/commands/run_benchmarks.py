@@ -0,0 +1,217 @@
+import json
+import platform
+import random
+import time
+from io import StringIO
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from flights.benchmarks import compare, measure, parse_sizes, peak_memory_kb, summarize
+from flights.management.commands.import_opensky_data import Command as ImportCommand
+from flights.management.ingest import FlightWriter
+from flights.management.opensky_standin import OpenSkyStandin, StandinConfig
+from flights.management.rate_limit import TokenBucket
+from flights.models import Airport, Flight
+from flights.synthetic import dataset_codes
+
+# Префикс кодов аэропортов синтетического набора бенчмарка. Реальные коды ICAO
+# с Z9 не начинаются, а удаляются все равно только созданные прогоном коды
+DATASET_PREFIX = 'Z9'
+
+# Аэропортов в одном DELETE: лимит параметров SQLite
+DELETE_BATCH_SIZE = 500
+
+# Отдельный кэш в памяти: бенчмарк очищает кэш и не должен трогать рабочий
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'run-benchmarks',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Бенчмарк API (airports-in-radius, autocomplete, flights-with-radius) и импорта '
+        'на синтетических наборах разного размера: перцентили задержек, SQL-запросы, '
+        'пиковая память, JSON с результатами и сравнение с базовой линией'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='small,medium',
+                            help='Наборы через запятую: small, medium, large или аэропорты:рейсы')
+        parser.add_argument('--requests', type=int, default=200, help='Запросов на эндпоинт')
+        parser.add_argument('--ingest-airports', type=int, default=20, help='Аэропортов в бенчмарке импорта')
+        parser.add_argument('--ingest-flights', type=int, default=500, help='Рейсов в ответе заглушки OpenSky')
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+        parser.add_argument('--baseline', help='JSON с результатами прошлого прогона для сравнения')
+        parser.add_argument('--threshold', type=float, default=20.0, help='Допустимое ухудшение, %%')
+        parser.add_argument('--no-fail', action='store_true', help='Не завершаться с ошибкой при регрессиях')
+        parser.add_argument('--current-db', action='store_true',
+                            help='Работать в текущей БД вместо тестовой (набор удаляется после прогона)')
+        parser.add_argument('--keepdb', action='store_true', help='Не удалять тестовую БД после прогона')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            sizes = parse_sizes(options['sizes'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as f:
+                baseline = json.load(f)['results']
+
+        try:
+            setup_test_environment()
+            own_environment = True
+        except RuntimeError:
+            # Уже внутри тестового окружения (запуск из тестов)
+            own_environment = False
+        self.created_codes = []
+        old_name = None
+        if not options['current_db']:
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                results = {name: self.run_size(name, airports, flights, options) for name, (airports, flights) in sizes.items()}
+        finally:
+            if old_name is None:
+                self.delete_dataset()
+            else:
+                connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            if own_environment:
+                teardown_test_environment()
+
+        regressions = compare(results, baseline, options['threshold'] / 100) if baseline else []
+        report = {
+            'meta': {
+                'created_at': int(time.time()),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'requests': options['requests'],
+                'seed': options['seed'],
+                'sizes': {name: {'airports': a, 'flights': f} for name, (a, f) in sizes.items()},
+            },
+            'results': results,
+            'regressions': regressions,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты записаны в {options["output"]}')
+
+        for regression in regressions:
+            self.stderr.write(self.style.ERROR(
+                f'Регрессия {regression["size"]}/{regression["benchmark"]} {regression["metric"]}: '
+                f'{regression["baseline"]} -> {regression["current"]} ({regression["change_percent"]}%)'
+            ))
+        if regressions and not options['no_fail']:
+            raise CommandError(f'Регрессий: {len(regressions)} (порог {options["threshold"]}%)')
+        if baseline:
+            self.stdout.write(self.style.SUCCESS('Регрессий относительно базовой линии нет' if not regressions else 'Регрессии допущены (--no-fail)'))
+
+    def run_size(self, name, airports, flights, options):
+        # Набор прошлого размера; чужие аэропорты с тем же префиксом не удаляются,
+        # генератор в этом случае завершится с ошибкой
+        self.delete_dataset()
+        started = time.perf_counter()
+        call_command(
+            'generate_synthetic_dataset', airports=airports, flights=flights, prefix=DATASET_PREFIX,
+            seed=options['seed'], stdout=StringIO()
+        )
+        self.created_codes = dataset_codes(airports, DATASET_PREFIX)
+        self.stdout.write(f'[{name}] набор: {airports} аэропортов, {flights} рейсов за {time.perf_counter() - started:.1f} с')
+
+        rng = random.Random(options['seed'])
+        rows = list(
+            Airport.objects.filter(icao_code__startswith=DATASET_PREFIX)
+            .values_list('icao_code', 'name', 'latitude', 'longitude')
+        )
+        cases = [rng.choice(rows) for _ in range(options['requests'])]
+        client = Client()
+
+        def get(path, params):
+            return client.get(path, params).status_code == 200
+
+        benchmarks = {
+            'airports_in_radius': (
+                lambda case: get('/api/airports-in-radius/', {'lat': case[0], 'lon': case[1], 'radius': case[2]}),
+                [(lat + rng.uniform(-1, 1), lon + rng.uniform(-1, 1), rng.choice((50, 200, 500))) for _, _, lat, lon in cases],
+            ),
+            'autocomplete': (
+                lambda case: get('/api/airport-autocomplete/', {'q': case}),
+                # Начало кода, редкое слово из названия или префикс, общий
+                # для всего набора ("Syn"), как вводит пользователь
+                [rng.choice((code[:4], airport_name.split()[1][:3], airport_name[:3])) for code, airport_name, _, _ in cases],
+            ),
+            'flights_with_radius': (
+                lambda case: get('/api/flights-with-radius/', {'center_icao': case[0], 'radius': case[1]}),
+                [(code, rng.choice((100, 300, 1000))) for code, _, _, _ in cases],
+            ),
+        }
+
+        results = {}
+        for benchmark, (call, benchmark_cases) in benchmarks.items():
+            # Прогрев: индексы в памяти строятся при первом обращении
+            for case in benchmark_cases[:5]:
+                call(case)
+            results[benchmark] = measure(call, benchmark_cases)
+        results['ingest'] = self.run_ingest([code for code, _, _, _ in rows], rng, options)
+
+        for benchmark, result in results.items():
+            if 'rows_per_second' in result:
+                details = f'SQL на окно {result["queries_per_window"]}, {result["rows_per_second"]:.0f} строк/с'
+            else:
+                details = f'SQL среднее {result["queries_mean"]}, максимум {result["queries_max"]}'
+            self.stdout.write(
+                f'[{name}] {benchmark}: p50 {result["p50_ms"]:.2f} мс, p99 {result["p99_ms"]:.2f} мс, '
+                f'{details}, память {result["peak_memory_kb"]:.0f} КБ, ошибок {result["errors"]}'
+            )
+        return results
+
+    def run_ingest(self, codes, rng, options):
+        """Импорт через заглушку OpenSky в существующий набор. Транзакция
+        откатывается, чтобы повторные прогоны и размеры были сравнимы."""
+        airports = rng.sample(codes, min(options['ingest_airports'], len(codes)))
+        config = StandinConfig(flights=options['ingest_flights'], airports=codes, seed=options['seed'])
+
+        def run():
+            importer = ImportCommand(stdout=StringIO(), stderr=StringIO())
+            writer = FlightWriter()
+            windows = importer.plan_windows(airports, 24, full=True)
+            with transaction.atomic(), CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                importer.import_concurrently(
+                    windows, writer, 4, TokenBucket(rate=1e9, capacity=1_000_000), base_url=standin.base_url
+                )
+                elapsed = time.perf_counter() - started
+                transaction.set_rollback(True)
+            return importer, writer, elapsed, sum(len(chunks) for chunks in windows.values()), len(captured)
+
+        with OpenSkyStandin(config) as standin:
+            importer, writer, elapsed, windows, queries = run()
+            result = summarize([seconds * 1000 for seconds in importer.fetch_seconds])
+            result.update({
+                'errors': windows - len(importer.fetch_seconds),
+                'rows': writer.rows_written,
+                'rows_per_second': round(writer.rows_written / elapsed, 1) if elapsed else 0.0,
+                'queries_per_window': round(queries / windows, 2) if windows else 0.0,
+                'peak_memory_kb': peak_memory_kb(run),
+            })
+        return result
+
+    def delete_dataset(self):
+        """Удаляет ровно те аэропорты (и их рейсы), которые создал прогон."""
+        for start in range(0, len(self.created_codes), DELETE_BATCH_SIZE):
+            codes = self.created_codes[start:start + DELETE_BATCH_SIZE]
+            Flight.objects.filter(Q(departure_airport__in=codes) | Q(arrival_airport__in=codes)).delete()
+            Airport.objects.filter(icao_code__in=codes).delete()
+        self.created_codes = []
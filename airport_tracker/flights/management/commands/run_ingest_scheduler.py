@@ -0,0 +1,127 @@
+import logging
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from flights.models import Airport
+from flights.management.commands.import_opensky_data import Command as ImportCommand
+from flights.management.ingest import DEFAULT_BATCH_SIZE, FlightWriter, load_watermarks
+from flights.management.opensky_service import MAX_INTERVAL_SECONDS
+from flights.management.rate_limit import DEFAULT_BURST, DEFAULT_RATE, TokenBucket
+from flights.management.scheduler import (
+    MAX_INTERVAL,
+    MIN_INTERVAL,
+    RETRY_DELAY,
+    IngestScheduler,
+    load_traffic,
+    publish_metrics,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Непрерывный импорт из OpenSky: загруженные аэропорты обновляются чаще тихих'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help='Параллельных запросов к OpenSky')
+        parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help='Общий бюджет: запросов к OpenSky в секунду')
+        parser.add_argument('--burst', type=int, default=DEFAULT_BURST, help='Запросов подряд без ожидания')
+        parser.add_argument('--min-interval', type=int, default=MIN_INTERVAL, help='Самый частый интервал обновления, сек')
+        parser.add_argument('--max-interval', type=int, default=MAX_INTERVAL, help='Самый редкий интервал обновления, сек')
+        parser.add_argument('--retry-delay', type=int, default=RETRY_DELAY, help='Повтор аэропортов после ошибки импорта, сек')
+        parser.add_argument('--hours', type=int, default=24, help='Окно первой загрузки аэропорта без watermark')
+        parser.add_argument('--airports-per-cycle', type=int, default=0, help='Аэропортов за один цикл (0 - concurrency * 4)')
+        parser.add_argument('--traffic-refresh', type=int, default=600, help='Как часто пересчитывать трафик, сек')
+        parser.add_argument('--poll', type=float, default=5.0, help='Максимальная пауза между циклами, сек')
+        parser.add_argument('--cycles', type=int, default=0, help='Остановиться после N циклов с импортом (0 - работать всегда)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Рейсов в одной транзакции')
+        parser.add_argument('--base-url', type=str, default=None, help='Адрес API OpenSky')
+
+    def handle(self, *args, **options):
+        # Один бюджет на все аэропорты: если его не хватает, растут queue_depth и lag
+        try:
+            bucket = TokenBucket(rate=options['rate'], capacity=options['burst'])
+        except ValueError as e:
+            raise CommandError(f'--rate/--burst: {e}')
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+
+        importer = ImportCommand()
+        writer = FlightWriter(batch_size=options['batch_size'])
+        per_cycle = options['airports_per_cycle'] or options['concurrency'] * 4
+
+        scheduler = IngestScheduler(min_interval=options['min_interval'], max_interval=options['max_interval'])
+        traffic_loaded_at = None
+        cycles = 0
+        stats = {'cycles': 0, 'rows_written': 0, 'last_cycle_seconds': 0.0}
+
+        self.stdout.write('Планировщик импорта запущен')
+        while not self.stopping:
+            now = time.time()
+            try:
+                if traffic_loaded_at is None or now - traffic_loaded_at >= options['traffic_refresh']:
+                    self.refresh_airports(scheduler, now)
+                    traffic_loaded_at = now
+
+                due = scheduler.pop_due(now, limit=per_cycle)
+                if due:
+                    started = time.perf_counter()
+                    try:
+                        windows = importer.plan_windows(due, options['hours'], chunk_seconds=MAX_INTERVAL_SECONDS)
+                        failed = importer.import_concurrently(
+                            windows, writer,
+                            concurrency=options['concurrency'],
+                            bucket=bucket,
+                            base_url=options['base_url']
+                        )
+                    except Exception:
+                        # pop_due уже убрал аэропорты из очереди: без этого они бы из нее пропали
+                        failed_at = time.time()
+                        for icao in due:
+                            scheduler.failed(icao, failed_at, options['retry_delay'])
+                        raise
+                    finished = time.time()
+                    # Аэропорт с неудачным окном повторяется через retry_delay,
+                    # а не через свой интервал (у тихого аэропорта - до суток)
+                    for icao in due:
+                        if icao in failed:
+                            scheduler.failed(icao, finished, options['retry_delay'])
+                        else:
+                            scheduler.completed(icao, finished)
+
+                    cycles += 1
+                    stats.update(
+                        cycles=cycles,
+                        rows_written=writer.rows_written,
+                        last_cycle_seconds=round(time.perf_counter() - started, 2),
+                    )
+                    logger.info(f"Обновлено аэропортов: {len(due)}, всего записано рейсов: {writer.rows_written}")
+            except Exception as e:
+                logger.error(f"Ошибка цикла планировщика: {e}")
+                time.sleep(options['poll'])
+                continue
+
+            now = time.time()
+            publish_metrics({**scheduler.metrics(now), **stats})
+
+            if options['cycles'] and cycles >= options['cycles']:
+                break
+            if not due:
+                next_run = scheduler.next_run()
+                pause = options['poll'] if next_run is None else min(options['poll'], max(0.0, next_run - now))
+                time.sleep(pause)
+
+        self.stdout.write(f"Планировщик остановлен, записано рейсов: {writer.rows_written}")
+
+    def refresh_airports(self, scheduler, now):
+        scheduler.sync(
+            list(Airport.objects.values_list('icao_code', flat=True)),
+            traffic=load_traffic(now),
+            last_runs=load_watermarks(),
+            now=now
+        )
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from flights.management.opensky_standin import OpenSkyStandin, StandinConfig, synthetic_airport_codes
+from flights.models import Airport
+
+
+class Command(BaseCommand):
+    help = 'Локальная заглушка API OpenSky для бенчмарков и офлайн-импорта'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', type=str, default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.0, help='Задержка ответа, сек')
+        parser.add_argument('--jitter', type=float, default=0.0, help='Разброс задержки, сек')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов 503 (0..1)')
+        parser.add_argument('--flights', type=int, default=100, help='Рейсов в ответе /flights/airport')
+        parser.add_argument('--states', type=int, default=1000, help='Самолетов в ответе /states/all')
+        parser.add_argument('--airports', type=int, default=0, help='Синтетических аэропортов назначения (0 - аэропорты из БД)')
+        parser.add_argument('--record-dir', type=str, default=None, help='Каталог с записанными ответами')
+        parser.add_argument('--upstream', type=str, default=None, help='Настоящий API для записи недостающих ответов в --record-dir')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options['airports']:
+            airports = synthetic_airport_codes(options['airports'])
+        else:
+            airports = list(Airport.objects.values_list('icao_code', flat=True)) or None
+
+        config = StandinConfig(
+            latency=options['latency'],
+            jitter=options['jitter'],
+            error_rate=options['error_rate'],
+            flights=options['flights'],
+            states=options['states'],
+            airports=airports,
+            record_dir=options['record_dir'],
+            upstream=options['upstream'],
+            seed=options['seed'],
+        )
+        standin = OpenSkyStandin(config, host=options['host'], port=options['port'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Заглушка OpenSky: {standin.base_url} (OPENSKY_BASE_URL или --base-url у import_opensky_data)'
+        ))
+        try:
+            standin.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            standin.server.server_close()
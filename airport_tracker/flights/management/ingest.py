@@ -0,0 +1,208 @@
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import transaction
+
+from flights.models import Airport, Flight, IngestWatermark
+from flights.routes import _chunks, get_route_distances
+from flights.versioning import bump_airports_version, bump_flights_versions
+
+logger = logging.getLogger(__name__)
+
+# Поля, по которым рейс считается тем же самым (см. Flight.Meta.constraints)
+FLIGHT_KEY = ('icao24', 'first_seen')
+UNIQUE_FIELDS = ['icao24', 'first_seen']
+UPDATE_FIELDS = [
+    'callsign', 'departure_airport', 'arrival_airport', 'last_seen',
+    'duration_minutes', 'distance_km', 'opensky_data', 'last_updated',
+]
+
+# Сколько строк пишется за один INSERT и одну транзакцию
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _timestamp(value):
+    return datetime.fromtimestamp(value or 0, tz=dt_timezone.utc)
+
+
+# Разбирает рейс из ответа OpenSky. Возвращает словарь полей Flight или None,
+# если нет позывного, второго аэропорта или ключа рейса (icao24, firstSeen)
+def parse_flight(flight_data, airport_icao, is_departure):
+    callsign = (flight_data.get('callsign') or '').strip()
+    if not callsign or not flight_data.get('icao24') or not flight_data.get('firstSeen'):
+        return None
+
+    other_airport_icao = flight_data.get('estArrivalAirport' if is_departure else 'estDepartureAirport')
+    if not other_airport_icao:
+        return None
+
+    first_seen = flight_data.get('firstSeen') or 0
+    last_seen = flight_data.get('lastSeen') or 0
+    return {
+        'callsign': callsign,
+        'icao24': flight_data.get('icao24'),
+        'departure_airport_id': airport_icao if is_departure else other_airport_icao,
+        'arrival_airport_id': other_airport_icao if is_departure else airport_icao,
+        'first_seen': _timestamp(first_seen),
+        'last_seen': _timestamp(last_seen),
+        'duration_minutes': (last_seen - first_seen) // 60,
+        'opensky_data': flight_data,
+    }
+
+
+# Все рейсы из ответа get_flights_by_airport (вылеты и прилеты)
+def parse_flights(data, airport_icao):
+    for is_departure, flight_type in ((True, 'departures'), (False, 'arrivals')):
+        for flight_data in data.get(flight_type, []):
+            row = parse_flight(flight_data, airport_icao, is_departure)
+            if row:
+                yield row
+
+
+# То же для потока рейсов из iter_flights_by_airport: вылет или прилет
+# определяется по полям самого рейса, как в fetch_flights_by_airport
+def parse_flight_stream(records, airport_icao):
+    for flight_data in records:
+        for is_departure, field in ((True, 'estDepartureAirport'), (False, 'estArrivalAirport')):
+            if flight_data.get(field) == airport_icao:
+                row = parse_flight(flight_data, airport_icao, is_departure)
+                if row:
+                    yield row
+
+
+# Повторы одного рейса внутри пачки (вылет из A и прилет в B) сливаются в одну
+# строку: ON CONFLICT не может обновить одну строку дважды за один INSERT
+def dedupe_rows(rows):
+    merged = {}
+    for row in rows:
+        key = tuple(row[field] for field in FLIGHT_KEY)
+        previous = merged.get(key)
+        if previous is not None and previous['last_seen'] > row['last_seen']:
+            row = {**row, 'last_seen': previous['last_seen'], 'duration_minutes': previous['duration_minutes']}
+        merged[key] = row
+    return list(merged.values())
+
+
+class FlightWriter:
+    """Пакетная запись рейсов.
+
+    На каждую пачку: один запрос на поиск аэропортов, один bulk_create для
+    недостающих аэропортов-заглушек, расстояния маршрутов из RouteDistance
+    и upsert рейсов через bulk_create(update_conflicts=True) в одной транзакции.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.rows_written = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows_written / self.seconds if self.seconds else 0.0
+
+    def write(self, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self.write_batch(batch)
+                batch = []
+        if batch:
+            self.write_batch(batch)
+
+    def write_batch(self, rows):
+        started = time.perf_counter()
+
+        rows = dedupe_rows(rows)
+
+        airports = {row['departure_airport_id'] for row in rows} | {row['arrival_airport_id'] for row in rows}
+        with transaction.atomic():
+            self.ensure_airports(airports)
+            distances = get_route_distances(
+                (row['departure_airport_id'], row['arrival_airport_id']) for row in rows
+            )
+            flights = [
+                Flight(
+                    distance_km=distances.get((row['departure_airport_id'], row['arrival_airport_id']), 0),
+                    **row
+                )
+                for row in rows
+            ]
+            Flight.objects.bulk_create(
+                flights,
+                update_conflicts=True,
+                unique_fields=UNIQUE_FIELDS,
+                update_fields=UPDATE_FIELDS,
+            )
+            # Кэш результатов по радиусу (frontend/radius_cache.py) для этих аэропортов устарел
+            transaction.on_commit(lambda: bump_flights_versions(airports))
+
+        self.rows_written += len(rows)
+        self.seconds += time.perf_counter() - started
+        logger.debug(f"Записано {len(rows)} рейсов")
+
+    # Создает заглушки для аэропортов, которых еще нет в справочнике
+    def ensure_airports(self, icao_codes):
+        existing = set(Airport.objects.filter(icao_code__in=icao_codes).values_list('icao_code', flat=True))
+        missing = icao_codes - existing
+        if not missing:
+            return
+
+        Airport.objects.bulk_create([
+            Airport(
+                icao_code=icao,
+                name=f'Аэропорт {icao}',
+                city='Неизвестно',
+                country='Неизвестно',
+                latitude=0,
+                longitude=0
+            )
+            for icao in missing
+        ], ignore_conflicts=True)
+        # bulk_create не посылает post_save, версию поднимаем после коммита
+        transaction.on_commit(bump_airports_version)
+
+
+class WatermarkTracker:
+    """Продвигает watermark аэропорта только по непрерывной цепочке загруженных окон.
+
+    Окна одного аэропорта могут завершиться в любом порядке; если какое-то
+    окно не загрузилось, watermark останавливается перед ним и следующий
+    запуск начнет с этого места.
+    """
+
+    def __init__(self, windows):
+        self.pending = {icao: [end for _, end in chunks] for icao, chunks in windows.items()}
+        self.done = {icao: set() for icao in windows}
+
+    # Отмечает окно загруженным, возвращает новый watermark или None
+    def complete(self, airport_icao, end):
+        self.done[airport_icao].add(end)
+        pending = self.pending[airport_icao]
+        watermark = None
+        while pending and pending[0] in self.done[airport_icao]:
+            watermark = pending.pop(0)
+        return watermark
+
+
+# Watermark аэропортов (unix time); без icao_codes - всех аэропортов.
+# Коды запрашиваются частями: IN на десятки тысяч аэропортов (--limit 0)
+# упирается в лимит параметров SQLite
+def load_watermarks(icao_codes=None):
+    if icao_codes is None:
+        batches = [IngestWatermark.objects.all()]
+    else:
+        batches = (IngestWatermark.objects.filter(airport_id__in=codes) for codes in _chunks(icao_codes))
+    return {
+        airport_id: int(last_end.timestamp())
+        for watermarks in batches
+        for airport_id, last_end in watermarks.values_list('airport_id', 'last_end')
+    }
+
+
+def save_watermark(airport_icao, end):
+    IngestWatermark.objects.update_or_create(
+        airport_id=airport_icao,
+        defaults={'last_end': _timestamp(end)}
+    )
@@ -1,36 +1,243 @@
+import asyncio
 import requests
+import aiohttp
+import codecs
 import json
 import time
 import os
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
+from concurrent.futures import Future
+from django.conf import settings
 from django.utils import timezone
 from django.core.cache import cache
 import logging
+import threading
 
 
 logger = logging.getLogger(__name__)
 load_dotenv()
 
+# Максимальный интервал одного запроса к /flights/airport, длинные окна делятся на части
+MAX_INTERVAL_SECONDS = 2 * 24 * 3600
+
+
+# Делит окно [begin, end) на интервалы не длиннее chunk_seconds
+def time_chunks(begin, end, chunk_seconds=MAX_INTERVAL_SECONDS):
+    chunks = []
+    while begin < end:
+        chunk_end = min(begin + chunk_seconds, end)
+        chunks.append((begin, chunk_end))
+        begin = chunk_end
+    return chunks
+
+
+# Поля вектора состояния в ответе /states/all, по порядку
+STATE_FIELDS = (
+    'icao24', 'callsign', 'origin_country', 'time_position', 'last_contact',
+    'longitude', 'latitude', 'baro_altitude', 'on_ground', 'velocity',
+    'true_track', 'vertical_rate', 'sensors', 'geo_altitude', 'squawk',
+    'spi', 'position_source',
+)
+
+# Размер куска, читаемого из сокета при потоковом разборе ответа, байт
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+# Разбирает JSON-массив объектов по кускам текста и отдает элементы по одному.
+# В памяти держится только недочитанный хвост, а не весь ответ
+def iter_json_array(chunks):
+    buffer = ''
+    pos = 0
+    started = False
+    finished = False
+
+    for chunk in chunks:
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos == len(buffer) or finished:
+                break
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError('Ответ OpenSky не является JSON-массивом')
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ',':
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                finished = True
+                pos += 1
+                continue
+            try:
+                item, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Элемент дочитается со следующим куском
+                break
+            if end == len(buffer) and not isinstance(item, (dict, list)):
+                # Число или литерал на границе куска может быть обрезано
+                break
+            pos = end
+            yield item
+
+    if buffer[pos:].strip() or not finished:
+        raise ValueError('Ответ OpenSky оборван или содержит лишние данные')
+
+
+# Запросы к OpenSky, которые сейчас выполняются в этом процессе: ключ кэша -> Future
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+# То же для async views: ключ кэша -> asyncio.Task, и фоновые обновления кэша
+_async_inflight = {}
+_background_tasks = set()
+
+
+# Выполняет fetch один раз на ключ: параллельные вызовы с тем же ключом
+# ждут результата первого вместо собственного запроса к API
+def single_flight(key, fetch):
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _inflight[key] = future
+
+    if not leader:
+        return future.result()
+
+    try:
+        result = fetch()
+        future.set_result(result)
+        return result
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+# Асинхронный single_flight для одного цикла событий: параллельные корутины
+# с тем же ключом ждут одну задачу. shield - отмена одного клиента
+# (закрыл соединение) не отменяет запрос, которого ждут остальные
+async def async_single_flight(key, fetch):
+    task = _async_inflight.get(key)
+    if task is None or task.get_loop() is not asyncio.get_running_loop():
+        task = asyncio.ensure_future(fetch())
+        _async_inflight[key] = task
+        task.add_done_callback(lambda done: _async_inflight.pop(key, None) if _async_inflight.get(key) is done else None)
+    return await asyncio.shield(task)
+
+
+# OpenSky возвращает массив рейсов
+# Разделим на вылеты и прилеты по полю 'estDepartureAirport'
+def split_flights(data, airport_icao):
+    return {
+        'departures': [f for f in data if f.get('estDepartureAirport') == airport_icao],
+        'arrivals': [f for f in data if f.get('estArrivalAirport') == airport_icao],
+    }
+
+
+# OpenSky ответил 429: кредиты запросов исчерпаны. retry_after - через сколько
+# секунд можно повторить (заголовок X-Rate-Limit-Retry-After-Seconds), если известно
+class RateLimited(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__(f"Лимит запросов OpenSky исчерпан, повтор через {retry_after} с")
+        self.retry_after = retry_after
+
+
 class OpenSkyService:
     BASE_URL = "https://opensky-network.org/api"
 
-    def __init__(self, username=os.getenv('OpenSky_username'), password=os.getenv('OpenSky_password')):
+    def __init__(self, username=os.getenv('OpenSky_username'), password=os.getenv('OpenSky_password'), base_url=None):
         # Для публичного API не нужны учетные данные
         self.username = username
         self.password = password
+        # Адрес API можно переопределить (локальная заглушка, см. opensky_standin)
+        self.base_url = (
+            base_url
+            or getattr(settings, 'OPENSKY_BASE_URL', None)
+            or os.getenv('OPENSKY_BASE_URL')
+            or self.BASE_URL
+        )
         self.session = requests.Session()
+        # Сессия aiohttp для async-методов: создается при первом запросе и
+        # живет вместе с сервисом (см. _aiohttp_session, aclose)
+        self._asession = None
+        self._asession_loop = None
+        # Свежесть ответа в кэше и сколько еще его можно отдавать устаревшим, сек
+        self.cache_ttl = getattr(settings, 'OPENSKY_CACHE_TTL', 300)
+        self.cache_stale_ttl = getattr(settings, 'OPENSKY_CACHE_STALE_TTL', 1800)
     
-    def get_flights_by_airport(self, airport_icao, hours=24):
-        # Получить исторические рейсы аэропорта
-        print(f"Получаем исторические рейсы для {airport_icao} за {hours} часов", flush=True)
+    def get_flights_by_airport(self, airport_icao, hours=24, begin=None, end=None):
+        # Рейсы аэропорта за последние hours часов через кэш. Явное окно
+        # [begin, end] (импорт по watermark) всегда запрашивается у API
+        if begin is not None or end is not None or not self.cache_ttl:
+            return self.fetch_flights_by_airport(airport_icao, hours, begin, end)
+        return self.get_cached_flights_by_airport(airport_icao, hours)
+    
+    def _cache_key(self, airport_icao, hours):
+        return f"opensky:flights:{airport_icao}:{hours}"
+    
+    def get_cached_flights_by_airport(self, airport_icao, hours=24):
+        """Кэш с stale-while-revalidate.
+
+        Запись хранит номер временного интервала (time bucket) длиной cache_ttl.
+        Запись текущего интервала отдается сразу. Запись предыдущих интервалов
+        (не старше cache_stale_ttl) тоже отдается сразу, а обновляет ее в фоне
+        только тот воркер, который взял блокировку в кэше. Без записи запрос
+        к API выполняется один раз на процесс (single_flight).
+        """
+        key = self._cache_key(airport_icao, hours)
+        bucket = int(time.time()) // self.cache_ttl
+        entry = cache.get(key)
         
+        if entry is not None and entry['bucket'] == bucket:
+            return entry['data']
+        
+        if entry is not None:
+            if cache.add(f"{key}:lock", 1, timeout=self.cache_ttl):
+                self.start_background(lambda: self._revalidate(key, airport_icao, hours))
+            return entry['data']
+        
+        return single_flight(key, lambda: self._refresh(key, airport_icao, hours))
+    
+    def _refresh(self, key, airport_icao, hours):
+        data = self.fetch_flights_by_airport(airport_icao, hours)
+        if data is not None:
+            cache.set(key, {
+                'data': data,
+                'bucket': int(time.time()) // self.cache_ttl,
+            }, timeout=self.cache_ttl + self.cache_stale_ttl)
+        return data
+    
+    def _revalidate(self, key, airport_icao, hours):
+        try:
+            single_flight(key, lambda: self._refresh(key, airport_icao, hours))
+        finally:
+            cache.delete(f"{key}:lock")
+    
+    # Фоновое обновление кэша; в тестах можно заменить синхронным вызовом
+    def start_background(self, target):
+        threading.Thread(target=target, daemon=True).start()
+    
+    def fetch_flights_by_airport(self, airport_icao, hours=24, begin=None, end=None):
+        # Получить исторические рейсы аэропорта за последние hours часов
+        # или за окно [begin, end] (unix time), например от watermark до текущего момента
         try:
-            import time
-            end_time = int(time.time())
-            start_time = end_time - (hours * 3600)
+            end_time = int(end if end is not None else time.time())
+            start_time = int(begin if begin is not None else end_time - (hours * 3600))
+            print(f"Получаем исторические рейсы для {airport_icao} за {(end_time - start_time) / 3600:.1f} часов", flush=True)
             
-            url = f"{self.BASE_URL}/flights/airport"
+            url = f"{self.base_url}/flights/airport"
             params = {
                 'airport': airport_icao,  # Используем icao кода аэропорта
                 'begin': start_time,
@@ -50,15 +257,10 @@ class OpenSkyService:
                 print(f"Получено {len(data)} рейсов", flush=True)
                 print(f"Пример рейса: {data[0] if data else 'Нет данных'}", flush=True)
                 
-                # OpenSky возвращает массив рейсов
-                # Разделим на вылеты и прилеты по полю 'estDepartureAirport'
-                departures = [f for f in data if f.get('estDepartureAirport') == airport_icao]
-                arrivals = [f for f in data if f.get('estArrivalAirport') == airport_icao]
-                
-                return {
-                    'departures': departures,
-                    'arrivals': arrivals
-                }
+                return split_flights(data, airport_icao)
+            elif response.status_code == 404:
+                # OpenSky отвечает 404, если в окне нет рейсов - это не ошибка
+                return split_flights([], airport_icao)
             else:
                 print(f"Ошибка API: {response.status_code} - {response.text}", flush=True)
                 return None
@@ -67,4 +269,122 @@ class OpenSkyService:
             print(f"Ошибка: {e}", flush=True)
             import traceback
             traceback.print_exc()
-            return  None
\ No newline at end of file
+            return  None
+    
+    async def aget_flights_by_airport(self, airport_icao, hours=24):
+        """Асинхронный get_flights_by_airport для async views (ASGI).
+
+        Тот же кэш stale-while-revalidate и тот же формат ответа, но запрос
+        к OpenSky идет через aiohttp и не занимает поток, пока API отвечает.
+        Кэш читается через асинхронный API (aget, aadd, aset, adelete), чтобы
+        сетевой бэкенд не блокировал цикл событий.
+        """
+        if not self.cache_ttl:
+            return await self.afetch_flights_by_airport(airport_icao, hours)
+
+        key = self._cache_key(airport_icao, hours)
+        bucket = int(time.time()) // self.cache_ttl
+        entry = await cache.aget(key)
+
+        if entry is not None and entry['bucket'] == bucket:
+            return entry['data']
+
+        if entry is not None:
+            if await cache.aadd(f"{key}:lock", 1, timeout=self.cache_ttl):
+                task = asyncio.ensure_future(self._arevalidate(key, airport_icao, hours))
+                # Ссылка на задачу, чтобы ее не собрал сборщик мусора до завершения
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+            return entry['data']
+
+        return await async_single_flight(key, lambda: self._arefresh(key, airport_icao, hours))
+
+    async def _arefresh(self, key, airport_icao, hours):
+        data = await self.afetch_flights_by_airport(airport_icao, hours)
+        if data is not None:
+            await cache.aset(key, {
+                'data': data,
+                'bucket': int(time.time()) // self.cache_ttl,
+            }, timeout=self.cache_ttl + self.cache_stale_ttl)
+        return data
+
+    async def _arevalidate(self, key, airport_icao, hours):
+        try:
+            await async_single_flight(key, lambda: self._arefresh(key, airport_icao, hours))
+        finally:
+            await cache.adelete(f"{key}:lock")
+
+    # Сессия привязана к циклу событий, в котором создана: в другом цикле
+    # (asyncio.run в тестах и командах) открывается новая
+    def _aiohttp_session(self):
+        loop = asyncio.get_running_loop()
+        if self._asession is None or self._asession.closed or self._asession_loop is not loop:
+            self._asession = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+            self._asession_loop = loop
+        return self._asession
+
+    async def aclose(self):
+        if self._asession is not None and self._asession_loop is asyncio.get_running_loop():
+            await self._asession.close()
+        self._asession = None
+        self._asession_loop = None
+
+    async def afetch_flights_by_airport(self, airport_icao, hours=24):
+        # Рейсы аэропорта за последние hours часов через aiohttp; None при ошибке
+        end_time = int(time.time())
+        params = {'airport': airport_icao, 'begin': end_time - hours * 3600, 'end': end_time}
+        auth = aiohttp.BasicAuth(self.username, self.password) if self.username else None
+        try:
+            session = self._aiohttp_session()
+            async with session.get(f"{self.base_url}/flights/airport", params=params, auth=auth) as response:
+                if response.status == 404:
+                    return split_flights([], airport_icao)
+                if response.status != 200:
+                    logger.warning(f"OpenSky /flights/airport: {response.status}")
+                    return None
+                return split_flights(await response.json(content_type=None), airport_icao)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.error(f"Ошибка загрузки рейсов {airport_icao}: {e}")
+            return None
+    
+    def iter_flights_by_airport(self, airport_icao, begin, end):
+        """Потоковый вариант fetch_flights_by_airport для импорта.
+
+        Ответ читается из сокета кусками и разбирается по мере поступления,
+        рейсы отдаются по одному, поэтому память не зависит от длины окна.
+        Ошибки HTTP и оборванный ответ выбрасываются как исключения.
+        """
+        url = f"{self.base_url}/flights/airport"
+        params = {'airport': airport_icao, 'begin': int(begin), 'end': int(end)}
+        auth = (self.username, self.password)
+
+        with self.session.get(url, params=params, auth=auth, timeout=30, stream=True) as response:
+            if response.status_code == 404:
+                # OpenSky отвечает 404, если в окне нет рейсов
+                return
+            response.raise_for_status()
+
+            decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')()
+            chunks = (decoder.decode(chunk) for chunk in response.iter_content(STREAM_CHUNK_SIZE))
+            yield from iter_json_array(chunks)
+    
+    def get_states(self, bbox=None):
+        # Текущие состояния всех самолетов (или в bbox = (lamin, lomin, lamax, lomax)):
+        # {'time': ..., 'states': [[...], ...]}, поля состояния - STATE_FIELDS.
+        # None при ошибке, RateLimited при исчерпанных кредитах
+        params = {}
+        if bbox:
+            params = dict(zip(('lamin', 'lomin', 'lamax', 'lomax'), bbox))
+        auth = (self.username, self.password) if self.username else None
+        try:
+            response = self.session.get(f"{self.base_url}/states/all", params=params, auth=auth, timeout=30)
+            if response.status_code == 429:
+                retry_after = response.headers.get('X-Rate-Limit-Retry-After-Seconds', '')
+                raise RateLimited(int(retry_after) if retry_after.isdigit() else None)
+            if response.status_code != 200:
+                logger.warning(f"OpenSky /states/all: {response.status_code}")
+                return None
+            return response.json()
+        except requests.RequestException as e:
+            logger.error(f"Ошибка загрузки состояний: {e}")
+            return None
@@ -0,0 +1,237 @@
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+# Код аэропорта из запроса попадает в имя файла записи - только буквы и цифры
+AIRPORT_CODE = re.compile(r'[A-Z0-9]{1,8}')
+
+
+def synthetic_airport_codes(count):
+    return [f'Z{i:03d}' for i in range(count)]
+
+
+class StandinConfig:
+    """Параметры заглушки OpenSky.
+
+    latency и jitter - задержка ответа в секундах (latency ± jitter),
+    error_rate - доля ответов 503, flights - рейсов на запрос /flights/airport,
+    states - самолетов в /states/all. Если задан record_dir, ответы берутся
+    из записанных файлов, а при заданном upstream недостающие запрашиваются
+    у настоящего API и сохраняются туда же. upstream_auth - (логин, пароль)
+    для upstream, по умолчанию из OpenSky_username/OpenSky_password, как
+    у OpenSkyService: без авторизации /flights/airport отвечает ошибкой.
+    Записываются только успешные ответы (200 и 404 - пустое окно), ошибки
+    upstream передаются клиенту как есть.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, flights=100, states=1000,
+                 airports=None, record_dir=None, upstream=None, upstream_auth=None, seed=42):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.flights = flights
+        self.states = states
+        self.airports = airports or synthetic_airport_codes(50)
+        self.record_dir = record_dir
+        self.upstream = upstream
+        if upstream_auth is None and os.getenv('OpenSky_username'):
+            upstream_auth = (os.getenv('OpenSky_username'), os.getenv('OpenSky_password'))
+        self.upstream_auth = upstream_auth
+        self.seed = seed
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        route = url.path.rstrip('/')
+
+        delay = self.config.latency + random.uniform(-self.config.jitter, self.config.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if random.random() < self.config.error_rate:
+            return self.send_json(503, {'error': 'Service Unavailable (stand-in)'})
+
+        if route.endswith('/flights/airport'):
+            airport = params.get('airport', '').upper()
+            if not AIRPORT_CODE.fullmatch(airport):
+                return self.send_json(400, {'error': 'Invalid airport code'})
+            begin, end = int(params.get('begin', 0)), int(params.get('end', 0))
+            status, body = self.recorded(f'flights_airport_{airport}_{begin}_{end}.json', url)
+            if status is None:
+                body = self.synthetic_flights(airport, begin, end)
+        elif route.endswith('/states/all'):
+            status, body = self.recorded(self.states_record_name(params), url)
+            if status is None:
+                body = self.synthetic_states(params)
+        else:
+            return self.send_json(404, {'error': 'Not Found'})
+
+        if status not in (None, 200):
+            return self.send_json(status, body)
+        if body == []:
+            # Как настоящий API: пустое окно - это 404
+            return self.send_json(404, [])
+        self.send_json(200, body)
+
+    def recorded(self, name, url):
+        """(статус, тело) из записи или от upstream; (None, None), если
+        ответа нет и его нужно синтезировать."""
+        record_dir = self.config.record_dir
+        if not record_dir:
+            return None, None
+
+        path = os.path.join(record_dir, name)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                return 200, json.load(f)
+
+        if not self.config.upstream:
+            return None, None
+        # upstream - адрес API, например https://opensky-network.org/api
+        api_path = url.path[len('/api'):] if url.path.startswith('/api') else url.path
+        try:
+            response = requests.get(
+                f'{self.config.upstream}{api_path}', params=url.query, auth=self.config.upstream_auth, timeout=60
+            )
+        except requests.RequestException as e:
+            logger.warning('upstream %s: %s', api_path, e)
+            return 502, {'error': f'Upstream unavailable: {e}'}
+
+        if response.status_code == 404:
+            # Пустое окно - тоже ответ, его можно записать
+            body = []
+        elif response.status_code == 200:
+            body = response.json()
+        else:
+            # 401, 429, 5xx не записываются, иначе повторялись бы как пустое окно
+            try:
+                body = response.json()
+            except ValueError:
+                body = {'error': response.text[:200]}
+            return response.status_code, body
+
+        os.makedirs(record_dir, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(body, f)
+        return 200, body
+
+    @staticmethod
+    def states_record_name(params):
+        # Запись на каждую рамку bbox, как у рейсов - на аэропорт и окно
+        # (через float: 40 и 40.0 - одна рамка, и в имя файла не попадет лишнего)
+        bbox = [float(params[key]) for key in ('lamin', 'lomin', 'lamax', 'lomax') if key in params]
+        if not bbox:
+            return 'states_all.json'
+        return 'states_all_{}.json'.format('_'.join(f'{value:g}' for value in bbox))
+
+    # Одинаковый запрос дает одинаковый ответ, чтобы повторные прогоны были сравнимы
+    def rng(self, *key):
+        return random.Random(zlib.crc32(repr((self.config.seed,) + key).encode()))
+
+    def synthetic_flights(self, airport, begin, end):
+        rng = self.rng(airport, begin, end)
+        others = [code for code in self.config.airports if code != airport] or ['ZZZZ']
+        span = max(end - begin, 1)
+        flights = []
+        for i in range(self.config.flights):
+            first_seen = begin + rng.randrange(span)
+            departure = rng.random() < 0.5
+            other = rng.choice(others)
+            flights.append({
+                'icao24': f'{rng.randrange(16 ** 6):06x}',
+                'firstSeen': first_seen,
+                'estDepartureAirport': airport if departure else other,
+                'lastSeen': first_seen + rng.randrange(1800, 6 * 3600),
+                'estArrivalAirport': other if departure else airport,
+                'callsign': f'SB{rng.randrange(10000):04d}  ',
+                'estDepartureAirportHorizDistance': rng.randrange(5000),
+                'estDepartureAirportVertDistance': rng.randrange(500),
+                'estArrivalAirportHorizDistance': rng.randrange(5000),
+                'estArrivalAirportVertDistance': rng.randrange(500),
+                'departureAirportCandidatesCount': 1,
+                'arrivalAirportCandidatesCount': 1,
+            })
+        return flights
+
+    def synthetic_states(self, params):
+        now = int(time.time())
+        rng = self.rng('states', now // 10)
+        lamin, lamax = float(params.get('lamin', -90)), float(params.get('lamax', 90))
+        lomin, lomax = float(params.get('lomin', -180)), float(params.get('lomax', 180))
+        states = []
+        for i in range(self.config.states):
+            lat, lon = rng.uniform(-70, 70), rng.uniform(-180, 180)
+            if not (lamin <= lat <= lamax and lomin <= lon <= lomax):
+                continue
+            on_ground = rng.random() < 0.1
+            states.append([
+                f'{i:06x}', f'SB{i % 10000:04d}  ', 'Standin', now - rng.randrange(10), now,
+                lon, lat, 0.0 if on_ground else rng.uniform(1000, 12000), on_ground,
+                rng.uniform(0, 260), rng.uniform(0, 360), rng.uniform(-10, 10), None,
+                rng.uniform(1000, 12000), f'{rng.randrange(7777):04d}', False, 0,
+            ])
+        return {'time': now, 'states': states}
+
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+class OpenSkyStandin:
+    """Локальный сервер с API OpenSky (/api/flights/airport, /api/states/all).
+
+    Использование: with OpenSkyStandin(config) as standin: ... standin.base_url
+    """
+
+    def __init__(self, config=None, host='127.0.0.1', port=0):
+        self.server = ThreadingHTTPServer((host, port), StandinHandler)
+        self.server.daemon_threads = True
+        self.server.config = config or StandinConfig()
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/api'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
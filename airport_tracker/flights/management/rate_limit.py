@@ -0,0 +1,57 @@
+import threading
+import time
+
+# Ограничения OpenSky для авторизованного пользователя: запросы расходуют
+# дневной лимит кредитов, поэтому по умолчанию не больше 1 запроса в секунду
+DEFAULT_RATE = 1.0
+DEFAULT_BURST = 4
+
+
+class TokenBucket:
+    """Потокобезопасный token bucket: rate токенов в секунду, не больше capacity в запасе."""
+
+    def __init__(self, rate=DEFAULT_RATE, capacity=DEFAULT_BURST, clock=time.monotonic, sleep=time.sleep):
+        # При rate <= 0 ожидание токена делит на ноль или не кончается
+        if not rate > 0:
+            raise ValueError(f'rate должен быть больше 0, получено {rate}')
+        if capacity < 1:
+            raise ValueError(f'capacity должен быть не меньше 1, получено {capacity}')
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    # Больше capacity токенов в запасе не бывает: acquire ждал бы их вечно
+    def _check(self, tokens):
+        if not 1 <= tokens <= self.capacity:
+            raise ValueError(f'tokens должно быть от 1 до {self.capacity}, получено {tokens}')
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Пытается взять токен без ожидания
+    def try_acquire(self, tokens=1):
+        self._check(tokens)
+        with self.lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    # Ждет, пока не появится токен
+    def acquire(self, tokens=1):
+        self._check(tokens)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            self.sleep(wait)
@@ -0,0 +1,137 @@
+import heapq
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from flights.models import Flight
+
+# Границы интервала обновления аэропорта, сек
+MIN_INTERVAL = 15 * 60
+MAX_INTERVAL = 24 * 3600
+
+# Сколько новых рейсов в среднем должно набираться между обновлениями:
+# для хаба с 1500 рейсами в сутки это ~20 минут, для тихого аэродрома - MAX_INTERVAL
+FLIGHTS_PER_REFRESH = 20
+
+# Через сколько секунд повторить аэропорты, импорт которых упал
+RETRY_DELAY = 60
+
+# За какой период считается трафик аэропорта, сек
+TRAFFIC_WINDOW = 24 * 3600
+
+METRICS_KEY = 'flights:ingest:metrics'
+METRICS_TIMEOUT = 3600
+
+
+# Интервал обновления обратно пропорционален трафику аэропорта
+def refresh_interval(flights_per_day, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL):
+    if flights_per_day <= 0:
+        return max_interval
+    interval = FLIGHTS_PER_REFRESH * 86400 / flights_per_day
+    return int(min(max(interval, min_interval), max_interval))
+
+
+# Вылеты + прилеты аэропортов за последние window секунд (два агрегатных запроса)
+def load_traffic(now=None, window=TRAFFIC_WINDOW):
+    now = now if now is not None else time.time()
+    since = datetime.fromtimestamp(now - window, tz=dt_timezone.utc)
+    traffic = {}
+    for field in ('departure_airport', 'arrival_airport'):
+        rows = (
+            Flight.objects.filter(first_seen__gte=since).exclude(**{field: None})
+            .values_list(field).annotate(flights=Count('id')).order_by()
+        )
+        for icao, flights in rows:
+            traffic[icao] = traffic.get(icao, 0) + flights
+    # Окно короче суток - пересчитываем в рейсы в сутки
+    return {icao: flights * 86400 / window for icao, flights in traffic.items()}
+
+
+class IngestScheduler:
+    """Очередь обновления аэропортов по времени следующего запуска.
+
+    Куча (next_run, icao) дает ближайшие аэропорты за O(log n); интервал
+    каждого аэропорта зависит от его трафика (refresh_interval). Метрики:
+    queue_depth - сколько аэропортов уже пора обновить, lag - насколько
+    опаздывает самый просроченный из них.
+    """
+
+    def __init__(self, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.intervals = {}
+        self.next_runs = {}
+        self._heap = []
+
+    def __len__(self):
+        return len(self.next_runs)
+
+    def sync(self, airports, traffic, last_runs, now):
+        """Пересчитывает интервалы по трафику и ставит в очередь новые аэропорты.
+
+        last_runs - watermark аэропортов (unix time): аэропорт, загруженный
+        недавно, ждет свой интервал, а без watermark ставится сразу.
+        """
+        new_airports = [icao for icao in airports if icao not in self.intervals]
+        for icao in airports:
+            self.intervals[icao] = refresh_interval(traffic.get(icao, 0), self.min_interval, self.max_interval)
+        for icao in new_airports:
+            last_run = last_runs.get(icao)
+            self.schedule(icao, now if last_run is None else last_run + self.intervals[icao])
+
+    def schedule(self, icao, next_run):
+        self.next_runs[icao] = next_run
+        heapq.heappush(self._heap, (next_run, icao))
+
+    # Убирает из кучи записи, замененные более поздним schedule()
+    def _peek(self):
+        while self._heap:
+            next_run, icao = self._heap[0]
+            if self.next_runs.get(icao) == next_run:
+                return next_run, icao
+            heapq.heappop(self._heap)
+        return None
+
+    def next_run(self):
+        head = self._peek()
+        return head[0] if head else None
+
+    # До limit аэропортов, которые пора обновить, самые просроченные первыми
+    def pop_due(self, now, limit=None):
+        due = []
+        while limit is None or len(due) < limit:
+            head = self._peek()
+            if head is None or head[0] > now:
+                break
+            heapq.heappop(self._heap)
+            del self.next_runs[head[1]]
+            due.append(head[1])
+        return due
+
+    def completed(self, icao, now):
+        self.schedule(icao, now + self.intervals[icao])
+
+    # Импорт не удался: аэропорт уже снят pop_due и возвращается в очередь,
+    # но не позже, чем через свой обычный интервал
+    def failed(self, icao, now, delay=RETRY_DELAY):
+        self.schedule(icao, now + min(delay, self.intervals[icao]))
+
+    def metrics(self, now):
+        overdue = [next_run for next_run in self.next_runs.values() if next_run <= now]
+        return {
+            'airports': len(self.next_runs),
+            'queue_depth': len(overdue),
+            'lag_seconds': round(now - min(overdue), 1) if overdue else 0.0,
+            'next_run_in_seconds': round(max(0.0, self.next_run() - now), 1) if self.next_runs else None,
+            'updated_at': int(now),
+        }
+
+
+def publish_metrics(metrics):
+    cache.set(METRICS_KEY, metrics, METRICS_TIMEOUT)
+
+
+def get_metrics():
+    return cache.get(METRICS_KEY)
@@ -0,0 +1,109 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='flight',
+            options={'ordering': ['-last_seen']},
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='callsign',
+            field=models.CharField(db_index=True, default='', max_length=10),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='distance_km',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='duration_minutes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='first_seen',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='icao24',
+            field=models.CharField(blank=True, max_length=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='last_seen',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='last_updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='opensky_data',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterModelTable(
+            name='flight',
+            table='flights',
+        ),
+        migrations.CreateModel(
+            name='Airport',
+            fields=[
+                ('icao_code', models.CharField(max_length=8, primary_key=True, serialize=False)),
+                ('iata_code', models.CharField(blank=True, max_length=3)),
+                ('name', models.CharField(max_length=200)),
+                ('city', models.CharField(max_length=100)),
+                ('country', models.CharField(max_length=100)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+            ],
+            options={
+                'db_table': 'airports',
+                'ordering': ['name'],
+                'indexes': [models.Index(fields=['latitude', 'longitude'], name='airports_latitud_b39ec0_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='arrival_airport',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='arrivals', to='flights.airport'),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='departure_airport',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='departures', to='flights.airport'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['callsign'], name='flights_callsig_e8282c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['departure_airport', 'arrival_airport'], name='flights_departu_65e941_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['last_updated'], name='flights_last_up_cbf4d0_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0002_alter_flight_options_flight_callsign_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteDistance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('departure_icao', models.CharField(max_length=8)),
+                ('arrival_icao', models.CharField(max_length=8)),
+                ('distance_km', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'route_distances',
+                'constraints': [models.UniqueConstraint(fields=('departure_icao', 'arrival_icao'), name='unique_route_distance')],
+            },
+        ),
+    ]
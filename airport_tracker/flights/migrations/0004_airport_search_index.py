@@ -0,0 +1,73 @@
+from django.db import migrations
+
+SEARCH_COLUMNS = ('name', 'city', 'country', 'icao_code', 'iata_code')
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS airports_fts USING fts5("
+    "name, city, country, icao_code, iata_code, "
+    "content='airports', content_rowid='rowid', tokenize='trigram')",
+
+    "CREATE TRIGGER IF NOT EXISTS airports_fts_insert AFTER INSERT ON airports BEGIN "
+    "INSERT INTO airports_fts(rowid, name, city, country, icao_code, iata_code) "
+    "VALUES (new.rowid, new.name, new.city, new.country, new.icao_code, new.iata_code); END",
+
+    "CREATE TRIGGER IF NOT EXISTS airports_fts_delete AFTER DELETE ON airports BEGIN "
+    "INSERT INTO airports_fts(airports_fts, rowid, name, city, country, icao_code, iata_code) "
+    "VALUES ('delete', old.rowid, old.name, old.city, old.country, old.icao_code, old.iata_code); END",
+
+    "CREATE TRIGGER IF NOT EXISTS airports_fts_update AFTER UPDATE ON airports BEGIN "
+    "INSERT INTO airports_fts(airports_fts, rowid, name, city, country, icao_code, iata_code) "
+    "VALUES ('delete', old.rowid, old.name, old.city, old.country, old.icao_code, old.iata_code); "
+    "INSERT INTO airports_fts(rowid, name, city, country, icao_code, iata_code) "
+    "VALUES (new.rowid, new.name, new.city, new.country, new.icao_code, new.iata_code); END",
+
+    "INSERT INTO airports_fts(airports_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS airports_fts_insert",
+    "DROP TRIGGER IF EXISTS airports_fts_delete",
+    "DROP TRIGGER IF EXISTS airports_fts_update",
+    "DROP TABLE IF EXISTS airports_fts",
+]
+
+POSTGRES_CREATE = ["CREATE EXTENSION IF NOT EXISTS pg_trgm"] + [
+    f"CREATE INDEX IF NOT EXISTS airports_{column}_trgm ON airports USING gin (UPPER({column}::text) gin_trgm_ops)"
+    for column in SEARCH_COLUMNS
+]
+
+POSTGRES_DROP = [f"DROP INDEX IF EXISTS airports_{column}_trgm" for column in SEARCH_COLUMNS]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+# Поисковый индекс зависит от СУБД: FTS5 для SQLite, pg_trgm для PostgreSQL.
+# Для остальных движков поиск работает через icontains без индекса
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, SQLITE_CREATE)
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_CREATE)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, SQLITE_DROP)
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0003_routedistance'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0004_airport_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='airport',
+            index=models.Index(fields=['name', 'icao_code'], name='airports_name_2d9050_idx'),
+        ),
+    ]
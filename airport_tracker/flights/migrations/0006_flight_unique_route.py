@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:25
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+# update_or_create без ограничения мог оставить дубликаты, оставляем последний
+def remove_duplicate_flights(apps, schema_editor):
+    Flight = apps.get_model('flights', 'Flight')
+    key = ('callsign', 'icao24', 'departure_airport', 'arrival_airport')
+    duplicates = (
+        Flight.objects.values(*key)
+        .annotate(rows=Count('id'), keep_id=Max('id'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for group in duplicates:
+        keep_id = group.pop('keep_id')
+        group.pop('rows')
+        Flight.objects.filter(**group).exclude(id=keep_id).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0005_airport_name_icao_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_flights, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='flight',
+            constraint=models.UniqueConstraint(fields=('callsign', 'icao24', 'departure_airport', 'arrival_airport'), name='unique_flight_route'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:33
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# Сколько групп дубликатов объединяется за один проход
+GROUP_BATCH_SIZE = 400
+
+
+# Один рейс мог попасть в таблицу и из вылетов, и из прилетов - объединяем.
+# Это единственное место слияния дубликатов: после миграции их не пускает
+# ограничение unique_flight_identity, отдельная команда не нужна
+def merge_duplicate_flights(apps, schema_editor):
+    Flight = apps.get_model('flights', 'Flight')
+    groups = list(
+        Flight.objects.exclude(icao24=None).exclude(first_seen=None)
+        .values_list('icao24', 'first_seen')
+        .annotate(rows=Count('id'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+
+    for start in range(0, len(groups), GROUP_BATCH_SIZE):
+        keys = {(icao24, first_seen) for icao24, first_seen, _ in groups[start:start + GROUP_BATCH_SIZE]}
+        rows = {}
+        candidates = Flight.objects.filter(
+            icao24__in={icao24 for icao24, _ in keys},
+            first_seen__in={first_seen for _, first_seen in keys},
+        ).order_by('-last_updated', '-id')
+        for flight in candidates:
+            key = (flight.icao24, flight.first_seen)
+            if key in keys:
+                rows.setdefault(key, []).append(flight)
+
+        delete_ids = []
+        for keeper, *others in rows.values():
+            for other in others:
+                if keeper.departure_airport_id is None:
+                    keeper.departure_airport_id = other.departure_airport_id
+                if keeper.arrival_airport_id is None:
+                    keeper.arrival_airport_id = other.arrival_airport_id
+                if not keeper.callsign:
+                    keeper.callsign = other.callsign
+                if other.last_seen and (keeper.last_seen is None or other.last_seen > keeper.last_seen):
+                    keeper.last_seen = other.last_seen
+                keeper.distance_km = keeper.distance_km or other.distance_km
+            if keeper.first_seen and keeper.last_seen:
+                keeper.duration_minutes = int((keeper.last_seen - keeper.first_seen).total_seconds()) // 60
+            keeper.save(update_fields=[
+                'departure_airport', 'arrival_airport', 'callsign',
+                'last_seen', 'duration_minutes', 'distance_km',
+            ])
+            delete_ids.extend(other.id for other in others)
+        Flight.objects.filter(id__in=delete_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0007_ingestwatermark'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='flight',
+            name='unique_flight_route',
+        ),
+        migrations.RunPython(merge_duplicate_flights, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='flight',
+            constraint=models.UniqueConstraint(fields=('icao24', 'first_seen'), name='unique_flight_identity'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0008_flight_identity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackPoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('icao24', models.CharField(max_length=6)),
+                ('time', models.IntegerField()),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('altitude', models.FloatField(null=True)),
+                ('velocity', models.FloatField(null=True)),
+                ('heading', models.FloatField(null=True)),
+                ('on_ground', models.BooleanField(default=False)),
+            ],
+            options={
+                'db_table': 'track_points',
+                'indexes': [models.Index(fields=['time'], name='track_point_time_34fdb2_idx')],
+                'constraints': [models.UniqueConstraint(fields=('icao24', 'time'), name='unique_track_point')],
+            },
+        ),
+    ]
@@ -0,0 +1,102 @@
+from django.db import migrations
+
+# FTS5 из 0004 хранил только индекс (content='airports') и связывался с
+# таблицей по rowid. У airports первичный ключ текстовый, и rowid у нее
+# неявный: VACUUM может перенумеровать строки, и индекс начнет указывать
+# на чужие аэропорты. Теперь airports_fts хранит свои копии полей, а его
+# rowid берется из airports_fts_keys, где он закреплен за icao_code
+
+SQLITE_DROP_EXTERNAL = [
+    "DROP TRIGGER IF EXISTS airports_fts_insert",
+    "DROP TRIGGER IF EXISTS airports_fts_delete",
+    "DROP TRIGGER IF EXISTS airports_fts_update",
+    "DROP TABLE IF EXISTS airports_fts",
+]
+
+SQLITE_CREATE = [
+    "CREATE TABLE airports_fts_keys (id INTEGER PRIMARY KEY, icao_code TEXT NOT NULL UNIQUE)",
+
+    "CREATE VIRTUAL TABLE airports_fts USING fts5("
+    "name, city, country, icao_code, iata_code, tokenize='trigram')",
+
+    "CREATE TRIGGER airports_fts_insert AFTER INSERT ON airports BEGIN "
+    "INSERT INTO airports_fts_keys(icao_code) VALUES (new.icao_code); "
+    "INSERT INTO airports_fts(rowid, name, city, country, icao_code, iata_code) "
+    "VALUES ((SELECT id FROM airports_fts_keys WHERE icao_code = new.icao_code), "
+    "new.name, new.city, new.country, new.icao_code, new.iata_code); END",
+
+    "CREATE TRIGGER airports_fts_delete AFTER DELETE ON airports BEGIN "
+    "DELETE FROM airports_fts WHERE rowid = (SELECT id FROM airports_fts_keys WHERE icao_code = old.icao_code); "
+    "DELETE FROM airports_fts_keys WHERE icao_code = old.icao_code; END",
+
+    # Координаты в индекс не входят, их изменение индекс не трогает
+    "CREATE TRIGGER airports_fts_update AFTER UPDATE OF name, city, country, icao_code, iata_code ON airports BEGIN "
+    "UPDATE airports_fts_keys SET icao_code = new.icao_code WHERE icao_code = old.icao_code; "
+    "UPDATE airports_fts SET name = new.name, city = new.city, country = new.country, "
+    "icao_code = new.icao_code, iata_code = new.iata_code "
+    "WHERE rowid = (SELECT id FROM airports_fts_keys WHERE icao_code = new.icao_code); END",
+
+    "INSERT INTO airports_fts_keys(icao_code) SELECT icao_code FROM airports",
+
+    "INSERT INTO airports_fts(rowid, name, city, country, icao_code, iata_code) "
+    "SELECT k.id, a.name, a.city, a.country, a.icao_code, a.iata_code "
+    "FROM airports a JOIN airports_fts_keys k ON k.icao_code = a.icao_code",
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS airports_fts_insert",
+    "DROP TRIGGER IF EXISTS airports_fts_delete",
+    "DROP TRIGGER IF EXISTS airports_fts_update",
+    "DROP TABLE IF EXISTS airports_fts",
+    "DROP TABLE IF EXISTS airports_fts_keys",
+]
+
+# Откат к индексу из 0004
+SQLITE_CREATE_EXTERNAL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS airports_fts USING fts5("
+    "name, city, country, icao_code, iata_code, "
+    "content='airports', content_rowid='rowid', tokenize='trigram')",
+
+    "CREATE TRIGGER IF NOT EXISTS airports_fts_insert AFTER INSERT ON airports BEGIN "
+    "INSERT INTO airports_fts(rowid, name, city, country, icao_code, iata_code) "
+    "VALUES (new.rowid, new.name, new.city, new.country, new.icao_code, new.iata_code); END",
+
+    "CREATE TRIGGER IF NOT EXISTS airports_fts_delete AFTER DELETE ON airports BEGIN "
+    "INSERT INTO airports_fts(airports_fts, rowid, name, city, country, icao_code, iata_code) "
+    "VALUES ('delete', old.rowid, old.name, old.city, old.country, old.icao_code, old.iata_code); END",
+
+    "CREATE TRIGGER IF NOT EXISTS airports_fts_update AFTER UPDATE ON airports BEGIN "
+    "INSERT INTO airports_fts(airports_fts, rowid, name, city, country, icao_code, iata_code) "
+    "VALUES ('delete', old.rowid, old.name, old.city, old.country, old.icao_code, old.iata_code); "
+    "INSERT INTO airports_fts(rowid, name, city, country, icao_code, iata_code) "
+    "VALUES (new.rowid, new.name, new.city, new.country, new.icao_code, new.iata_code); END",
+
+    "INSERT INTO airports_fts(airports_fts) VALUES ('rebuild')",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+# Только SQLite: индексы pg_trgm в PostgreSQL строятся по самой таблице airports
+def key_search_index_by_icao(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        _run(schema_editor, SQLITE_DROP_EXTERNAL + SQLITE_CREATE)
+
+
+def restore_external_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        _run(schema_editor, SQLITE_DROP + SQLITE_CREATE_EXTERNAL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0009_trackpoint'),
+    ]
+
+    operations = [
+        migrations.RunPython(key_search_index_by_icao, restore_external_search_index),
+    ]
@@ -13,9 +13,25 @@ class Airport(models.Model):
     class Meta:
         db_table = 'airports'
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['latitude', 'longitude']),
+            models.Index(fields=['name', 'icao_code']),  # keyset-пагинация списка
+        ]
     def __str__(self):
         return f"{self.icao_code} ({self.name})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Координаты на момент загрузки: по ним сигнал решает, нужен ли пересчет маршрутов
+        instance._loaded_coordinates = (instance.__dict__.get('latitude'), instance.__dict__.get('longitude'))
+        return instance
+
+    def coordinates_changed(self):
+        # Экземпляр не из БД (или поля были отложены) - считаем, что изменились
+        loaded = getattr(self, '_loaded_coordinates', None)
+        return loaded is None or None in loaded or loaded != (self.latitude, self.longitude)
+
 
 class Flight(models.Model):
     # Основные данные рейса
@@ -60,7 +76,79 @@ class Flight(models.Model):
             models.Index(fields=['departure_airport', 'arrival_airport']),
             models.Index(fields=['last_updated']),
         ]
+        constraints = [
+            # Естественный ключ рейса и ключ upsert'а при импорте: один и тот же
+            # полет приходит и в вылетах одного аэропорта, и в прилетах другого
+            models.UniqueConstraint(
+                fields=['icao24', 'first_seen'],
+                name='unique_flight_identity'
+            ),
+        ]
         ordering = ['-last_seen']
     
     def __str__(self):
-        return f"{self.callsign}: {self.departure_airport} -> {self.arrival_airport}"
\ No newline at end of file
+        return f"{self.callsign}: {self.departure_airport} -> {self.arrival_airport}"
+
+
+class RouteDistance(models.Model):
+    # Расстояние по большому кругу между аэропортами маршрута,
+    # считается заранее, чтобы Flight.distance_km заполнялся без тригонометрии
+    departure_icao = models.CharField(max_length=8)
+    arrival_icao = models.CharField(max_length=8)
+    distance_km = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'route_distances'
+        constraints = [
+            models.UniqueConstraint(fields=['departure_icao', 'arrival_icao'], name='unique_route_distance'),
+        ]
+
+    def __str__(self):
+        return f"{self.departure_icao} -> {self.arrival_icao}: {self.distance_km:.0f} км"
+
+
+class IngestWatermark(models.Model):
+    # Конец последнего успешно импортированного окна по аэропорту:
+    # следующий импорт запрашивает у OpenSky только [last_end, сейчас]
+    airport = models.OneToOneField(
+        Airport,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='ingest_watermark'
+    )
+    last_end = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'ingest_watermarks'
+
+    def __str__(self):
+        return f"{self.airport_id}: {self.last_end}"
+
+
+class TrackPoint(models.Model):
+    # Точка траектории самолета из снимков /states/all. Время - unix time
+    # (целое), чтобы строка была компактной, а диапазоны по индексу
+    # (icao24, time) - дешевыми. Старые точки прореживаются downsample_tracks
+    icao24 = models.CharField(max_length=6)
+    time = models.IntegerField()
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    altitude = models.FloatField(null=True)
+    velocity = models.FloatField(null=True)
+    heading = models.FloatField(null=True)
+    on_ground = models.BooleanField(default=False)
+
+    class Meta:
+        db_table = 'track_points'
+        constraints = [
+            # Уникальность заодно дает индекс для запросов трека по icao24 и времени
+            models.UniqueConstraint(fields=['icao24', 'time'], name='unique_track_point'),
+        ]
+        indexes = [
+            models.Index(fields=['time']),  # прореживание по времени
+        ]
+
+    def __str__(self):
+        return f"{self.icao24} @ {self.time}: {self.latitude:.4f}, {self.longitude:.4f}"
@@ -0,0 +1,85 @@
+import json
+import re
+
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен, без него работает стандартный json
+    orjson = None
+
+# Ответы меньше этого размера, байт, не сжимаются: выигрыш меньше накладных расходов
+GZIP_MIN_SIZE = 1024
+
+_accepts_gzip = re.compile(r'\bgzip\b')
+
+
+def dumps(data):
+    """JSON в байтах UTF-8: через orjson, если он установлен, иначе json."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def json_response(request, data, status=200):
+    """Замена JsonResponse для больших ответов карты.
+
+    Кодирует dumps и сжимает gzip, если клиент передал Accept-Encoding: gzip
+    (как GZipMiddleware, но только для этих ответов). Content-Type остается
+    application/json.
+    """
+    content = dumps(data)
+    response = HttpResponse(content, content_type='application/json', status=status)
+    patch_vary_headers(response, ('Accept-Encoding',))
+
+    if len(content) >= GZIP_MIN_SIZE and _accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+        compressed = compress_string(content)
+        if len(compressed) < len(content):
+            response.content = compressed
+            response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Content-Length'] = str(len(response.content))
+    return response
+
+
+def parse_fields(value):
+    """Разбор параметра fields=.
+
+    Элементы через запятую: 'раздел' - раздел ответа целиком,
+    'раздел.поле' - только перечисленные поля объектов раздела, например
+    fields=airports_in_radius.icao,flights. Возвращает словарь
+    раздел -> список полей (None - все поля) или None, если параметра нет.
+    """
+    if not value:
+        return None
+    sections = {}
+    for item in value.split(','):
+        section, _, field = item.strip().partition('.')
+        if not section:
+            continue
+        if not field:
+            sections[section] = None
+        elif section not in sections or sections[section] is not None:
+            sections.setdefault(section, [])
+            if field not in sections[section]:
+                sections[section].append(field)
+    return sections or None
+
+
+def project(rows, fields):
+    """Оставляет в словарях rows только поля fields (в порядке fields)."""
+    if fields is None:
+        return rows
+    return [{field: row[field] for field in fields if field in row} for row in rows]
+
+
+def to_columns(rows, fields, extra=None):
+    """Компактный вид списка словарей: имена полей один раз и строки-массивы.
+
+    extra - поле -> список значений по строкам для полей, которых нет в rows.
+    Значения собираются по колонкам, без копирования словарей.
+    """
+    extra = extra or {}
+    columns = [extra[field] if field in extra else [row.get(field) for row in rows] for field in fields]
+    return {'fields': list(fields), 'rows': [list(row) for row in zip(*columns)] if rows else []}
@@ -0,0 +1,103 @@
+from django.db.models import OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .distance import haversine_pairs
+from .models import Airport, Flight, RouteDistance
+
+# Сколько маршрутов обрабатывается за один запрос (лимит параметров SQLite)
+CHUNK_SIZE = 500
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# Координаты (0, 0) ставит импорт для аэропортов-заглушек, расстояние до них не считаем
+def _airport_coordinates(icao_codes):
+    coordinates = {}
+    for chunk in _chunks(icao_codes):
+        rows = Airport.objects.filter(icao_code__in=chunk).values_list('icao_code', 'latitude', 'longitude')
+        for icao, lat, lon in rows:
+            if lat or lon:
+                coordinates[icao] = (lat, lon)
+    return coordinates
+
+
+# Считает расстояния для маршрутов одним векторным вызовом и сохраняет их.
+# Маршруты, для которых нет координат обоих аэропортов, пропускаются
+def _compute_routes(pairs, update_existing=False):
+    pairs = list(pairs)
+    coordinates = _airport_coordinates({icao for pair in pairs for icao in pair})
+    pairs = [(dep, arr) for dep, arr in pairs if dep in coordinates and arr in coordinates]
+    if not pairs:
+        return {}
+
+    distances = haversine_pairs(
+        [coordinates[dep][0] for dep, _ in pairs],
+        [coordinates[dep][1] for dep, _ in pairs],
+        [coordinates[arr][0] for _, arr in pairs],
+        [coordinates[arr][1] for _, arr in pairs],
+    )
+    routes = [
+        RouteDistance(departure_icao=dep, arrival_icao=arr, distance_km=float(distance))
+        for (dep, arr), distance in zip(pairs, distances)
+    ]
+    if update_existing:
+        RouteDistance.objects.bulk_create(
+            routes,
+            batch_size=CHUNK_SIZE,
+            update_conflicts=True,
+            unique_fields=['departure_icao', 'arrival_icao'],
+            update_fields=['distance_km', 'updated_at'],
+        )
+    else:
+        RouteDistance.objects.bulk_create(routes, batch_size=CHUNK_SIZE, ignore_conflicts=True)
+
+    return {(route.departure_icao, route.arrival_icao): route.distance_km for route in routes}
+
+
+# Возвращает {(вылет, прилет): км} для переданных маршрутов.
+# Недостающие маршруты досчитываются пачкой и сохраняются в таблицу
+def get_route_distances(pairs):
+    pairs = {(dep, arr) for dep, arr in pairs if dep and arr}
+    result = {}
+
+    for chunk in _chunks(pairs):
+        departures = {dep for dep, _ in chunk}
+        arrivals = {arr for _, arr in chunk}
+        rows = RouteDistance.objects.filter(
+            departure_icao__in=departures,
+            arrival_icao__in=arrivals
+        ).values_list('departure_icao', 'arrival_icao', 'distance_km')
+        result.update(((dep, arr), km) for dep, arr, km in rows if (dep, arr) in pairs)
+
+    missing = pairs - result.keys()
+    if missing:
+        result.update(_compute_routes(missing))
+    return result
+
+
+# Пересчитывает маршруты с участием аэропортов (после загрузки или изменения
+# координат) и обновляет distance_km у их рейсов одним UPDATE.
+# Без аргументов пересчитывает все маршруты, по которым есть рейсы
+def refresh_route_distances(icao_codes=None):
+    flights = Flight.objects.filter(departure_airport__isnull=False, arrival_airport__isnull=False)
+    routes = RouteDistance.objects.all()
+    if icao_codes is not None:
+        icao_codes = list(icao_codes)
+        flights = flights.filter(Q(departure_airport__in=icao_codes) | Q(arrival_airport__in=icao_codes))
+        routes = routes.filter(Q(departure_icao__in=icao_codes) | Q(arrival_icao__in=icao_codes))
+
+    pairs = set(flights.values_list('departure_airport_id', 'arrival_airport_id').distinct())
+    pairs.update(routes.values_list('departure_icao', 'arrival_icao'))
+
+    for chunk in _chunks(pairs):
+        _compute_routes(chunk, update_existing=True)
+
+    distance = RouteDistance.objects.filter(
+        departure_icao=OuterRef('departure_airport_id'),
+        arrival_icao=OuterRef('arrival_airport_id')
+    ).values('distance_km')[:1]
+    return flights.update(distance_km=Coalesce(Subquery(distance), Value(0.0)))
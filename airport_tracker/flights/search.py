@@ -0,0 +1,136 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Airport
+
+# Поля аэропорта, которые попадают в поисковый документ
+SEARCH_FIELDS = ('name', 'city', 'country', 'icao_code', 'iata_code')
+
+FTS_TABLE = 'airports_fts'
+FTS_KEYS_TABLE = 'airports_fts_keys'
+
+
+class SearchBackend:
+    """Поиск аэропортов без специальных индексов: icontains по полям.
+
+    Используется для СУБД без своей реализации и для слишком коротких запросов.
+    filter() только сужает queryset и не меняет его порядок,
+    search() возвращает результаты, отсортированные по релевантности.
+    """
+
+    def filter(self, queryset, query):
+        condition = Q()
+        for field in SEARCH_FIELDS:
+            condition |= Q(**{f'{field}__icontains': query})
+        return queryset.filter(condition)
+
+    def ordering(self, query):
+        """Порядок результатов search(query); последнее поле уникально, по нему
+        можно вести keyset-пагинацию (frontend/pagination.py)."""
+        return ('name', 'icao_code')
+
+    def search(self, query):
+        return self.filter(Airport.objects.all(), query).order_by(*self.ordering(query))
+
+    def rebuild(self):
+        pass
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """Поиск через виртуальную таблицу FTS5 airports_fts с триграммным токенизатором.
+
+    Таблица хранит копии полей и обновляется триггерами на таблице airports,
+    см. миграцию 0010. rowid строки индекса закреплен за icao_code в
+    airports_fts_keys: неявный rowid самой airports нестабилен. Триграммы ищут
+    подстроку, как icontains, но по индексу; запросы короче 3 символов уходят
+    в базовый поиск.
+    """
+
+    def _match(self, query):
+        return '"' + query.replace('"', '""') + '"'
+
+    def filter(self, queryset, query):
+        if len(query) < 3:
+            return super().filter(queryset, query)
+        return queryset.filter(icao_code__in=RawSQL(
+            f'SELECT icao_code FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [self._match(query)]
+        ))
+
+    def ordering(self, query):
+        if len(query) < 3:
+            return super().ordering(query)
+        # bm25: чем меньше значение, тем релевантнее
+        return ('search_rank', 'name', 'icao_code')
+
+    def search(self, query):
+        if len(query) < 3:
+            return super().search(query)
+        # Строка индекса для ранга ищется по rowid из airports_fts_keys,
+        # а не перебором совпадений по icao_code
+        rank = RawSQL(
+            f'SELECT bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = '
+            f'(SELECT id FROM {FTS_KEYS_TABLE} WHERE {FTS_KEYS_TABLE}.icao_code = airports.icao_code)',
+            [self._match(query)]
+        )
+        return self.filter(Airport.objects.all(), query).annotate(search_rank=rank).order_by(*self.ordering(query))
+
+    def rebuild(self):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(f'DELETE FROM {FTS_KEYS_TABLE}')
+            cursor.execute(f'INSERT INTO {FTS_KEYS_TABLE}(icao_code) SELECT icao_code FROM airports')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE}(rowid, name, city, country, icao_code, iata_code) '
+                f'SELECT k.id, a.name, a.city, a.country, a.icao_code, a.iata_code '
+                f'FROM airports a JOIN {FTS_KEYS_TABLE} k ON k.icao_code = a.icao_code'
+            )
+
+
+class PostgresTrigramBackend(SearchBackend):
+    """Поиск в PostgreSQL: icontains по полям использует GIN-индексы pg_trgm
+    (созданы миграцией 0004), релевантность - сходство триграмм со словами полей.
+    """
+
+    def ordering(self, query):
+        return ('-search_rank', 'name', 'icao_code')
+
+    def search(self, query):
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        from django.db.models.functions import Greatest
+
+        rank = Greatest(*[TrigramWordSimilarity(query, field) for field in SEARCH_FIELDS])
+        return self.filter(Airport.objects.all(), query).annotate(search_rank=rank).order_by(*self.ordering(query))
+
+
+_backend = None
+
+
+def _fts_table_exists():
+    with connection.cursor() as cursor:
+        return FTS_TABLE in connection.introspection.table_names(cursor)
+
+
+# Выбор реализации: AIRPORT_SEARCH_BACKEND ('fts5', 'postgres', 'basic')
+# или по движку базы данных
+def get_search_backend():
+    global _backend
+
+    if _backend is None:
+        name = getattr(settings, 'AIRPORT_SEARCH_BACKEND', None)
+        if name is None:
+            if connection.vendor == 'sqlite' and _fts_table_exists():
+                name = 'fts5'
+            elif connection.vendor == 'postgresql':
+                name = 'postgres'
+            else:
+                name = 'basic'
+        _backend = {
+            'fts5': SQLiteFTS5Backend,
+            'postgres': PostgresTrigramBackend,
+            'basic': SearchBackend,
+        }[name]()
+    return _backend
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Airport
+from .routes import refresh_route_distances
+from .versioning import bump_airports_version
+
+
+@receiver(post_save, sender=Airport)
+@receiver(post_delete, sender=Airport)
+def airport_changed(sender, **kwargs):
+    bump_airports_version()
+
+
+# У нового аэропорта еще нет рейсов, пересчет нужен только при изменении
+# координат: правка названия или города расстояния не меняет
+@receiver(post_save, sender=Airport)
+def airport_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is not None and not {'latitude', 'longitude'} & set(update_fields):
+        return
+    if instance.coordinates_changed():
+        refresh_route_distances([instance.icao_code])
+    instance._loaded_coordinates = (instance.latitude, instance.longitude)
@@ -0,0 +1,130 @@
+import math
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Q
+
+from .distance import bounding_box, haversine_many
+from .models import Airport
+from .versioning import AirportsVersionedValue
+
+# Поля аэропорта, которые хранятся в индексе и отдаются во views
+INDEX_FIELDS = ('icao_code', 'iata_code', 'name', 'city', 'country', 'latitude', 'longitude')
+
+
+class AirportSpatialIndex:
+    """Сетка ячеек по широте/долготе для поиска аэропортов в радиусе.
+
+    Аэропорты отсортированы по номеру ячейки (строка * число столбцов + столбец),
+    поэтому диапазон долгот внутри одной строки сетки - это один непрерывный срез,
+    который находится бинарным поиском. Расстояние считается одним векторным
+    вызовом только для аэропортов из этих срезов.
+    """
+
+    def __init__(self, airports, cell_size=1.0):
+        self.cell_size = cell_size
+        self.rows = int(math.ceil(180 / cell_size))
+        self.cols = int(math.ceil(360 / cell_size))
+
+        airports = list(airports)
+        latitudes = np.array([a['latitude'] for a in airports], dtype=np.float64)
+        longitudes = np.array([a['longitude'] for a in airports], dtype=np.float64)
+        cells = self._cells_of(latitudes, longitudes)
+
+        order = np.argsort(cells, kind='stable')
+        self._cells = cells[order]
+        self._latitudes = latitudes[order]
+        self._longitudes = longitudes[order]
+        self._airports = [airports[i] for i in order]
+        self._icao_codes = np.array([a['icao_code'] for a in self._airports], dtype=object)
+        # Позиция аэропорта при сортировке по названию - для порядка результатов
+        names = np.array([a['name'] for a in self._airports], dtype=object)
+        self._name_rank = np.empty(len(names), dtype=np.int64)
+        self._name_rank[np.argsort(names, kind='stable')] = np.arange(len(names))
+
+    def __len__(self):
+        return len(self._airports)
+
+    def _rows_of(self, latitudes):
+        return np.clip(((latitudes + 90) / self.cell_size).astype(np.int64), 0, self.rows - 1)
+
+    def _cols_of(self, longitudes):
+        return np.clip(((longitudes + 180) / self.cell_size).astype(np.int64), 0, self.cols - 1)
+
+    def _cells_of(self, latitudes, longitudes):
+        return self._rows_of(latitudes) * self.cols + self._cols_of(longitudes)
+
+    # Индексы аэропортов из ячеек, которые пересекает прямоугольник вокруг круга
+    def _candidates(self, lat, lon, radius_km):
+        lat_min, lat_max, lon_ranges = bounding_box(lat, lon, radius_km)
+        row_min, row_max = self._rows_of(np.array([lat_min, lat_max]))
+        bases = np.arange(row_min, row_max + 1) * self.cols
+
+        slices = []
+        for lon_min, lon_max in lon_ranges:
+            col_min, col_max = self._cols_of(np.array([lon_min, lon_max]))
+            starts = np.searchsorted(self._cells, bases + col_min, side='left')
+            ends = np.searchsorted(self._cells, bases + col_max, side='right')
+            slices.extend(np.arange(s, e) for s, e in zip(starts, ends) if s < e)
+
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(slices)
+
+    # Возвращает список (аэропорт, расстояние в км), отсортированный по названию
+    def query(self, lat, lon, radius_km, exclude=None):
+        candidates = self._candidates(lat, lon, radius_km)
+        distances = haversine_many(lat, lon, self._latitudes[candidates], self._longitudes[candidates])
+
+        mask = distances <= radius_km
+        if exclude is not None:
+            mask &= self._icao_codes[candidates] != exclude
+        found = candidates[mask]
+        distances = distances[mask]
+
+        order = np.argsort(self._name_rank[found])
+        return [(self._airports[i], float(d)) for i, d in zip(found[order], distances[order])]
+
+
+# Индекс строится лениво при первом запросе и пересобирается,
+# когда меняется версия справочника аэропортов
+_index = AirportsVersionedValue(lambda: AirportSpatialIndex(Airport.objects.values(*INDEX_FIELDS)))
+
+
+def get_airport_index():
+    return _index.get()
+
+
+# Поиск через базу: сначала фильтр по прямоугольнику широт/долгот, который
+# обслуживается индексом (latitude, longitude), затем точное расстояние только
+# для попавших в него строк. Справочник целиком в памяти воркера не держится
+def query_airports_in_radius_db(lat, lon, radius_km, exclude=None):
+    lat_min, lat_max, lon_ranges = bounding_box(lat, lon, radius_km)
+
+    airports = Airport.objects.filter(latitude__range=(lat_min, lat_max))
+    if lon_ranges != [(-180.0, 180.0)]:
+        lon_filter = Q()
+        for lon_min, lon_max in lon_ranges:
+            lon_filter |= Q(longitude__range=(lon_min, lon_max))
+        airports = airports.filter(lon_filter)
+    if exclude is not None:
+        airports = airports.exclude(icao_code=exclude)
+
+    airports = list(airports.values(*INDEX_FIELDS))
+    if not airports:
+        return []
+
+    distances = haversine_many(
+        lat, lon,
+        [a['latitude'] for a in airports],
+        [a['longitude'] for a in airports]
+    )
+    return [(airport, float(d)) for airport, d in zip(airports, distances) if d <= radius_km]
+
+
+# Аэропорты в радиусе через выбранный в настройках способ:
+# 'memory' - индекс в памяти процесса, 'database' - запрос с прямоугольником в SQL
+def find_airports_in_radius(lat, lon, radius_km, exclude=None):
+    if getattr(settings, 'AIRPORT_RADIUS_BACKEND', 'memory') == 'database':
+        return query_airports_in_radius_db(lat, lon, radius_km, exclude=exclude)
+    return get_airport_index().query(lat, lon, radius_km, exclude=exclude)
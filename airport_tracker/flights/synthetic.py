@@ -0,0 +1,204 @@
+import string
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.constants import OnConflict
+
+from .distance import haversine_pairs
+from .models import Airport, Flight
+
+# Сколько аэропортов в среднем приходится на один кластер (регион)
+AIRPORTS_PER_CLUSTER = 250
+
+# Показатель распределения Парето для веса аэропорта: чем меньше, тем сильнее
+# трафик сосредоточен в нескольких хабах
+HUB_ALPHA = 1.16
+
+# Доля рейсов внутри кластера, остальные - между любыми аэропортами
+LOCAL_ROUTE_SHARE = 0.6
+
+# Крейсерская скорость и время на рулежку/набор высоты для длительности рейса
+CRUISE_SPEED_KMH = 800
+GROUND_MINUTES = 20
+
+# Колонки рейса в кортежах SyntheticDataset.flights; последние три
+# одинаковы у всех рейсов пачки
+FLIGHT_COLUMNS = (
+    'callsign', 'icao24', 'departure_airport', 'arrival_airport', 'first_seen', 'last_seen',
+    'duration_minutes', 'distance_km', 'last_updated', 'created_at', 'opensky_data',
+)
+CONSTANT_COLUMNS = ('last_updated', 'created_at', 'opensky_data')
+
+AIRLINES = ['SYA', 'SYB', 'SYC', 'SYD', 'SYE', 'SYF', 'SYG', 'SYH']
+
+
+def dataset_codes(airports, prefix='X'):
+    """Коды аэропортов набора SyntheticDataset(airports, prefix=prefix)."""
+    return [f'{prefix}{i:06d}' for i in range(airports)]
+
+
+def _letters(value, length):
+    letters = []
+    for _ in range(length):
+        value, rest = divmod(value, 26)
+        letters.append(string.ascii_uppercase[rest])
+    return ''.join(reversed(letters))
+
+
+class SyntheticDataset:
+    """Синтетические аэропорты и рейсы для нагрузочных проверок.
+
+    Аэропорты сгруппированы в кластеры вокруг случайных центров (как реальные
+    аэропорты вокруг населенных регионов), у каждого аэропорта вес по Парето:
+    несколько хабов и много мелких аэропортов. Рейс выбирает аэропорт вылета
+    по весу, аэропорт прилета - тоже по весу, с вероятностью LOCAL_ROUTE_SHARE
+    внутри того же кластера. Одинаковые параметры и seed дают одинаковые данные.
+    Коды аэропортов - prefix и номер, по префиксу данные можно удалить.
+    """
+
+    def __init__(self, airports, seed=42, prefix='X', clusters=None):
+        self.rng = np.random.default_rng(seed)
+        self.prefix = prefix
+        self.count = airports
+        clusters = clusters or max(1, airports // AIRPORTS_PER_CLUSTER)
+
+        # Центры кластеров равномерно по сфере, без приполярных областей
+        center_lat = np.degrees(np.arcsin(self.rng.uniform(-0.9, 0.95, clusters)))
+        center_lon = self.rng.uniform(-180, 180, clusters)
+        # Размер кластера (и его доля трафика) тоже неравномерный
+        cluster_weight = self.rng.pareto(1.5, clusters) + 1
+
+        cluster = self.rng.choice(clusters, size=airports, p=cluster_weight / cluster_weight.sum())
+        # Аэропорты идут по кластерам подряд: так выбор внутри кластера - это
+        # выбор в непрерывном диапазоне накопленных весов
+        self.cluster = np.sort(cluster)
+        spread = self.rng.uniform(1.0, 4.0, clusters)[self.cluster]
+        self.latitude = np.clip(center_lat[self.cluster] + self.rng.normal(0, 1, airports) * spread, -85, 85)
+        lon = center_lon[self.cluster] + self.rng.normal(0, 1, airports) * spread / np.cos(np.radians(self.latitude))
+        self.longitude = (lon + 180) % 360 - 180
+
+        self.weight = self.rng.pareto(HUB_ALPHA, airports) + 1
+        self.cumulative = np.cumsum(self.weight)
+        starts = np.searchsorted(self.cluster, np.arange(clusters), side='left')
+        ends = np.searchsorted(self.cluster, np.arange(clusters), side='right')
+        self.cluster_low = np.where(starts > 0, self.cumulative[np.maximum(starts - 1, 0)], 0.0)
+        self.cluster_high = np.where(ends > 0, self.cumulative[np.maximum(ends - 1, 0)], 0.0)
+
+        self.codes = dataset_codes(airports, prefix)
+
+    def airports(self):
+        for i, code in enumerate(self.codes):
+            cluster = int(self.cluster[i])
+            yield Airport(
+                icao_code=code,
+                iata_code=_letters(i, 3),
+                name=f'Synthetic {_letters(i, 4).title()} Airport',
+                city=f'Synthetic City {cluster}-{i}',
+                country=_letters(cluster, 2),
+                latitude=round(float(self.latitude[i]), 6),
+                longitude=round(float(self.longitude[i]), 6),
+            )
+
+    def _pick(self, size):
+        return np.minimum(np.searchsorted(self.cumulative, self.rng.random(size) * self.cumulative[-1], side='right'), self.count - 1)
+
+    def routes(self, size):
+        """size пар (вылет, прилет) индексами аэропортов; пары с одинаковыми
+        концами отбрасываются, поэтому пар может быть немного меньше."""
+        departure = self._pick(size)
+        arrival = self._pick(size)
+
+        local = self.rng.random(size) < LOCAL_ROUTE_SHARE
+        cluster = self.cluster[departure[local]]
+        low, high = self.cluster_low[cluster], self.cluster_high[cluster]
+        arrival[local] = np.minimum(
+            np.searchsorted(self.cumulative, low + self.rng.random(len(cluster)) * (high - low), side='right'),
+            self.count - 1
+        )
+
+        different = departure != arrival
+        return departure[different], arrival[different]
+
+    def flights(self, count, begin, end, chunk_size=50000):
+        """Рейсы за период [begin, end) (unix time) пачками по chunk_size.
+
+        Рейс - кортеж значений в порядке FLIGHT_COLUMNS (для insert_flights).
+        """
+        now = datetime.now(dt_timezone.utc)
+        made = 0
+        while made < count:
+            size = min(chunk_size, count - made)
+            # С запасом: пары с одинаковыми концами отбрасываются
+            departure, arrival = self.routes(size + size // 10 + 10)
+            departure, arrival = departure[:size], arrival[:size]
+            size = len(departure)
+            distance = haversine_pairs(
+                self.latitude[departure], self.longitude[departure],
+                self.latitude[arrival], self.longitude[arrival]
+            )
+            duration = (distance / CRUISE_SPEED_KMH * 60 + GROUND_MINUTES).astype(np.int64)
+            first_seen = self.rng.integers(begin, end, size)
+            icao24 = self.rng.integers(0, 16 ** 6, size)
+            airline = self.rng.integers(0, len(AIRLINES), size)
+            number = self.rng.integers(1, 10000, size)
+
+            rows = zip(
+                departure.tolist(), arrival.tolist(), np.round(distance, 2).tolist(), duration.tolist(),
+                first_seen.tolist(), icao24.tolist(), airline.tolist(), number.tolist(),
+            )
+            batch = [
+                (
+                    f'{AIRLINES[airline_i]}{flight_number}', f'{aircraft:06x}',
+                    self.codes[dep], self.codes[arr],
+                    datetime.fromtimestamp(seen, dt_timezone.utc),
+                    datetime.fromtimestamp(seen + minutes * 60, dt_timezone.utc),
+                    minutes, distance_km, now, now, {},
+                )
+                for dep, arr, distance_km, minutes, seen, aircraft, airline_i, flight_number in rows
+            ]
+            made += len(batch)
+            yield batch
+
+
+def insert_flights(rows, using=DEFAULT_DB_ALIAS):
+    """Вставка рейсов из SyntheticDataset.flights одним подготовленным INSERT.
+
+    bulk_create в SQLite упирается в лимит параметров (около 90 рейсов на
+    INSERT) и тратит большую часть времени на сборку SQL; executemany
+    с одной строкой VALUES собирает запрос один раз на пачку. Рейсы, которые
+    совпали по (icao24, first_seen) с уже загруженными, пропускаются.
+    """
+    connection = connections[using]
+    fields = [Flight._meta.get_field(name) for name in FLIGHT_COLUMNS]
+    sql = '{} {} ({}) VALUES ({}) {}'.format(
+        connection.ops.insert_statement(on_conflict=OnConflict.IGNORE),
+        connection.ops.quote_name(Flight._meta.db_table),
+        ', '.join(connection.ops.quote_name(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+        connection.ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None),
+    )
+
+    adapt = []
+    for field in fields:
+        if field.get_internal_type() == 'DateTimeField':
+            adapt.append(connection.ops.adapt_datetimefield_value)
+        elif field.get_internal_type() == 'JSONField':
+            adapt.append(lambda value, field=field: field.get_db_prep_save(value, connection))
+        else:
+            adapt.append(None)
+
+    # Значения одинаковые во всей пачке (created_at, пустой JSON) адаптируются один раз
+    constant = {i: adapt[i](rows[0][i]) for i, name in enumerate(FLIGHT_COLUMNS) if name in CONSTANT_COLUMNS} if rows else {}
+    varying = [(i, adapt[i]) for i in range(len(fields)) if adapt[i] is not None and i not in constant]
+    prepared = []
+    for row in rows:
+        row = list(row)
+        for i, value in constant.items():
+            row[i] = value
+        for i, adapt_value in varying:
+            row[i] = adapt_value(row[i])
+        prepared.append(row)
+
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, prepared)
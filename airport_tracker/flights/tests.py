@@ -1,2 +1,1112 @@
-from django.test import TestCase
-# Create your tests here.
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from urllib.parse import parse_qs, urlparse
+
+from unittest.mock import patch
+
+import numpy as np
+import requests
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db.models import Count
+from django.test import TestCase, SimpleTestCase, override_settings
+
+from flights.benchmarks import compare, parse_sizes, percentile
+from flights.autocomplete_index import AirportAutocompleteIndex, get_autocomplete_index
+from flights import live_state
+from flights.live_stream import aircraft_events, diff_positions
+from flights.distance import haversine_distance, haversine_many, haversine_matrix
+from flights.management.commands.import_opensky_data import Command as ImportCommand
+from flights.management.opensky_service import OpenSkyService, RateLimited, iter_json_array
+from flights.management.ingest import FlightWriter, WatermarkTracker, load_watermarks, parse_flight_stream, parse_flights
+from flights.management.opensky_standin import OpenSkyStandin, StandinConfig
+from flights.management.rate_limit import TokenBucket
+from flights.management.scheduler import IngestScheduler, get_metrics, load_traffic, refresh_interval
+from flights.models import Airport, Flight, IngestWatermark, RouteDistance, TrackPoint
+from flights.routes import get_route_distances
+from flights.search import SQLiteFTS5Backend, get_search_backend
+from flights.synthetic import SyntheticDataset
+from flights.tracks import TrackRecorder, downsample_tracks
+from flights.spatial_index import (
+    AirportSpatialIndex,
+    find_airports_in_radius,
+    get_airport_index,
+    query_airports_in_radius_db,
+)
+
+
+def make_airport(icao, lat, lon):
+    return {
+        'icao_code': icao,
+        'iata_code': '',
+        'name': icao,
+        'city': '',
+        'country': '',
+        'latitude': lat,
+        'longitude': lon,
+    }
+
+
+class DistanceTests(SimpleTestCase):
+
+    def test_haversine_many_matches_scalar(self):
+        # Векторный расчет совпадает с поштучным
+        lats = [55.97, 48.35, 40.64, -33.94]
+        lons = [37.41, 11.78, -73.78, 151.18]
+        distances = haversine_many(55.75, 37.62, lats, lons)
+
+        for i in range(len(lats)):
+            self.assertAlmostEqual(distances[i], haversine_distance(55.75, 37.62, lats[i], lons[i]), places=6)
+
+    def test_haversine_matrix(self):
+        # Матрица симметрична, на диагонали нули
+        lats = [55.97, 48.35, 40.64]
+        lons = [37.41, 11.78, -73.78]
+        matrix = haversine_matrix(lats, lons)
+
+        self.assertEqual(matrix.shape, (3, 3))
+        np.testing.assert_allclose(matrix, matrix.T)
+        np.testing.assert_allclose(np.diag(matrix), 0, atol=1e-9)
+        self.assertAlmostEqual(matrix[0, 2], haversine_distance(lats[0], lons[0], lats[2], lons[2]), places=6)
+
+
+class SpatialIndexTests(SimpleTestCase):
+
+    def assertMatchesLinear(self, airports, index, lat, lon, radius):
+        expected = {
+            a['icao_code'] for a in airports
+            if haversine_distance(lat, lon, a['latitude'], a['longitude']) <= radius
+        }
+        found = {a['icao_code'] for a, _ in index.query(lat, lon, radius)}
+        self.assertEqual(found, expected)
+
+    def test_matches_linear_search(self):
+        # Индекс находит те же аэропорты, что и полный перебор
+        rng = random.Random(1)
+        airports = [
+            make_airport(f'A{i:04d}', rng.uniform(-90, 90), rng.uniform(-180, 180))
+            for i in range(3000)
+        ]
+        index = AirportSpatialIndex(airports)
+
+        for _ in range(50):
+            lat, lon = rng.uniform(-90, 90), rng.uniform(-180, 180)
+            self.assertMatchesLinear(airports, index, lat, lon, rng.choice([50, 300, 1500]))
+
+    def test_antimeridian_and_poles(self):
+        # Круг через 180-й меридиан и круг, накрывающий полюс
+        airports = [
+            make_airport('EAST', 10.0, 179.9),
+            make_airport('WEST', 10.0, -179.9),
+            make_airport('NORT', 89.5, 0.0),
+            make_airport('POLE', 89.9, 170.0),
+        ]
+        index = AirportSpatialIndex(airports)
+
+        self.assertMatchesLinear(airports, index, 10.0, 179.95, 100)
+        self.assertMatchesLinear(airports, index, 89.0, -90.0, 200)
+        self.assertEqual(
+            {a['icao_code'] for a, _ in index.query(10.0, 179.95, 100, exclude='EAST')},
+            {'WEST'}
+        )
+
+
+class SpatialIndexRefreshTests(TestCase):
+
+    def test_index_refreshed_on_airport_change(self):
+        # Индекс пересобирается после сохранения и удаления аэропорта
+        airport = Airport.objects.create(
+            icao_code='IDX1', name='Index', city='City', country='RU', latitude=50.0, longitude=50.0
+        )
+        self.assertEqual([a['icao_code'] for a, _ in get_airport_index().query(50.0, 50.0, 10)], ['IDX1'])
+
+        airport.delete()
+        self.assertEqual(get_airport_index().query(50.0, 50.0, 10), [])
+
+
+class DatabaseRadiusQueryTests(TestCase):
+
+    def setUp(self):
+        for icao, lat, lon in [
+            ('EAST', 10.0, 179.9), ('WEST', 10.0, -179.9), ('FAR1', 10.0, 170.0),
+            ('NORT', 89.5, 0.0), ('POLE', 89.9, 170.0),
+        ]:
+            Airport.objects.create(icao_code=icao, name=icao, city='', country='', latitude=lat, longitude=lon)
+
+    def test_bounding_box_prefilter_matches_index(self):
+        # SQL-фильтр по прямоугольнику дает тот же результат, что и индекс в памяти
+        for lat, lon, radius in [(10.0, 179.95, 100), (10.0, -179.95, 1200), (89.0, -90.0, 200)]:
+            self.assertEqual(
+                [a['icao_code'] for a, _ in query_airports_in_radius_db(lat, lon, radius)],
+                [a['icao_code'] for a, _ in get_airport_index().query(lat, lon, radius)]
+            )
+
+    @override_settings(AIRPORT_RADIUS_BACKEND='database')
+    def test_database_backend_setting(self):
+        # При AIRPORT_RADIUS_BACKEND='database' запрос идет через базу
+        with self.assertNumQueries(1):
+            found = find_airports_in_radius(10.0, 179.95, 100, exclude='EAST')
+        self.assertEqual([a['icao_code'] for a, _ in found], ['WEST'])
+
+
+class RouteDistanceTests(TestCase):
+
+    def setUp(self):
+        self.svo = Airport.objects.create(
+            icao_code='UUEE', name='Sheremetyevo', city='Moscow', country='RU', latitude=55.97, longitude=37.41
+        )
+        self.led = Airport.objects.create(
+            icao_code='ULLI', name='Pulkovo', city='Saint Petersburg', country='RU', latitude=59.80, longitude=30.26
+        )
+        self.stub = Airport.objects.create(
+            icao_code='ZZZZ', name='Аэропорт ZZZZ', city='Неизвестно', country='Неизвестно', latitude=0, longitude=0
+        )
+
+    def test_missing_routes_are_computed_and_stored(self):
+        # Недостающие маршруты считаются пачкой, заглушки с координатами (0, 0) пропускаются
+        distances = get_route_distances([('UUEE', 'ULLI'), ('UUEE', 'ZZZZ')])
+
+        expected = haversine_distance(55.97, 37.41, 59.80, 30.26)
+        self.assertAlmostEqual(distances[('UUEE', 'ULLI')], expected, places=3)
+        self.assertNotIn(('UUEE', 'ZZZZ'), distances)
+        self.assertEqual(RouteDistance.objects.count(), 1)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_route_distances([('UUEE', 'ULLI')]).keys(), {('UUEE', 'ULLI')})
+
+    def test_airport_update_refreshes_flight_distance(self):
+        # После появления координат у заглушки пересчитываются рейсы с ее участием
+        flight = Flight.objects.create(callsign='AFL1', departure_airport=self.svo, arrival_airport=self.stub)
+
+        self.stub.latitude, self.stub.longitude = 59.80, 30.26
+        self.stub.save()
+
+        flight.refresh_from_db()
+        self.assertAlmostEqual(flight.distance_km, haversine_distance(55.97, 37.41, 59.80, 30.26), places=3)
+
+    def test_airport_save_without_coordinate_change_skips_refresh(self):
+        airport = Airport.objects.get(icao_code='ZZZZ')
+        with patch('flights.signals.refresh_route_distances') as refresh:
+            airport.name = 'Аэропорт Z'
+            airport.save()
+            airport.save(update_fields=['city'])
+            refresh.assert_not_called()
+
+            airport.latitude = 10.0
+            airport.save()
+            refresh.assert_called_once_with(['ZZZZ'])
+            # Повторное сохранение с теми же координатами - без пересчета
+            airport.save()
+            refresh.assert_called_once()
+
+
+class AutocompleteIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        airports = [
+            ('UUEE', 'SVO', 'Sheremetyevo International', 'Moscow', 'RU'),
+            ('UUDD', 'DME', 'Domodedovo', 'Moscow', 'RU'),
+            ('EDDM', 'MUC', 'Munich', 'München', 'DE'),
+            ('KSVO', '', 'Savoonga', 'Savoonga', 'US'),
+            ('LSZH', 'ZRH', 'Zürich', 'Zürich', 'CH'),
+        ]
+        self.index = AirportAutocompleteIndex([
+            dict(make_airport(icao, 0, 0), iata_code=iata, name=name, city=city, country=country)
+            for icao, iata, name, city, country in airports
+        ])
+
+    def codes(self, query, limit=10):
+        return [a['icao_code'] for a in self.index.search(query, limit=limit)]
+
+    def test_ranking(self):
+        # Сначала точный код, потом начало слова, потом подстрока
+        self.assertEqual(self.codes('svo'), ['UUEE', 'KSVO'])
+        self.assertEqual(self.codes('mosc'), ['UUDD', 'UUEE'])
+        self.assertEqual(self.codes('national'), ['UUEE'])
+
+    def test_normalization_and_limit(self):
+        # Регистр и диакритика не важны, limit соблюдается
+        self.assertEqual(self.codes('ZURICH'), ['LSZH'])
+        self.assertEqual(self.codes('munchen'), ['EDDM'])
+        self.assertEqual(self.codes('mo', limit=1), ['UUDD'])
+
+    def test_prefix_shared_by_whole_catalogue(self):
+        # Префикс всех названий не сливает списки каждого слова при запросе
+        airports = [
+            dict(make_airport(f'S{i:03d}', 0, 0), iata_code='', name=f'Synthetic {i:03d}{chr(65 + i % 26)} Airport',
+                 city=f'City {i}', country='ZZ')
+            for i in range(300)
+        ]
+        index = AirportAutocompleteIndex(airports)
+        by_name = [a['icao_code'] for a in sorted(airports, key=lambda a: a['name'])]
+
+        # Полные строки полей не индексируются как слова: "syn" - одно слово
+        start, end = index._token_range('syn')
+        self.assertEqual(index._token_keys[start:end], ['synthetic'])
+        self.assertEqual([a['icao_code'] for a in index.search('syn')], by_name[:10])
+        # Префикс сотен слов - из заранее собранного списка
+        self.assertIn('s', index._prefix_top)
+        self.assertEqual([a['icao_code'] for a in index.search('s')], by_name[:10])
+        # Больше, чем собрано заранее для префикса, - тоже по порядку
+        self.assertEqual([a['icao_code'] for a in index.search('synthetic', limit=120)], by_name[:120])
+        self.assertEqual([a['icao_code'] for a in index.search('0', limit=300)], [
+            code for code in by_name if code[1] == '0'
+        ])
+
+
+class AutocompleteRefreshTests(TestCase):
+
+    def test_index_refreshed_on_airport_change(self):
+        Airport.objects.create(
+            icao_code='ACMP', name='Autocomplete Field', city='Nowhere', country='RU', latitude=1.0, longitude=1.0
+        )
+        self.assertEqual([a['icao_code'] for a in get_autocomplete_index().search('autocompl')], ['ACMP'])
+
+
+class SearchBackendTests(TestCase):
+
+    def setUp(self):
+        Airport.objects.create(icao_code='UUEE', name='Sheremetyevo', city='Moscow', country='RU', latitude=0, longitude=0)
+        Airport.objects.create(icao_code='UUDD', name='Domodedovo Moscow', city='Moscow', country='RU', latitude=0, longitude=0)
+        Airport.objects.create(icao_code='EGLL', name='Heathrow', city='London', country='GB', latitude=0, longitude=0)
+
+    def codes(self, queryset):
+        return [a.icao_code for a in queryset]
+
+    def test_search_finds_substrings(self):
+        backend = get_search_backend()
+        self.assertEqual(sorted(self.codes(backend.search('moscow'))), ['UUDD', 'UUEE'])
+        self.assertEqual(self.codes(backend.search('athro')), ['EGLL'])
+        self.assertEqual(self.codes(backend.search('gb')), ['EGLL'])
+
+    def test_fts_index_follows_table_changes(self):
+        # Триггеры держат airports_fts в актуальном состоянии
+        backend = get_search_backend()
+        if not isinstance(backend, SQLiteFTS5Backend):
+            self.skipTest('FTS5 используется только с SQLite')
+
+        Airport.objects.filter(icao_code='EGLL').update(city='Londinium')
+        self.assertEqual(self.codes(backend.search('londinium')), ['EGLL'])
+        self.assertEqual(self.codes(backend.search('london')), [])
+
+        Airport.objects.filter(icao_code='UUEE').delete()
+        self.assertEqual(self.codes(backend.search('moscow')), ['UUDD'])
+
+        # Смена кода: строка индекса привязана к icao_code, а не к rowid таблицы
+        Airport.objects.filter(icao_code='UUDD').update(icao_code='UUDX')
+        self.assertEqual(self.codes(backend.search('moscow')), ['UUDX'])
+        self.assertEqual(self.codes(backend.search('uudx')), ['UUDX'])
+
+        backend.rebuild()
+        self.assertEqual(self.codes(backend.search('moscow')), ['UUDX'])
+        self.assertEqual(self.codes(backend.search('londinium')), ['EGLL'])
+
+    def test_fts_ranking(self):
+        # Аэропорт, где запрос встречается в двух полях, выше
+        backend = get_search_backend()
+        if not isinstance(backend, SQLiteFTS5Backend):
+            self.skipTest('FTS5 используется только с SQLite')
+        self.assertEqual(self.codes(backend.search('moscow'))[0], 'UUDD')
+
+
+def opensky_flight(callsign, icao24, departure, arrival, first_seen=1700000000, duration=3600):
+    return {
+        'callsign': callsign + ' ',
+        'icao24': icao24,
+        'estDepartureAirport': departure,
+        'estArrivalAirport': arrival,
+        'firstSeen': first_seen,
+        'lastSeen': first_seen + duration,
+    }
+
+
+class FlightWriterTests(TestCase):
+
+    def setUp(self):
+        Airport.objects.create(icao_code='UUEE', name='Sheremetyevo', city='Moscow', country='RU', latitude=55.97, longitude=37.41)
+        Airport.objects.create(icao_code='ULLI', name='Pulkovo', city='Saint Petersburg', country='RU', latitude=59.80, longitude=30.26)
+
+    def test_batch_upsert(self):
+        # Пачка пишется фиксированным числом запросов, заглушки создаются одним bulk_create
+        data = {
+            'departures': [
+                opensky_flight('AFL1', 'aaa001', 'UUEE', 'ULLI'),
+                opensky_flight('AFL2', 'aaa002', 'UUEE', 'NEW1'),
+                opensky_flight('', 'aaa003', 'UUEE', 'ULLI'),
+            ],
+            'arrivals': [opensky_flight('AFL3', 'aaa004', 'ULLI', 'UUEE')],
+        }
+        writer = FlightWriter()
+        with self.assertNumQueries(8):
+            writer.write(parse_flights(data, 'UUEE'))
+
+        self.assertEqual(writer.rows_written, 3)
+        self.assertEqual(Flight.objects.count(), 3)
+        self.assertTrue(Airport.objects.filter(icao_code='NEW1', latitude=0).exists())
+        self.assertGreater(Flight.objects.get(callsign='AFL1').distance_km, 500)
+
+    def test_repeated_import_updates_rows(self):
+        # Повторный импорт обновляет рейс, а не создает дубликат
+        writer = FlightWriter(batch_size=1)
+        writer.write(parse_flights({'departures': [opensky_flight('AFL1', 'aaa001', 'UUEE', 'ULLI')], 'arrivals': []}, 'UUEE'))
+        writer.write(parse_flights({'departures': [opensky_flight('AFL1', 'aaa001', 'UUEE', 'ULLI', duration=7200)], 'arrivals': []}, 'UUEE'))
+
+        self.assertEqual(Flight.objects.count(), 1)
+        self.assertEqual(Flight.objects.get().duration_minutes, 120)
+
+    def test_same_flight_from_both_airports_is_one_row(self):
+        # Вылет из UUEE и прилет в ULLI - один полет, в том числе в одной пачке
+        flight = opensky_flight('AFL1', 'aaa001', 'UUEE', 'ULLI')
+        writer = FlightWriter()
+        writer.write(list(parse_flights({'departures': [flight], 'arrivals': []}, 'UUEE')) +
+                     list(parse_flights({'departures': [], 'arrivals': [flight]}, 'ULLI')))
+        writer.write(parse_flights({'departures': [], 'arrivals': [flight]}, 'ULLI'))
+
+        self.assertEqual(writer.rows_written, 2)
+        self.assertEqual(Flight.objects.count(), 1)
+
+
+class TokenBucketTests(SimpleTestCase):
+
+    def test_rate_and_burst(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=2, capacity=3, clock=lambda: now[0], sleep=lambda s: now.__setitem__(0, now[0] + s))
+
+        # Запас в 3 токена выдается сразу, дальше 2 токена в секунду
+        self.assertTrue(all(bucket.try_acquire() for _ in range(3)))
+        self.assertFalse(bucket.try_acquire())
+        bucket.acquire()
+        bucket.acquire()
+        self.assertAlmostEqual(now[0], 1.0)
+
+    def test_invalid_parameters(self):
+        for rate, capacity in ((0, 3), (-1, 3), (1, 0)):
+            with self.assertRaises(ValueError):
+                TokenBucket(rate=rate, capacity=capacity)
+
+        bucket = TokenBucket(rate=1, capacity=3)
+        for tokens in (0, 4):
+            with self.assertRaises(ValueError):
+                bucket.acquire(tokens)
+            with self.assertRaises(ValueError):
+                bucket.try_acquire(tokens)
+
+    def test_commands_reject_non_positive_rate(self):
+        for command in ('import_opensky_data', 'run_ingest_scheduler'):
+            with self.assertRaises(CommandError):
+                call_command(command, rate=0, stdout=StringIO())
+
+
+class StubOpenSkyHandler(BaseHTTPRequestHandler):
+    # Отдает по одному вылету в UUEE для каждого запрошенного аэропорта
+
+    requests = []
+    windows = []
+
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        airport = params['airport'][0]
+        self.requests.append(airport)
+        self.windows.append((airport, int(params['begin'][0]), int(params['end'][0])))
+
+        body = json.dumps([opensky_flight(f'S{airport}', airport.lower()[:6], airport, 'UUEE')]).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ConcurrentImportTests(TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubOpenSkyHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        StubOpenSkyHandler.requests = []
+        StubOpenSkyHandler.windows = []
+
+        for i in range(6):
+            Airport.objects.create(icao_code=f'CC{i:02d}', name=f'Concurrent {i}', city='', country='', latitude=i, longitude=i)
+
+    def test_import_all_airports_with_worker_pool(self):
+        call_command(
+            'import_opensky_data', limit=0, concurrency=3, rate=100, burst=10,
+            base_url=f'http://127.0.0.1:{self.server.server_port}', stdout=StringIO()
+        )
+
+        self.assertEqual(sorted(StubOpenSkyHandler.requests), [f'CC{i:02d}' for i in range(6)])
+        self.assertEqual(Flight.objects.filter(arrival_airport='UUEE').count(), 6)
+
+    def test_second_run_starts_from_watermark(self):
+        # Второй запуск запрашивает только окно после предыдущего импорта
+        base_url = f'http://127.0.0.1:{self.server.server_port}'
+        call_command('import_opensky_data', airport='CC01', hours=24, base_url=base_url, stdout=StringIO())
+        _, begin, end = StubOpenSkyHandler.windows[-1]
+        self.assertEqual(end - begin, 24 * 3600)
+        self.assertEqual(int(IngestWatermark.objects.get(airport='CC01').last_end.timestamp()), end)
+
+        watermark = end - 3600
+        IngestWatermark.objects.filter(airport='CC01').update(last_end=datetime.fromtimestamp(watermark, tz=dt_timezone.utc))
+        call_command('import_opensky_data', airport='CC01', hours=24, base_url=base_url, stdout=StringIO())
+        _, second_begin, second_end = StubOpenSkyHandler.windows[-1]
+        self.assertEqual(second_begin, watermark)
+        self.assertGreaterEqual(second_end, end)
+
+
+class WatermarkTests(TestCase):
+
+    def test_long_backfill_is_split_into_chunks(self):
+        Airport.objects.create(icao_code='WM01', name='Watermark', city='', country='', latitude=1, longitude=1)
+        IngestWatermark.objects.create(airport_id='WM01', last_end=datetime.fromtimestamp(1000, tz=dt_timezone.utc))
+
+        windows = ImportCommand().plan_windows(['WM01', 'WM02'], hours=1, chunk_seconds=3600, now=1000 + 3 * 3600)
+        self.assertEqual(windows['WM01'], [(1000, 4600), (4600, 8200), (8200, 11800)])
+        self.assertEqual(windows['WM02'], [(8200, 11800)])
+
+    def test_load_watermarks_for_many_airports(self):
+        Airport.objects.bulk_create([
+            Airport(icao_code=f'W{i:04d}', name='Watermark', latitude=0, longitude=0) for i in range(1200)
+        ])
+        IngestWatermark.objects.create(airport_id='W1100', last_end=datetime.fromtimestamp(1000, tz=dt_timezone.utc))
+        codes = [f'W{i:04d}' for i in range(1200)]
+
+        # Запросы частями по 500 кодов
+        with self.assertNumQueries(3):
+            self.assertEqual(load_watermarks(codes), {'W1100': 1000})
+        self.assertEqual(load_watermarks(), {'W1100': 1000})
+
+    def test_tracker_advances_only_contiguous_windows(self):
+        tracker = WatermarkTracker({'WM01': [(0, 10), (10, 20), (20, 30)]})
+        self.assertIsNone(tracker.complete('WM01', 20))
+        self.assertEqual(tracker.complete('WM01', 10), 20)
+        self.assertEqual(tracker.complete('WM01', 30), 30)
+
+
+class OpenSkyCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+        self.release = threading.Event()
+
+        def fetch(airport_icao, hours=24, begin=None, end=None):
+            self.calls.append((airport_icao, begin, end))
+            self.release.wait(5)
+            return {'departures': [len(self.calls)], 'arrivals': []}
+
+        self.service = OpenSkyService(username='', password='')
+        self.service.fetch_flights_by_airport = fetch
+        self.service.start_background = lambda target: target()
+
+    def test_concurrent_misses_fetch_once(self):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.service.get_flights_by_airport('UUEE', hours=12)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        self.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(results, [{'departures': [1], 'arrivals': []}] * 8)
+
+    def test_stale_entry_is_served_and_revalidated(self):
+        self.release.set()
+        first = self.service.get_flights_by_airport('UUEE', hours=12)
+
+        # Запись из прошлого интервала: отдается как есть, обновление идет в фоне
+        key = self.service._cache_key('UUEE', 12)
+        entry = cache.get(key)
+        entry['bucket'] -= 1
+        cache.set(key, entry)
+
+        self.assertEqual(self.service.get_flights_by_airport('UUEE', hours=12), first)
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.service.get_flights_by_airport('UUEE', hours=12), {'departures': [2], 'arrivals': []})
+
+    def test_explicit_window_bypasses_cache(self):
+        self.release.set()
+        self.service.get_flights_by_airport('UUEE', begin=0, end=3600)
+        self.service.get_flights_by_airport('UUEE', begin=0, end=3600)
+        self.assertEqual(len(self.calls), 2)
+
+
+class StreamingParseTests(SimpleTestCase):
+
+    def test_array_split_at_any_position(self):
+        records = [opensky_flight(f'SU{i}', f'{i:06x}', 'UUEE', 'ULLI') for i in range(50)]
+        records.append({'callsign': 'Zürich "x"', 'nested': [1, {'a': None}], 'n': 12345})
+        text = ' [\n' + ',\n'.join(json.dumps(record, ensure_ascii=False) for record in records) + '\n] \n'
+
+        rng = random.Random(1)
+        for _ in range(20):
+            cuts = sorted(rng.sample(range(1, len(text)), 40))
+            chunks = [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+            self.assertEqual(list(iter_json_array(iter(chunks))), records)
+
+    def test_truncated_response_raises(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array(iter(['[{"a": 1}, {"b"'])))
+        self.assertEqual(list(iter_json_array(iter(['[', ']']))), [])
+
+    def test_parse_flight_stream_splits_departures_and_arrivals(self):
+        rows = list(parse_flight_stream(iter([
+            opensky_flight('SU1', 'aaa001', 'UUEE', 'ULLI'),
+            opensky_flight('SU2', 'aaa002', 'ULLI', 'UUEE'),
+        ]), 'UUEE'))
+        self.assertEqual(
+            [(row['departure_airport_id'], row['arrival_airport_id']) for row in rows],
+            [('UUEE', 'ULLI'), ('ULLI', 'UUEE')]
+        )
+
+
+class AsyncOpenSkyTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_misses_fetch_once(self):
+        service = OpenSkyService(username='', password='')
+        calls = []
+
+        async def fetch(airport_icao, hours=24):
+            calls.append(airport_icao)
+            await asyncio.sleep(0.01)
+            return {'departures': [len(calls)], 'arrivals': []}
+
+        service.afetch_flights_by_airport = fetch
+
+        async def run():
+            return await asyncio.gather(*(service.aget_flights_by_airport('UUEE', hours=12) for _ in range(8)))
+
+        self.assertEqual(asyncio.run(run()), [{'departures': [1], 'arrivals': []}] * 8)
+        self.assertEqual(calls, ['UUEE'])
+        # Следующий запрос - из кэша
+        self.assertEqual(asyncio.run(service.aget_flights_by_airport('UUEE', hours=12)), {'departures': [1], 'arrivals': []})
+        self.assertEqual(len(calls), 1)
+
+    def test_fetch_from_standin(self):
+        async def fetch_twice(service):
+            try:
+                first = await service.afetch_flights_by_airport('Z000', hours=2)
+                session = service._asession
+                second = await service.afetch_flights_by_airport('Z001', hours=2)
+                # Одна сессия aiohttp на все запросы сервиса
+                self.assertIs(service._asession, session)
+                return first, second
+            finally:
+                await service.aclose()
+
+        with OpenSkyStandin(StandinConfig(flights=10, airports=['Z000', 'Z001'])) as standin:
+            service = OpenSkyService(username='', password='', base_url=standin.base_url)
+            data, _ = asyncio.run(fetch_twice(service))
+        self.assertEqual(len(data['departures']) + len(data['arrivals']), 10)
+        self.assertIsNone(service._asession)
+
+        with OpenSkyStandin(StandinConfig(error_rate=1.0)) as standin:
+            service = OpenSkyService(username='', password='', base_url=standin.base_url)
+            self.assertEqual(asyncio.run(fetch_twice(service)), (None, None))
+
+
+class OpenSkyStandinTests(SimpleTestCase):
+
+    def test_synthetic_flights_are_deterministic(self):
+        with OpenSkyStandin(StandinConfig(flights=25, airports=['Z000', 'Z001'])) as standin:
+            service = OpenSkyService(username='', password='', base_url=standin.base_url)
+            first = list(service.iter_flights_by_airport('Z000', begin=0, end=3600))
+            second = list(service.iter_flights_by_airport('Z000', begin=0, end=3600))
+
+        self.assertEqual(len(first), 25)
+        self.assertEqual(first, second)
+        self.assertTrue(all('Z000' in (f['estDepartureAirport'], f['estArrivalAirport']) for f in first))
+
+    def test_error_rate(self):
+        with OpenSkyStandin(StandinConfig(error_rate=1.0)) as standin:
+            service = OpenSkyService(username='', password='', base_url=standin.base_url)
+            with self.assertRaises(Exception):
+                list(service.iter_flights_by_airport('Z000', begin=0, end=3600))
+
+    def test_record_and_replay(self):
+        import os
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as record_dir:
+            # Роль настоящего API играет вторая заглушка
+            with OpenSkyStandin(StandinConfig(flights=5, states=200)) as upstream:
+                config = StandinConfig(flights=50, record_dir=record_dir, upstream=upstream.base_url)
+                with OpenSkyStandin(config) as standin:
+                    service = OpenSkyService(username='', password='', base_url=standin.base_url)
+                    flights = list(service.iter_flights_by_airport('Z000', begin=0, end=3600))
+                    states = service.get_states((40, 30, 60, 50))
+                    world = service.get_states()
+
+            self.assertEqual(len(flights), 5)
+            self.assertEqual(
+                sorted(os.listdir(record_dir)),
+                ['flights_airport_Z000_0_3600.json', 'states_all.json', 'states_all_40_30_60_50.json']
+            )
+
+            # Без upstream ответы берутся из записи
+            with OpenSkyStandin(StandinConfig(flights=50, record_dir=record_dir)) as standin:
+                service = OpenSkyService(username='', password='', base_url=standin.base_url)
+                self.assertEqual(list(service.iter_flights_by_airport('Z000', begin=0, end=3600)), flights)
+                self.assertEqual(service.get_states((40, 30, 60, 50)), states)
+                self.assertEqual(service.get_states(), world)
+        self.assertTrue(all(40 <= state[6] <= 60 for state in states['states']))
+
+    def test_upstream_errors_not_recorded_and_credentials_forwarded(self):
+        import os
+        import tempfile
+
+        class Upstream(BaseHTTPRequestHandler):
+            statuses = [429, 200]
+            auth = []
+
+            def do_GET(self):
+                self.auth.append(self.headers.get('Authorization'))
+                status = self.statuses.pop(0)
+                body = json.dumps([opensky_flight('AFL1', 'aaa001', 'UUEE', 'ULLI')] if status == 200 else {}).encode()
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Upstream)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        with tempfile.TemporaryDirectory() as record_dir:
+            config = StandinConfig(
+                record_dir=record_dir, upstream=f'http://127.0.0.1:{server.server_port}/api', upstream_auth=('user', 'secret')
+            )
+            with OpenSkyStandin(config) as standin:
+                url = f'{standin.base_url}/flights/airport'
+                params = {'airport': 'UUEE', 'begin': 0, 'end': 3600}
+                # Ошибка upstream отдается как есть и не записывается
+                self.assertEqual(requests.get(url, params=params, timeout=10).status_code, 429)
+                self.assertEqual(os.listdir(record_dir), [])
+                response = requests.get(url, params=params, timeout=10)
+                self.assertEqual((response.status_code, len(response.json())), (200, 1))
+                self.assertEqual(os.listdir(record_dir), ['flights_airport_UUEE_0_3600.json'])
+
+                # Код аэропорта не выводит за каталог записей
+                response = requests.get(url, params={'airport': '../x', 'begin': 0, 'end': 1}, timeout=10)
+                self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(Upstream.auth, ['Basic dXNlcjpzZWNyZXQ='] * 2)
+
+    @override_settings(OPENSKY_BASE_URL='http://127.0.0.1:1/api')
+    def test_base_url_from_settings(self):
+        self.assertEqual(OpenSkyService(username='', password='').base_url, 'http://127.0.0.1:1/api')
+
+
+class SyntheticDatasetTests(TestCase):
+
+    def test_command_loads_clustered_hub_weighted_data(self):
+        call_command('generate_synthetic_dataset', airports=400, flights=3000, clusters=4, prefix='T', stdout=StringIO())
+
+        self.assertEqual(Airport.objects.filter(icao_code__startswith='T').count(), 400)
+        self.assertEqual(Flight.objects.count(), 3000)
+        flight = Flight.objects.first()
+        self.assertGreater(flight.last_seen, flight.first_seen)
+        self.assertEqual(flight.opensky_data, {})
+
+        # Хабы: 10% аэропортов дают заметно больше 10% вылетов
+        counts = sorted(
+            Flight.objects.values('departure_airport').annotate(n=Count('id')).values_list('n', flat=True), reverse=True
+        )
+        self.assertGreater(sum(counts[:40]) / 3000, 0.25)
+        # Маршруты внутри кластера короче
+        self.assertLess(np.median(Flight.objects.values_list('distance_km', flat=True)), 5000)
+
+    def test_same_seed_same_data(self):
+        # Без created_at/last_updated: они равны времени генерации
+        first = [row[:8] for row in next(SyntheticDataset(100, seed=7).flights(50, 0, 3600))]
+        second = [row[:8] for row in next(SyntheticDataset(100, seed=7).flights(50, 0, 3600))]
+        self.assertEqual(first, second)
+
+    def test_existing_prefix_requires_clear(self):
+        call_command('generate_synthetic_dataset', airports=10, flights=10, prefix='T', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('generate_synthetic_dataset', airports=10, flights=10, prefix='T', stdout=StringIO())
+        call_command('generate_synthetic_dataset', airports=20, flights=30, prefix='T', clear=True, stdout=StringIO())
+        self.assertEqual(Airport.objects.count(), 20)
+        self.assertEqual(Flight.objects.count(), 30)
+
+
+class BenchmarkTests(TestCase):
+
+    def test_compare_reports_regressions_over_threshold(self):
+        baseline = {'small': {
+            'autocomplete': {'p50_ms': 2.0, 'p90_ms': 4.0, 'p99_ms': 9.0, 'peak_memory_kb': 100, 'queries_max': 0},
+            'ingest': {'p50_ms': 100.0, 'rows_per_second': 1000, 'peak_memory_kb': 1000},
+        }}
+        current = {'small': {
+            # p90 +50% - регрессия, p99 не сравнивается, +1 SQL-запрос - регрессия
+            'autocomplete': {'p50_ms': 2.3, 'p90_ms': 6.0, 'p99_ms': 30.0, 'peak_memory_kb': 110, 'queries_max': 1},
+            # Задержки импорта не сравниваются, пропускная способность упала в 2 раза
+            'ingest': {'p50_ms': 300.0, 'rows_per_second': 500, 'peak_memory_kb': 1000},
+            'flights_with_radius': {'p50_ms': 50.0},
+        }}
+        regressions = compare(current, baseline, 0.2)
+        self.assertEqual(
+            sorted((r['benchmark'], r['metric']) for r in regressions),
+            [('autocomplete', 'p90_ms'), ('autocomplete', 'queries_max'), ('ingest', 'rows_per_second')]
+        )
+        self.assertEqual(compare(current, baseline, 1.5), [r for r in regressions if r['metric'] == 'queries_max'])
+
+        # Прирост меньше MIN_LATENCY_DELTA_MS - шум
+        self.assertEqual(compare({'s': {'a': {'p50_ms': 0.3}}}, {'s': {'a': {'p50_ms': 0.1}}}, 0.2), [])
+
+    def test_parse_sizes_and_percentile(self):
+        self.assertEqual(parse_sizes('small,500:2000'), {'small': (1000, 20000), '500:2000': (500, 2000)})
+        with self.assertRaises(ValueError):
+            parse_sizes('huge')
+        self.assertEqual(percentile(list(range(1, 101)), 0.5), 50)
+        self.assertEqual(percentile(list(range(1, 101)), 0.99), 99)
+
+    def test_command_writes_results_and_fails_on_regression(self):
+        import os
+        import tempfile
+
+        # Реальный аэропорт в текущей БД прогон не должен трогать
+        Airport.objects.create(icao_code='KJFK', name='John F Kennedy Intl', latitude=40.64, longitude=-73.78)
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            call_command(
+                'run_benchmarks', sizes='40:300', requests=5, ingest_airports=2, ingest_flights=10,
+                current_db=True, output=output, stdout=StringIO()
+            )
+            with open(output) as f:
+                report = json.load(f)
+            results = report['results']['40:300']
+            self.assertEqual(set(results), {'airports_in_radius', 'autocomplete', 'flights_with_radius', 'ingest'})
+            self.assertEqual(results['autocomplete']['requests'], 5)
+            self.assertEqual(results['autocomplete']['errors'], 0)
+            self.assertGreater(results['ingest']['rows'], 0)
+            # Набор удален после прогона в текущей БД
+            self.assertFalse(Airport.objects.filter(icao_code__startswith='Z9').exists())
+            self.assertTrue(Airport.objects.filter(icao_code='KJFK').exists())
+
+            # Базовая линия без SQL-запросов: любой запрос - регрессия
+            for result in report['results']['40:300'].values():
+                if 'queries_max' in result:
+                    result['queries_max'] = -1
+            baseline = os.path.join(directory, 'baseline.json')
+            with open(baseline, 'w') as f:
+                json.dump(report, f)
+            with self.assertRaises(CommandError):
+                call_command(
+                    'run_benchmarks', sizes='40:300', requests=5, ingest_airports=2, ingest_flights=10,
+                    current_db=True, baseline=baseline, stdout=StringIO(), stderr=StringIO()
+                )
+
+
+class IngestSchedulerTests(SimpleTestCase):
+
+    def test_busy_airports_refresh_more_often(self):
+        self.assertEqual(refresh_interval(0), 24 * 3600)
+        self.assertEqual(refresh_interval(1500), 1152)
+        self.assertEqual(refresh_interval(100000), 15 * 60)
+
+    def test_queue_order_and_metrics(self):
+        scheduler = IngestScheduler(min_interval=60, max_interval=3600)
+        scheduler.sync(['HUB1', 'QUIET', 'NEW1'], traffic={'HUB1': 100000}, last_runs={'HUB1': 990, 'QUIET': 0}, now=1000)
+
+        # NEW1 без watermark - сразу, HUB1 - через минуту после watermark, QUIET - через час
+        self.assertEqual(scheduler.metrics(1000)['queue_depth'], 1)
+        self.assertEqual(scheduler.pop_due(1000), ['NEW1'])
+        self.assertEqual(scheduler.metrics(4000), {
+            'airports': 2, 'queue_depth': 2, 'lag_seconds': 2950.0, 'next_run_in_seconds': 0.0, 'updated_at': 4000,
+        })
+        self.assertEqual(scheduler.pop_due(4000, limit=1), ['HUB1'])
+
+        scheduler.completed('HUB1', 4000)
+        scheduler.completed('NEW1', 4000)
+        self.assertEqual(scheduler.pop_due(4100), ['QUIET', 'HUB1'])
+        self.assertEqual(scheduler.next_run(), 4000 + 3600)
+
+
+class IngestSchedulerCommandTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubOpenSkyHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        StubOpenSkyHandler.requests = []
+        StubOpenSkyHandler.windows = []
+
+    def test_one_cycle_imports_due_airports_and_publishes_metrics(self):
+        for i in range(3):
+            Airport.objects.create(icao_code=f'SC{i:02d}', name=f'Scheduled {i}', city='', country='', latitude=i, longitude=i)
+
+        call_command(
+            'run_ingest_scheduler', cycles=1, rate=100, burst=10, airports_per_cycle=2,
+            base_url=f'http://127.0.0.1:{self.server.server_port}', stdout=StringIO()
+        )
+
+        # UUEE появился как аэропорт-заглушка уже после загрузки очереди
+        self.assertEqual(len(StubOpenSkyHandler.requests), 2)
+        self.assertEqual(load_traffic(now=1700000000 + 3600)['UUEE'], 2)
+        metrics = get_metrics()
+        self.assertEqual((metrics['cycles'], metrics['rows_written'], metrics['queue_depth']), (1, 2, 1))
+        self.assertEqual(self.client.get('/api/ingest/metrics/').json()['cycles'], 1)
+
+
+    def test_failed_import_reschedules_airports(self):
+        for i in range(2):
+            Airport.objects.create(icao_code=f'SC{i:02d}', name=f'Scheduled {i}', city='', country='', latitude=i, longitude=i)
+        calls = []
+        original = ImportCommand.import_concurrently
+
+        def import_concurrently(importer, windows, *args, **kwargs):
+            calls.append(sorted(windows))
+            if len(calls) == 1:
+                raise RuntimeError('OpenSky недоступен')
+            return original(importer, windows, *args, **kwargs)
+
+        with patch.object(ImportCommand, 'import_concurrently', import_concurrently):
+            call_command(
+                'run_ingest_scheduler', cycles=1, rate=100, burst=10, airports_per_cycle=2, retry_delay=0, poll=0,
+                base_url=f'http://127.0.0.1:{self.server.server_port}', stdout=StringIO()
+            )
+
+        # После ошибки те же аэропорты снова в очереди и загружаются следующим циклом
+        self.assertEqual(calls, [['SC00', 'SC01'], ['SC00', 'SC01']])
+        self.assertEqual(len(StubOpenSkyHandler.requests), 2)
+
+    def test_failed_airport_retried_without_waiting_for_interval(self):
+        for i in range(2):
+            Airport.objects.create(icao_code=f'SC{i:02d}', name=f'Scheduled {i}', city='', country='', latitude=i, longitude=i)
+        calls = []
+        original = OpenSkyService.iter_flights_by_airport
+
+        def iter_flights_by_airport(service, airport_icao, begin, end):
+            calls.append(airport_icao)
+            if airport_icao == 'SC01' and calls.count('SC01') == 1:
+                raise requests.ConnectionError('обрыв соединения')
+            return original(service, airport_icao, begin, end)
+
+        with patch.object(OpenSkyService, 'iter_flights_by_airport', iter_flights_by_airport):
+            call_command(
+                'run_ingest_scheduler', cycles=2, rate=100, burst=10, airports_per_cycle=2, retry_delay=0, poll=0,
+                base_url=f'http://127.0.0.1:{self.server.server_port}', stdout=StringIO()
+            )
+
+        # Во втором цикле - только SC01, SC00 ждет свой обычный интервал
+        self.assertEqual(sorted(calls[:2]), ['SC00', 'SC01'])
+        self.assertEqual(calls[2:], ['SC01'])
+        self.assertEqual(set(IngestWatermark.objects.values_list('airport_id', flat=True)), {'SC00', 'SC01'})
+
+
+class LiveStateTests(SimpleTestCase):
+
+    def setUp(self):
+        states = [
+            ['aaa001', 'AFL100  ', 'Russia', 0, 0, 37.4, 55.9, 9000.0, False, 230.0, 90.0, 0.0, None, 9100.0, '1000', False, 0],
+            ['aaa002', 'AFL200  ', 'Russia', 0, 0, 30.3, 59.8, 0.0, True, 0.0, 0.0, 0.0, None, 0.0, '1000', False, 0],
+            ['aaa003', 'DLH300  ', 'Germany', 0, 0, 8.5, 50.0, 11000.0, False, 240.0, 270.0, 0.0, None, 11100.0, '1000', False, 0],
+            ['aaa004', None, 'Germany', 0, 0, None, None, None, False, None, None, None, None, None, None, False, 0],
+        ]
+        self.fetches = []
+
+        def fetch():
+            self.fetches.append(1)
+            return {'time': 1700000000, 'states': states}
+
+        self.refresher = live_state.LiveStateRefresher(fetch, interval=3600)
+        self.addCleanup(self.refresher.stop)
+        previous, live_state._refresher = live_state._refresher, self.refresher
+        self.addCleanup(setattr, live_state, '_refresher', previous)
+
+    def test_snapshot_query(self):
+        snapshot = self.refresher.refresh()
+        self.assertEqual(len(snapshot), 4)
+        total, found = snapshot.query(bbox=(50, 20, 60, 40))
+        self.assertEqual((total, [a['icao24'] for a in found]), (2, ['aaa001', 'aaa002']))
+        total, found = snapshot.query(callsign='afl', limit=1)
+        self.assertEqual((total, [a['callsign'] for a in found]), (2, ['AFL100']))
+        total, found = snapshot.query(center=(55.0, 37.0), radius_km=1000)
+        self.assertEqual([a['icao24'] for a in found], ['aaa001', 'aaa002'])
+        self.assertLess(found[0]['distance_km'], found[1]['distance_km'])
+        self.assertEqual(found[0]['origin_country'], 'Russia')
+        self.assertIsNone(snapshot.query(callsign='')[1][3]['latitude'])
+
+    def test_view_serves_snapshot_without_fetching_per_request(self):
+        for _ in range(3):
+            response = self.client.get('/api/data/', {'lamin': 45, 'lomin': 0, 'lamax': 60, 'lomax': 40, 'callsign': 'DLH'})
+        self.assertEqual(len(self.fetches), 1)
+
+        data = response.json()
+        self.assertEqual((data['total'], data['time']), (1, 1700000000))
+        self.assertEqual(data['aircraft'][0]['icao24'], 'aaa003')
+        self.assertLess(data['age_seconds'], 60)
+        self.assertEqual(self.client.get('/api/data/', {'lamin': 45}).status_code, 400)
+
+    async def test_async_view_matches_sync(self):
+        params = {'lat': 55.0, 'lon': 37.0, 'radius': 1000}
+        response = await self.async_client.get('/api/async/data/', params)
+        expected = await sync_to_async(self.client.get)('/api/data/', params)
+        data, expected = response.json(), expected.json()
+        self.assertEqual([a['icao24'] for a in data['aircraft']], ['aaa001', 'aaa002'])
+        self.assertEqual(data['aircraft'], expected['aircraft'])
+        self.assertEqual(len(self.fetches), 1)
+
+    async def test_stream_view(self):
+        response = await self.async_client.get('/api/data/stream/', {'lamin': 45, 'lomin': 0, 'lamax': 60, 'lomax': 40})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        first = await anext(response.streaming_content)
+        await response.streaming_content.aclose()
+        self.assertTrue(first.startswith(b'event: snapshot\nid: 1700000000\n'))
+
+
+    def test_backoff_on_errors_and_rate_limit(self):
+        response = requests.Response()
+        response.status_code = 429
+        response.headers['X-Rate-Limit-Retry-After-Seconds'] = '1800'
+        service = OpenSkyService(base_url='http://opensky.invalid')
+        with patch.object(service.session, 'get', return_value=response):
+            with self.assertRaises(RateLimited) as raised:
+                service.get_states()
+        self.assertEqual(raised.exception.retry_after, 1800)
+
+        def rate_limited():
+            raise raised.exception
+
+        def failing():
+            raise ValueError('oops')
+
+        results = [lambda: None, failing, lambda: None, rate_limited, lambda: {'time': 1, 'states': []}]
+        refresher = live_state.LiveStateRefresher(lambda: results.pop(0)(), interval=10, max_backoff=60)
+        waits = []
+
+        def wait(timeout):
+            waits.append(round(timeout))
+            if not results:
+                refresher.stop()
+
+        with patch.object(refresher._stopped, 'wait', side_effect=wait):
+            refresher._run()
+        # Пауза удваивается до max_backoff, retry_after от OpenSky важнее, успех сбрасывает счетчик
+        self.assertEqual(waits, [20, 40, 60, 1800, 10])
+
+    def test_polling_stops_when_idle_and_restarts_on_get(self):
+        refresher = live_state.LiveStateRefresher(self.refresher.fetch, interval=0.01, idle_timeout=0.2)
+        self.addCleanup(refresher.stop)
+        self.assertIsNotNone(refresher.get())
+
+        for _ in range(100):
+            if refresher._thread is None:
+                break
+            time.sleep(0.05)
+        self.assertIsNone(refresher._thread)
+        fetched = len(self.fetches)
+        time.sleep(0.1)
+        self.assertEqual(len(self.fetches), fetched)
+
+        self.assertIsNotNone(refresher.get())
+        self.assertIsNotNone(refresher._thread)
+        self.assertGreater(len(self.fetches), fetched)
+
+
+class LiveStreamTests(SimpleTestCase):
+
+    def state(self, icao24, lat, lon, callsign='AFL1'):
+        return [icao24, callsign, 'Russia', 0, 0, lon, lat, 9000.0, False, 230.0, 90.0, 0.0, None, 9100.0, '1000', False, 0]
+
+    def test_diff_positions(self):
+        previous = {'a': (1,), 'b': (2,), 'c': (3,)}
+        self.assertEqual(diff_positions(previous, {'a': (1,), 'b': (5,), 'd': (4,)}), {'changed': {'b': (5,), 'd': (4,)}, 'removed': ['c']})
+        self.assertIsNone(diff_positions(previous, dict(previous)))
+
+    def test_snapshot_then_deltas_for_viewport(self):
+        refresher = live_state.LiveStateRefresher(lambda: None)
+        snapshots = [
+            [self.state('aaa001', 55.9, 37.4), self.state('aaa002', 59.8, 30.3), self.state('bbb001', 10.0, 10.0)],
+            [self.state('aaa001', 55.9, 37.5), self.state('aaa002', 59.8, 30.3), self.state('bbb001', 10.5, 10.0)],
+            [self.state('aaa002', 59.8, 30.3)],
+        ]
+        refresher.get = lambda timeout=None: refresher.snapshot
+        refresher.snapshot = live_state.LiveStateSnapshot.from_states(snapshots[0], 1)
+
+        async def collect():
+            events = []
+            stream = aircraft_events(refresher, bbox=(50, 20, 60, 40), poll_interval=0)
+            events.append(await anext(stream))
+            for i, states in enumerate(snapshots[1:], start=2):
+                refresher.snapshot = live_state.LiveStateSnapshot.from_states(states, i)
+                events.append(await anext(stream))
+            await stream.aclose()
+            return events
+
+        events = asyncio.run(collect())
+        parsed = [(event.split('\n')[0], json.loads(event.split('data: ')[1])) for event in events]
+
+        self.assertEqual(parsed[0][0], 'event: snapshot')
+        self.assertEqual(sorted(parsed[0][1]['aircraft']), ['aaa001', 'aaa002'])
+        # bbb001 вне области - его перемещение не попадает в поток
+        self.assertEqual(parsed[1], ('event: delta', {
+            'time': 2, 'changed': {'aaa001': ['AFL1', 55.9, 37.5, 9100.0, 230.0, 90.0, False]}, 'removed': [],
+        }))
+        self.assertEqual(parsed[2][1], {'time': 3, 'changed': {}, 'removed': ['aaa001']})
+
+
+class TrackTests(TestCase):
+
+    def state(self, icao24, time_position, lat, lon):
+        return [icao24, 'AFL1', 'Russia', time_position, time_position, lon, lat, 9000.0, False, 230.0, 90.0, 0.0, None, None, '1000', False, 0]
+
+    def test_recorder_skips_unchanged_positions(self):
+        recorder = TrackRecorder()
+        first = live_state.LiveStateSnapshot.from_states([self.state('aaa001', 100, 55.0, 37.0), self.state('aaa002', 0, 1.0, 1.0)])
+        second = live_state.LiveStateSnapshot.from_states([self.state('aaa001', 100, 55.0, 37.0)])
+        third = live_state.LiveStateSnapshot.from_states([self.state('aaa001', 110, 55.1, 37.1)])
+
+        self.assertEqual([recorder.record(s) for s in (first, second, third)], [1, 0, 1])
+        point = TrackPoint.objects.get(time=110)
+        self.assertEqual((point.altitude, point.heading), (9000.0, 90.0))
+
+    def test_downsample_keeps_full_resolution_for_last_hour(self):
+        now = 100800
+        TrackPoint.objects.bulk_create([
+            TrackPoint(icao24='aaa001', time=t, latitude=0, longitude=0)
+            for t in range(now - 2 * 3600, now, 10)
+        ])
+
+        deleted = downsample_tracks(now=now)
+        old_times = list(TrackPoint.objects.filter(time__lt=now - 3600).values_list('time', flat=True))
+        self.assertEqual(len(old_times), 60)
+        self.assertTrue(all(t % 60 == 0 for t in old_times))
+        self.assertEqual(TrackPoint.objects.filter(time__gte=now - 3600).count(), 360)
+        self.assertEqual(deleted, 300)
+        self.assertEqual(downsample_tracks(now=now), 0)
+
+    def test_track_endpoint(self):
+        TrackPoint.objects.bulk_create([
+            TrackPoint(icao24='aaa001', time=t, latitude=t / 1000, longitude=1, on_ground=False) for t in (1000, 2000, 3000)
+        ])
+        data = self.client.get('/api/tracks/AAA001/', {'begin': 1500, 'end': 3000}).json()
+        self.assertEqual(data['fields'][:3], ['time', 'latitude', 'longitude'])
+        self.assertEqual([point[0] for point in data['points']], [2000, 3000])
+        self.assertEqual(self.client.get('/api/tracks/aaa001/', {'begin': 0, 'end': 10 ** 9}).status_code, 400)
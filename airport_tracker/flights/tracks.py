@@ -0,0 +1,109 @@
+import time
+
+import numpy as np
+from django.db import close_old_connections
+from django.db.models import F, Min, Subquery
+
+from .models import TrackPoint
+
+# Сколько последних секунд траектории хранится со всеми точками
+FULL_RESOLUTION_SECONDS = 3600
+
+# Шаг прореживания более старых точек, сек: одна точка на интервал
+DOWNSAMPLE_STEP = 60
+
+# Максимальный диапазон одного запроса трека, сек
+MAX_TRACK_RANGE = 7 * 24 * 3600
+
+# Поля точки в ответе /api/tracks/<icao24>/, по порядку
+TRACK_FIELDS = ('time', 'latitude', 'longitude', 'altitude', 'velocity', 'heading', 'on_ground')
+
+
+class TrackRecorder:
+    """Слушатель LiveStateRefresher: пишет точки треков из каждого снимка.
+
+    Точка пишется, только если у самолета новое время позиции
+    (time_position), так что снимки без новых данных почти ничего не стоят.
+    """
+
+    def __init__(self, batch_size=2000):
+        self.batch_size = batch_size
+        self.last_times = {}
+
+    def __call__(self, snapshot):
+        # Вызывается из фонового потока - соединение с БД у потока свое
+        close_old_connections()
+        try:
+            return self.record(snapshot)
+        finally:
+            close_old_connections()
+
+    def record(self, snapshot):
+        columns = snapshot.columns
+        indices = np.flatnonzero(~np.isnan(columns['latitude']) & (columns['time_position'] > 0))
+
+        altitude = columns['geo_altitude'][indices]
+        altitude = np.where(np.isnan(altitude), columns['baro_altitude'][indices], altitude)
+        rows = zip(
+            [value.decode() for value in columns['icao24'][indices].tolist()],
+            columns['time_position'][indices].tolist(),
+            columns['latitude'][indices].tolist(),
+            columns['longitude'][indices].tolist(),
+            altitude.astype(np.float64).tolist(),
+            columns['velocity'][indices].astype(np.float64).tolist(),
+            columns['true_track'][indices].astype(np.float64).tolist(),
+            columns['on_ground'][indices].tolist(),
+        )
+
+        points = []
+        for icao24, time_, lat, lon, alt, velocity, heading, on_ground in rows:
+            if self.last_times.get(icao24) == time_:
+                continue
+            self.last_times[icao24] = time_
+            points.append(TrackPoint(
+                icao24=icao24, time=time_, latitude=lat, longitude=lon,
+                altitude=None if alt != alt else alt,
+                velocity=None if velocity != velocity else velocity,
+                heading=None if heading != heading else heading,
+                on_ground=on_ground,
+            ))
+
+        TrackPoint.objects.bulk_create(points, batch_size=self.batch_size, ignore_conflicts=True)
+        return len(points)
+
+
+def downsample_tracks(now=None, full_resolution=FULL_RESOLUTION_SECONDS, step=DOWNSAMPLE_STEP,
+                      window=24 * 3600, retention=None):
+    """Прореживает точки старше full_resolution: остается первая точка
+    каждого интервала step по каждому самолету.
+
+    Обрабатывается только window секунд перед границей, поэтому запуск раз
+    в несколько минут не пересматривает всю таблицу; интервалы привязаны к
+    time // step, повторный запуск ничего не меняет. retention - удалить
+    точки старше этого числа секунд. Возвращает число удаленных точек.
+    """
+    now = int(now if now is not None else time.time())
+    cutoff = now - full_resolution
+    old_points = TrackPoint.objects.filter(time__gte=cutoff - window, time__lt=cutoff)
+
+    keep = (
+        old_points.annotate(bucket=F('time') / step)
+        .values('icao24', 'bucket')
+        .annotate(keep_id=Min('id'))
+        .values('keep_id')
+    )
+    deleted, _ = old_points.exclude(id__in=Subquery(keep)).delete()
+
+    if retention:
+        expired, _ = TrackPoint.objects.filter(time__lt=now - retention).delete()
+        deleted += expired
+    return deleted
+
+
+# Точки трека по времени: список списков в порядке TRACK_FIELDS
+def get_track(icao24, begin, end):
+    return [
+        list(point) for point in
+        TrackPoint.objects.filter(icao24=icao24.lower(), time__gte=begin, time__lte=end)
+        .order_by('time').values_list(*TRACK_FIELDS)
+    ]
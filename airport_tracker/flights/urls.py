@@ -4,4 +4,8 @@ from . import views
 urlpatterns = [
     # path('', views.aircraft_map, name='map'),
     path('data/', views.aircraft_data, name='data'),
+    path('async/data/', views.aircraft_data_async, name='data_async'),
+    path('data/stream/', views.aircraft_stream, name='data_stream'),
+    path('tracks/<str:icao24>/', views.aircraft_track, name='aircraft_track'),
+    path('ingest/metrics/', views.ingest_metrics, name='ingest_metrics'),
 ]   
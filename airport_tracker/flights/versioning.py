@@ -0,0 +1,90 @@
+import itertools
+import threading
+import time
+
+from django.core.cache import cache
+
+# Версия справочника аэропортов. Хранится в общем кэше, чтобы все воркеры
+# узнали об изменении, плюс локальный счетчик на случай DummyCache
+AIRPORTS_VERSION_KEY = 'flights:airports:version'
+
+_local_versions = itertools.count()
+_local_version = next(_local_versions)
+
+
+def airports_version():
+    version = cache.get(AIRPORTS_VERSION_KEY)
+    if version is None:
+        cache.add(AIRPORTS_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(AIRPORTS_VERSION_KEY)
+    return (_local_version, version)
+
+
+# airports_version для корутин: тот же ключ через асинхронный API кэша
+async def aairports_version():
+    version = await cache.aget(AIRPORTS_VERSION_KEY)
+    if version is None:
+        await cache.aadd(AIRPORTS_VERSION_KEY, time.time_ns(), timeout=None)
+        version = await cache.aget(AIRPORTS_VERSION_KEY)
+    return (_local_version, version)
+
+
+# Вызывается при любом изменении таблицы airports. bulk_create и update()
+# не посылают сигналов, поэтому после них версию нужно поднимать вручную
+def bump_airports_version():
+    global _local_version
+    _local_version = next(_local_versions)
+    try:
+        cache.incr(AIRPORTS_VERSION_KEY)
+    except ValueError:
+        cache.add(AIRPORTS_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+# Версия рейсов аэропорта: меняется, когда импорт записал рейсы из него или в него
+FLIGHTS_VERSION_KEY = 'flights:flights:version:{}'
+
+
+def flights_version(icao_code):
+    key = FLIGHTS_VERSION_KEY.format(icao_code)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def aflights_version(icao_code):
+    key = FLIGHTS_VERSION_KEY.format(icao_code)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_flights_versions(icao_codes):
+    now = time.time_ns()
+    cache.set_many({FLIGHTS_VERSION_KEY.format(icao): now for icao in icao_codes}, timeout=None)
+
+
+class AirportsVersionedValue:
+    """Значение, вычисляемое по справочнику аэропортов (например, индекс).
+
+    Строится лениво при первом обращении и пересобирается, когда меняется
+    версия аэропортов.
+    """
+
+    def __init__(self, builder):
+        self.builder = builder
+        self._value = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        version = airports_version()
+        if self._value is None or self._version != version:
+            with self._lock:
+                if self._value is None or self._version != version:
+                    self._value = self.builder()
+                    self._version = version
+        return self._value
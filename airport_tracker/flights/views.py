@@ -1,34 +1,115 @@
-import asyncio
-from python_opensky import OpenSky
-from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from flights.live_state import get_live_state_refresher
+from flights.live_stream import aircraft_events
+from flights.management.scheduler import get_metrics
+from flights.responses import json_response
+from flights.tracks import MAX_TRACK_RANGE, TRACK_FIELDS, get_track
+import time
 
-async def fetch_aircraft():# Асинхронная функция для получения данных
-    
-    async with OpenSky() as opensky:# Запрашиваем все самолеты над Европой
-        states = await opensky.get_states()
-        return states
+# Сколько самолетов отдавать по умолчанию и максимум за один запрос
+DEFAULT_AIRCRAFT_LIMIT = 20
+MAX_AIRCRAFT_LIMIT = 5000
 
 # def aircraft_map(request): # Основная view - показывает карту
 #     return render(request, 'flight_tracker/map.html')
 
+# Область lamin, lomin, lamax, lomax из параметров запроса или None
+def parse_bbox(params):
+    bbox_params = [params.get(name) for name in ('lamin', 'lomin', 'lamax', 'lomax')]
+    if not any(bbox_params):
+        return None
+    return tuple(float(value) for value in bbox_params)
+
+
 def aircraft_data(request):# API endpoint - отдает данные в JSON
-    
+    # Данные берутся из снимка в памяти (LiveStateRefresher), а не из OpenSky на каждый запрос.
+    # Параметры: lamin, lomin, lamax, lomax - область, lat, lon, radius - круг в км
+    # (самолеты по расстоянию), callsign - начало позывного, limit
+    try:
+        query = parse_aircraft_query(request.GET)
+    except (KeyError, TypeError, ValueError):
+        return JsonResponse({'error': 'Неверные параметры: нужны все lamin, lomin, lamax, lomax или lat, lon, radius и целый limit'}, status=400)
+
+    return aircraft_response(request, get_live_state_refresher().get(), query)
+
+
+async def aircraft_data_async(request):# то же для ASGI: ожидание первого снимка не держит поток воркера
+    try:
+        query = parse_aircraft_query(request.GET)
+    except (KeyError, TypeError, ValueError):
+        return JsonResponse({'error': 'Неверные параметры: нужны все lamin, lomin, lamax, lomax или lat, lon, radius и целый limit'}, status=400)
+
+    snapshot = await sync_to_async(get_live_state_refresher().get, thread_sensitive=False)()
+    return aircraft_response(request, snapshot, query)
+
+
+# Параметры aircraft_data -> аргументы LiveStateSnapshot.query
+def parse_aircraft_query(params):
+    center = radius = None
+    if params.get('radius'):
+        center = (float(params['lat']), float(params['lon']))
+        radius = float(params['radius'])
+    limit = min(int(params.get('limit', DEFAULT_AIRCRAFT_LIMIT)), MAX_AIRCRAFT_LIMIT)
+    return {
+        'bbox': parse_bbox(params), 'callsign': params.get('callsign'),
+        'center': center, 'radius_km': radius, 'limit': max(limit, 0),
+    }
+
+
+def aircraft_response(request, snapshot, query):
+    if snapshot is None:
+        return JsonResponse({'error': 'Данные о самолетах еще не загружены'}, status=503)
+
+    total, aircraft_list = snapshot.query(**query)
+    return json_response(request, {
+        'aircraft': aircraft_list,
+        'total': total,
+        'time': snapshot.time,
+        'age_seconds': round(snapshot.age, 1),
+    })
+
+
+async def aircraft_stream(request):# SSE - позиции самолетов в области, дальше только изменения
+    # Параметры: lamin, lomin, lamax, lomax - область просмотра, callsign, limit.
+    # Работает под ASGI (airport_tracker/asgi.py); новая область - новое подключение
     try:
-        states_data = asyncio.run(fetch_aircraft())
-        # Преобразуем в простой список словарей
-        aircraft_list = []
-        for state in states_data.states[:20]:  # Берем первые 20 самолетов
-            aircraft_list.append({
-                'callsign': state.callsign.strip() if state.callsign else 'N/A',
-                'icao24' : state.icao24
-                # 'latitude': state.latitude,
-                # 'longitude': state.longitude,
-                # 'velocity': state.velocity,
-                # 'altitude': state.geo_altitude,
-            })
-        
-        return JsonResponse({'aircraft': aircraft_list})
-    
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
\ No newline at end of file
+        bbox = parse_bbox(request.GET)
+        limit = min(int(request.GET.get('limit', MAX_AIRCRAFT_LIMIT)), MAX_AIRCRAFT_LIMIT)
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Неверные параметры: нужны все lamin, lomin, lamax, lomax и целый limit'}, status=400)
+
+    response = StreamingHttpResponse(
+        aircraft_events(get_live_state_refresher(), bbox, request.GET.get('callsign'), max(limit, 0)),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def aircraft_track(request, icao24):# API endpoint - трек самолета из сохраненных точек
+    # Параметры: begin, end - unix time (по умолчанию последние сутки)
+    try:
+        end = int(request.GET.get('end') or time.time())
+        begin = int(request.GET.get('begin') or end - 24 * 3600)
+    except ValueError:
+        return JsonResponse({'error': 'begin и end должны быть unix time'}, status=400)
+    if end < begin or end - begin > MAX_TRACK_RANGE:
+        return JsonResponse({'error': f'Диапазон должен быть от 0 до {MAX_TRACK_RANGE} секунд'}, status=400)
+
+    return JsonResponse({
+        'icao24': icao24.lower(),
+        'begin': begin,
+        'end': end,
+        'fields': TRACK_FIELDS,
+        'points': get_track(icao24, begin, end),
+    })
+
+
+def ingest_metrics(request):# API endpoint - метрики планировщика импорта (run_ingest_scheduler)
+    metrics = get_metrics()
+    if metrics is None:
+        return JsonResponse({'error': 'Планировщик импорта не запущен'}, status=404)
+    return JsonResponse(metrics)
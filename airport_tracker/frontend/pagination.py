@@ -0,0 +1,111 @@
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Q
+
+# Время жизни приблизительного количества записей в кэше, сек
+COUNT_CACHE_TIMEOUT = 300
+
+
+# Порядок по умолчанию; последнее поле уникально, поэтому порядок полный
+DEFAULT_ORDERING = ('name', 'icao_code')
+
+
+def encode_cursor(direction, *values):
+    payload = json.dumps([direction, *values], ensure_ascii=False).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+# Возвращает (direction, значения полей порядка) или None, если токен поврежден
+# или собран для другого порядка (например, страница поиска без запроса)
+def decode_cursor(token, size=len(DEFAULT_ORDERING)):
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, *values = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        return None
+    if direction not in ('next', 'prev') or len(values) != size:
+        return None
+    return direction, values
+
+
+class KeysetPage:
+    """Страница keyset-пагинации по полям ordering (по умолчанию name, icao_code).
+
+    Вместо OFFSET следующая страница начинается после последней записи
+    текущей, поэтому любая страница стоит столько же, сколько первая.
+    """
+
+    def __init__(self, object_list, has_next, has_previous, ordering=DEFAULT_ORDERING):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.ordering = ordering
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def _cursor(self, direction, obj):
+        return encode_cursor(direction, *(getattr(obj, field.lstrip('-')) for field in self.ordering))
+
+    @property
+    def next_cursor(self):
+        if not self.has_next or not self.object_list:
+            return None
+        return self._cursor('next', self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous or not self.object_list:
+            return None
+        return self._cursor('prev', self.object_list[0])
+
+
+# Условие "строка после values в порядке ordering" (before=True - перед ней):
+# (a > x) OR (a = x AND b > y) OR ...; для полей с '-' сравнение обратное
+def _beyond(ordering, values, before=False):
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') != before else 'gt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+    return condition
+
+
+def _reverse(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+def keyset_page(queryset, cursor=None, per_page=20, ordering=DEFAULT_ORDERING):
+    """ordering - поля порядка, последнее должно быть уникальным. Поле может
+    быть аннотацией queryset (например, search_rank результатов поиска)."""
+    position = decode_cursor(cursor, len(ordering))
+
+    if position is None:
+        rows = list(queryset.order_by(*ordering)[:per_page + 1])
+        return KeysetPage(rows[:per_page], has_next=len(rows) > per_page, has_previous=False, ordering=ordering)
+
+    direction, values = position
+    if direction == 'next':
+        rows = list(queryset.filter(_beyond(ordering, values)).order_by(*ordering)[:per_page + 1])
+        return KeysetPage(rows[:per_page], has_next=len(rows) > per_page, has_previous=True, ordering=ordering)
+
+    # Назад: берем записи перед курсором в обратном порядке и разворачиваем
+    rows = list(queryset.filter(_beyond(ordering, values, before=True)).order_by(*_reverse(ordering))[:per_page + 1])
+    return KeysetPage(rows[:per_page][::-1], has_next=True, has_previous=len(rows) > per_page, ordering=ordering)
+
+
+# Количество записей для заголовка страницы. Кэшируется на COUNT_CACHE_TIMEOUT,
+# поэтому может немного отставать от таблицы, зато COUNT(*) не выполняется на каждой странице
+def approximate_count(queryset, key):
+    cache_key = 'airports:count:' + hashlib.md5(key.encode()).hexdigest()
+    return cache.get_or_set(cache_key, queryset.count, COUNT_CACHE_TIMEOUT)
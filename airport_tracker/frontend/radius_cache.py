@@ -0,0 +1,127 @@
+import math
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+from flights.models import Airport
+from flights.spatial_index import find_airports_in_radius
+from flights.versioning import aairports_version, aflights_version, airports_version, flights_version
+
+# Радиус округляется вверх до кратного RADIUS_BUCKET_KM: в кэше лежит результат
+# для округленного радиуса, а ответ на точный радиус отфильтровывается из него
+RADIUS_BUCKET_KM = 50
+
+RESULT_CACHE_TIMEOUT = 600
+
+
+def radius_bucket(radius_km):
+    return max(1, math.ceil(radius_km / RADIUS_BUCKET_KM)) * RADIUS_BUCKET_KM
+
+
+def _shared_airports_version():
+    # Только общая часть версии: локальный счетчик у каждого процесса свой
+    return airports_version()[1]
+
+
+async def _ashared_airports_version():
+    return (await aairports_version())[1]
+
+
+def airports_in_radius(lat, lon, radius_km, exclude=None):
+    """find_airports_in_radius через кэш.
+
+    Ключ - точка, корзина радиуса и версия аэропортов, поэтому после
+    изменения справочника старые записи просто перестают читаться.
+    """
+    bucket = radius_bucket(radius_km)
+    key = f'radius:airports:{lat:.5f}:{lon:.5f}:{bucket}:{exclude}:{_shared_airports_version()}'
+    nearby = cache.get(key)
+    if nearby is None:
+        nearby = find_airports_in_radius(lat, lon, bucket, exclude=exclude)
+        cache.set(key, nearby, RESULT_CACHE_TIMEOUT)
+    return [(airport, distance) for airport, distance in nearby if distance <= radius_km]
+
+
+# Центральный аэропорт по коду или None; тоже из кэша, чтобы популярные
+# запросы не ходили в БД вовсе
+def center_airport(icao_code):
+    key = _center_key(icao_code)
+    airport = cache.get(key)
+    if airport is None:
+        airport = Airport.objects.filter(icao_code=icao_code).first() or False
+        cache.set(key, airport, RESULT_CACHE_TIMEOUT)
+    return airport or None
+
+
+async def acenter_airport(icao_code):
+    key = _center_key(icao_code, await _ashared_airports_version())
+    airport = await cache.aget(key)
+    if airport is None:
+        airport = await Airport.objects.filter(icao_code=icao_code).afirst() or False
+        await cache.aset(key, airport, RESULT_CACHE_TIMEOUT)
+    return airport or None
+
+
+def _center_key(icao_code, version=None):
+    return f'radius:center:{icao_code}:{_shared_airports_version() if version is None else version}'
+
+
+def flights_in_radius(center_airport, radius_km, compute_flights):
+    """Аэропорты в радиусе от center_airport и рейсы между ними и центром.
+
+    compute_flights(center_icao, nearby_icao) считает рейсы при промахе.
+    Все рейсы результата связаны с центром, поэтому ключ включает версию
+    рейсов только центрального аэропорта (поднимается импортом).
+    Возвращает (список (аэропорт, расстояние), список рейсов).
+    """
+    bucket = radius_bucket(radius_km)
+    key = _flights_key(center_airport.icao_code, bucket)
+    result = cache.get(key)
+    if result is None:
+        nearby = _nearby(center_airport, bucket)
+        result = (nearby, compute_flights(center_airport.icao_code, [airport['icao_code'] for airport, _ in nearby]))
+        cache.set(key, result, RESULT_CACHE_TIMEOUT)
+    return _within(result, radius_km)
+
+
+async def aflights_in_radius(center_airport, radius_km, compute_flights):
+    """flights_in_radius для async views: compute_flights - корутина.
+
+    Тот же кэш, что у синхронной версии, через асинхронный API кэша: сетевой
+    бэкенд (Redis, Memcached) не блокирует цикл событий. Поиск аэропортов идет
+    в пуле потоков: индекс в памяти может строиться из БД при первом обращении.
+    """
+    bucket = radius_bucket(radius_km)
+    versions = (await _ashared_airports_version(), await aflights_version(center_airport.icao_code))
+    key = _flights_key(center_airport.icao_code, bucket, versions)
+    result = await cache.aget(key)
+    if result is None:
+        nearby = await sync_to_async(_nearby)(center_airport, bucket)
+        result = (nearby, await compute_flights(center_airport.icao_code, [airport['icao_code'] for airport, _ in nearby]))
+        await cache.aset(key, result, RESULT_CACHE_TIMEOUT)
+    return _within(result, radius_km)
+
+
+# versions - (аэропортов, рейсов центра): асинхронная версия читает их сама
+# через API кэша, без них они читаются синхронно
+def _flights_key(center_icao, bucket, versions=None):
+    airports, flights = versions or (_shared_airports_version(), flights_version(center_icao))
+    return f'radius:flights:{center_icao}:{bucket}:{airports}:{flights}'
+
+
+def _nearby(center_airport, bucket):
+    return find_airports_in_radius(
+        center_airport.latitude, center_airport.longitude, bucket, exclude=center_airport.icao_code
+    )
+
+
+# Результат для корзины радиуса -> результат для точного радиуса
+def _within(result, radius_km):
+    nearby, flights = result
+    nearby = [(airport, distance) for airport, distance in nearby if distance <= radius_km]
+    inside = {airport['icao_code'] for airport, _ in nearby}
+    flights = [
+        flight for flight in flights
+        if (flight['to_icao'] if flight['type'] == 'departure' else flight['from_icao']) in inside
+    ]
+    return nearby, flights
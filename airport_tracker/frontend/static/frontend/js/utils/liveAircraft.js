@@ -0,0 +1,43 @@
+// Подписка на позиции самолетов в области карты через /api/data/stream/ (SSE).
+// Сервер присылает сначала все самолеты области, затем только изменения,
+// здесь они собираются обратно в полный Map icao24 -> самолет.
+// bbox = [lamin, lomin, lamax, lomax]; onChange получает Map после каждого события.
+// Возвращает функцию отписки; при смене области нужно отписаться и подписаться заново.
+export function subscribeLiveAircraft(bbox, onChange, { callsign = '', limit = 5000 } = {}) {
+    const params = new URLSearchParams({
+        lamin: bbox[0], lomin: bbox[1], lamax: bbox[2], lomax: bbox[3], limit,
+    });
+    if (callsign) {
+        params.set('callsign', callsign);
+    }
+
+    const source = new EventSource(`/api/data/stream/?${params}`);
+    let fields = [];
+    let aircraft = new Map();
+
+    const toAircraft = (icao24, position) => {
+        const item = { icao24 };
+        fields.forEach((field, i) => { item[field] = position[i]; });
+        return item;
+    };
+
+    source.addEventListener('snapshot', (event) => {
+        const data = JSON.parse(event.data);
+        fields = data.fields;
+        aircraft = new Map(
+            Object.entries(data.aircraft).map(([icao24, position]) => [icao24, toAircraft(icao24, position)])
+        );
+        onChange(aircraft, data.time);
+    });
+
+    source.addEventListener('delta', (event) => {
+        const data = JSON.parse(event.data);
+        Object.entries(data.changed).forEach(([icao24, position]) => {
+            aircraft.set(icao24, toAircraft(icao24, position));
+        });
+        data.removed.forEach((icao24) => aircraft.delete(icao24));
+        onChange(aircraft, data.time);
+    });
+
+    return () => source.close();
+}
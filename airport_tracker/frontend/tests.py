@@ -1,6 +1,11 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
 from django.test import TestCase, Client
 from django.urls import reverse
-from flights.models import Airport
+from unittest.mock import patch
+from flights.models import Airport, Flight
 import json
 
 class BasicViewsTests(TestCase):
@@ -101,6 +106,241 @@ class BasicViewsTests(TestCase):
         self.assertFalse(data['success'])
 
 
+class KeysetPaginationTests(TestCase):
+    
+    def setUp(self):
+        for i in range(7):
+            Airport.objects.create(
+                name=f"Airport {i // 2}", icao_code=f"KP{i:02d}", latitude=0, longitude=0, city="", country=""
+            )
+    
+    def test_pages_forward_and_back(self):
+        # Проход вперед и назад по страницам, включая одинаковые названия
+        from frontend.pagination import keyset_page
+        airports = Airport.objects.all()
+        
+        first = keyset_page(airports, per_page=3)
+        second = keyset_page(airports, first.next_cursor, per_page=3)
+        third = keyset_page(airports, second.next_cursor, per_page=3)
+        self.assertEqual([a.icao_code for a in first], ['KP00', 'KP01', 'KP02'])
+        self.assertEqual([a.icao_code for a in second], ['KP03', 'KP04', 'KP05'])
+        self.assertEqual([a.icao_code for a in third], ['KP06'])
+        self.assertFalse(third.has_next)
+        
+        back = keyset_page(airports, third.previous_cursor, per_page=3)
+        self.assertEqual([a.icao_code for a in back], ['KP03', 'KP04', 'KP05'])
+        self.assertTrue(back.has_previous)
+        back = keyset_page(airports, back.previous_cursor, per_page=3)
+        self.assertFalse(back.has_previous)
+    
+    def test_descending_and_annotated_ordering(self):
+        # Поле с '-' и аннотация (как search_rank у поиска) в порядке страниц
+        from django.db.models import F
+        from frontend.pagination import keyset_page
+        airports = Airport.objects.annotate(rank=F('latitude') - 1)
+        ordering = ('-rank', 'icao_code')
+        Airport.objects.filter(icao_code__in=['KP01', 'KP04']).update(latitude=5)
+        
+        pages = [keyset_page(airports, per_page=3, ordering=ordering)]
+        while pages[-1].has_next:
+            pages.append(keyset_page(airports, pages[-1].next_cursor, per_page=3, ordering=ordering))
+        self.assertEqual(
+            [a.icao_code for page in pages for a in page],
+            ['KP01', 'KP04', 'KP00', 'KP02', 'KP03', 'KP05', 'KP06']
+        )
+        back = keyset_page(airports, pages[-1].previous_cursor, per_page=3, ordering=ordering)
+        self.assertEqual([a.icao_code for a in back], ['KP02', 'KP03', 'KP05'])
+        # Курсор с другим числом полей не подходит - первая страница
+        self.assertFalse(keyset_page(airports, pages[1].next_cursor, per_page=3, ordering=('-rank', 'name', 'icao_code')).has_previous)
+    
+    def test_invalid_cursor_returns_first_page(self):
+        response = self.client.get('/all_airports/?cursor=garbage')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 7)
+
+
+class FlightsWithRadiusTests(TestCase):
+    
+    def setUp(self):
+        Airport.objects.create(icao_code='UUEE', name='Sheremetyevo', city='Moscow', country='RU', latitude=55.97, longitude=37.41)
+        Airport.objects.create(icao_code='UUWW', name='Vnukovo', city='Moscow', country='RU', latitude=55.60, longitude=37.27)
+        Airport.objects.create(icao_code='ULLI', name='Pulkovo', city='Saint Petersburg', country='RU', latitude=59.80, longitude=30.26)
+        Flight.objects.create(callsign='SU1', icao24='aaa001', departure_airport_id='UUEE', arrival_airport_id='UUWW')
+        Flight.objects.create(callsign='SU2', icao24='aaa002', departure_airport_id='UUWW', arrival_airport_id='UUEE')
+        Flight.objects.create(callsign='SU3', icao24='aaa003', departure_airport_id='UUEE', arrival_airport_id='ULLI')
+    
+    def test_only_flights_to_airports_in_radius(self):
+        from frontend.views import flights_between
+        
+        response = self.client.get('/api/flights-with-radius/', {'center_icao': 'UUEE', 'radius': 100})
+        data = json.loads(response.content)
+        self.assertEqual(sorted((f['callsign'], f['type']) for f in data['flights']), [('SU1', 'departure'), ('SU2', 'arrival')])
+        
+        # Большой список аэропортов фильтруется по множеству - результат тот же
+        with self.assertNumQueries(1):
+            flights = flights_between('UUEE', ['UUWW'] + [f'X{i:04d}' for i in range(2000)])
+        self.assertEqual(sorted(f['callsign'] for f in flights), ['SU1', 'SU2'])
+
+
+class RadiusCacheTests(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        Airport.objects.create(icao_code='UUEE', name='Sheremetyevo', city='Moscow', country='RU', latitude=55.97, longitude=37.41)
+        Airport.objects.create(icao_code='UUWW', name='Vnukovo', city='Moscow', country='RU', latitude=55.60, longitude=37.27)
+        Airport.objects.create(icao_code='UUDD', name='Domodedovo', city='Moscow', country='RU', latitude=55.41, longitude=37.90)
+        Flight.objects.create(callsign='SU1', icao24='aaa001', departure_airport_id='UUEE', arrival_airport_id='UUWW')
+        Flight.objects.create(callsign='SU2', icao24='aaa002', departure_airport_id='UUEE', arrival_airport_id='UUDD')
+    
+    def flights(self, radius):
+        data = self.client.get('/api/flights-with-radius/', {'center_icao': 'UUEE', 'radius': radius}).json()
+        return sorted(f['callsign'] for f in data['flights'])
+    
+    def test_repeated_requests_are_served_from_cache(self):
+        self.assertEqual(self.flights(70), ['SU1', 'SU2'])
+        # Та же корзина радиуса: без запросов к БД, точный радиус отфильтрован из кэша
+        with self.assertNumQueries(0):
+            self.assertEqual(self.flights(90), ['SU1', 'SU2'])
+            self.assertEqual(self.flights(60), ['SU1'])
+    
+    def test_import_invalidates_center_airport(self):
+        from flights.management.ingest import FlightWriter
+        
+        self.assertEqual(self.flights(100), ['SU1', 'SU2'])
+        # Версия рейсов меняется после коммита транзакции импорта
+        with self.captureOnCommitCallbacks(execute=True):
+            FlightWriter().write([{
+                'callsign': 'SU3', 'icao24': 'aaa003', 'departure_airport_id': 'UUDD', 'arrival_airport_id': 'UUEE',
+                'first_seen': None, 'last_seen': None, 'duration_minutes': 0, 'opensky_data': {},
+            }])
+        self.assertEqual(self.flights(100), ['SU1', 'SU2', 'SU3'])
+
+
+class RadiusResponseFormatTests(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        Airport.objects.create(icao_code='UUEE', name='Sheremetyevo', city='Moscow', country='RU', latitude=55.97, longitude=37.41)
+        Airport.objects.create(icao_code='UUWW', name='Vnukovo', city='Moscow', country='RU', latitude=55.60, longitude=37.27)
+        Airport.objects.create(icao_code='UUDD', name='Domodedovo', city='Moscow', country='RU', latitude=55.41, longitude=37.90)
+        Flight.objects.create(callsign='SU1', icao24='aaa001', departure_airport_id='UUEE', arrival_airport_id='UUWW')
+        Flight.objects.create(callsign='SU2', icao24='aaa002', departure_airport_id='UUDD', arrival_airport_id='UUEE')
+    
+    def get(self, headers=None, **params):
+        return self.client.get('/api/flights-with-radius/', {'center_icao': 'UUEE', 'radius': 100, **params}, headers=headers)
+    
+    def test_compact_format_references_airports_by_index(self):
+        response = self.get(compact=1)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        data = response.json()
+        airports = data['airports_in_radius']
+        flights = data['flights']
+        icao = airports['fields'].index('icao')
+        by_callsign = {row[0]: dict(zip(flights['fields'], row)) for row in flights['rows']}
+        self.assertEqual(airports['rows'][by_callsign['SU1']['airport']][icao], 'UUWW')
+        self.assertEqual(airports['rows'][by_callsign['SU2']['airport']][icao], 'UUDD')
+        self.assertEqual(by_callsign['SU2']['type'], 'arrival')
+    
+    def test_fields_projection(self):
+        data = self.get(fields='airports_in_radius.icao,flights.callsign,statistics').json()
+        self.assertEqual(set(data), {'success', 'airports_in_radius', 'flights', 'statistics'})
+        self.assertEqual(sorted(a['icao'] for a in data['airports_in_radius']), ['UUDD', 'UUWW'])
+        self.assertEqual(sorted(f['callsign'] for f in data['flights']), ['SU1', 'SU2'])
+        self.assertEqual(set(data['flights'][0]), {'callsign'})
+        self.assertEqual(data['statistics']['total_flights'], 2)
+    
+    def test_gzip_when_accepted(self):
+        import gzip
+        from flights import responses
+        
+        plain = self.get()
+        with patch.object(responses, 'GZIP_MIN_SIZE', 0):
+            compressed = self.get(headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(compressed['Content-Type'], 'application/json')
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(compressed.content)), plain.json())
+        self.assertFalse(plain.has_header('Content-Encoding'))
+
+
+class AsyncOnlyCache:
+    # В потоке цикла событий разрешены только асинхронные методы кэша:
+    # синхронные блокировали бы цикл. В пуле потоков (sync_to_async) - любые
+    ASYNC_METHODS = {'aget', 'aadd', 'aset', 'adelete', 'aget_many', 'aset_many'}
+
+    def __getattr__(self, name):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return getattr(cache, name)
+        if name not in self.ASYNC_METHODS:
+            raise AssertionError(f'синхронный cache.{name} в корутине')
+        return getattr(cache, name)
+
+
+class AsyncViewsTests(TestCase):
+    
+    def setUp(self):
+        cache.clear()
+        Airport.objects.create(icao_code='Z000', name='Sheremetyevo', city='Moscow', country='RU', latitude=55.97, longitude=37.41)
+        Airport.objects.create(icao_code='Z001', name='Vnukovo', city='Moscow', country='RU', latitude=55.60, longitude=37.27)
+        Flight.objects.create(callsign='SU1', icao24='aaa001', departure_airport_id='Z000', arrival_airport_id='Z001')
+    
+    async def test_flights_with_radius_matches_sync(self):
+        params = {'center_icao': 'Z000', 'radius': 100}
+        response = await self.async_client.get('/api/async/flights-with-radius/', params)
+        data = response.json()
+        self.assertEqual([f['callsign'] for f in data['flights']], ['SU1'])
+        await sync_to_async(cache.clear)()
+        expected = await sync_to_async(self.client.get)('/api/flights-with-radius/', params)
+        self.assertEqual(data, expected.json())
+        
+        response = await self.async_client.get('/api/async/flights-with-radius/', {'center_icao': 'XXXX'})
+        self.assertEqual(response.status_code, 404)
+    
+    async def test_autocomplete_matches_sync(self):
+        response = await self.async_client.get('/api/async/airport-autocomplete/', {'q': 'vnuk'})
+        expected = await sync_to_async(self.client.get)('/api/airport-autocomplete/', {'q': 'vnuk'})
+        self.assertEqual(response.json(), expected.json())
+        self.assertEqual(response.json()['results'][0]['icao'], 'Z001')
+    
+    async def test_flights_for_airport_from_opensky(self):
+        from flights.management.opensky_standin import OpenSkyStandin, StandinConfig
+        
+        from frontend.views import async_opensky_service
+        
+        with OpenSkyStandin(StandinConfig(flights=20, airports=['Z000', 'Z001'])) as standin:
+            with self.settings(OPENSKY_BASE_URL=standin.base_url):
+                response = await self.async_client.get('/api/async/flights/', {'icao': 'Z000', 'radius': 100})
+                service = async_opensky_service()
+                self.assertEqual(service.base_url, standin.base_url)
+                await service.aclose()
+        data = response.json()
+        self.assertEqual(data['total'], 20)
+        self.assertTrue(all('Z001' in (f['from_icao'], f['to_icao']) for f in data['flights']))
+    
+    async def test_async_paths_use_async_cache_api(self):
+        from flights.management.opensky_service import OpenSkyService
+        from frontend import radius_cache, views
+        
+        service = OpenSkyService(username='', password='')
+        
+        async def fetch(airport_icao, hours=24):
+            return {'departures': [], 'arrivals': []}
+        
+        service.afetch_flights_by_airport = fetch
+        with patch('frontend.radius_cache.cache', AsyncOnlyCache()), \
+                patch('flights.versioning.cache', AsyncOnlyCache()), \
+                patch('flights.management.opensky_service.cache', AsyncOnlyCache()):
+            for _ in range(2):
+                center = await radius_cache.acenter_airport('Z000')
+                nearby, flights = await radius_cache.aflights_in_radius(center, 100, views.aflights_between)
+                data = await service.aget_flights_by_airport('Z000', hours=12)
+        self.assertEqual([airport['icao_code'] for airport, _ in nearby], ['Z001'])
+        self.assertEqual([f['callsign'] for f in flights], ['SU1'])
+        self.assertEqual(data, {'departures': [], 'arrivals': []})
+
+
 class URLPatternsTests(TestCase):
     #   Тесты URL паттернов
     
@@ -168,6 +408,29 @@ class ViewsErrorsTests(TestCase):
         # Эта функция не подключена в urls.py, поэтому должен быть 404
         self.assertEqual(response.status_code, 404)
     
+    def test_search_results_page(self):
+        # Поиск подключен в frontend/urls.py под /all_airports/
+        Airport.objects.create(
+            name="Search Airport", icao_code="SRCH", latitude=1.0, longitude=1.0, city="City", country="RU"
+        )
+        response = self.client.get('/all_airports/search/?search=search')
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'frontend/search_results.html')
+        self.assertEqual(response.context['total_results'], 1)
+    
+    def test_search_results_ranked(self):
+        # Результаты поиска по релевантности, а не по названию
+        from flights.search import get_search_backend
+        Airport.objects.create(name="Alpha Field", icao_code="RNK1", latitude=0, longitude=0, city="Moscow", country="RU")
+        Airport.objects.create(name="Moscow Domodedovo", icao_code="RNK2", latitude=0, longitude=0, city="Moscow", country="RU")
+        backend = get_search_backend()
+        
+        response = self.client.get('/all_airports/search/?search=moscow')
+        codes = [a.icao_code for a in response.context['page_obj']]
+        self.assertEqual(codes, [a.icao_code for a in backend.search('moscow')])
+        if backend.ordering('moscow')[0] != 'name':
+            self.assertEqual(codes, ['RNK2', 'RNK1'])
+    
     def test_airport_map_view(self):
         # Тест airport_map_view (есть в views, но нет в urls)
         response = self.client.get('/airport-map/')
@@ -180,7 +443,7 @@ class ModelsRequiredTests(TestCase):
     
     def test_haversine_distance(self):
         """Тест функции расчета расстояния"""
-        from frontend.views import haversine_distance
+        from flights.distance import haversine_distance
         
         # Расстояние до самой себя
         distance = haversine_distance(55.0, 37.0, 55.0, 37.0)
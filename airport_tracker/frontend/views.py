@@ -1,18 +1,33 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
-from django.core.paginator import Paginator
 from flights.models import Airport,Flight  
+from flights.autocomplete_index import get_autocomplete_index
+from flights.search import get_search_backend
+from flights.spatial_index import find_airports_in_radius
+from flights.management.opensky_service import OpenSkyService
+from flights.responses import json_response, parse_fields, project, to_columns
 from .forms import AirportSearchForm
+from . import radius_cache
+from .pagination import approximate_count, keyset_page
+from django.db.models import Q
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.conf import settings
 from django.core.cache import cache
 import logging
-import math
 
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
 logger = logging.getLogger(__name__)
 
+# Сколько аэропортов подставлять в IN (...), дальше фильтр по множеству
+MAX_IN_AIRPORTS = 1000
+
+# Поля аэропортов и рейсов в ответе compact=1, если не задан fields=
+COMPACT_AIRPORT_FIELDS = ('icao', 'name', 'latitude', 'longitude', 'city', 'country', 'distance_km')
+COMPACT_FLIGHT_FIELDS = ('callsign', 'type', 'airport', 'duration_min', 'icao24', 'source')
+
 
 def index(request):
     return render(request, 'frontend/index.html')
@@ -27,17 +42,16 @@ def howToUse(request):
 
 
 def available_airports(request):
-    airports_list = Airport.objects.all().order_by('name')
+    airports_list = Airport.objects.all()
     
     form=AirportSearchForm(request.GET or None)
 
-    paginator = Paginator(airports_list, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset-пагинация по (name, icao_code): страница N стоит как первая
+    page_obj = keyset_page(airports_list, request.GET.get('cursor'), per_page=20)
     
     return render(request, 'frontend/airports_list.html', {
         'page_obj': page_obj,
-        'total_airports': airports_list.count(),
+        'total_airports': approximate_count(airports_list, 'all'),
         'form':form
     })
 
@@ -61,35 +75,30 @@ def airport_map_view(request):
 def search_results(request):
     # Обрабатывает отправку формы поиска
     form = AirportSearchForm(request.GET)
+    query = ''
     
     if form.is_valid():
         query = form.cleaned_data['search'].strip()
-        
-        if query:
-            airports = Airport.objects.filter(
-                name__icontains=query
-            ) | Airport.objects.filter(
-                city__icontains=query
-            ) | Airport.objects.filter(
-                country__icontains=query.upper()
-            ) | Airport.objects.filter(
-                icao_code__icontains=query.upper()
-            )
-            airports = airports.distinct().order_by('name')
-        else:
-            airports = Airport.objects.all().order_by('name')
-    else:
-        airports = Airport.objects.all().order_by('name')
     
-    paginator = Paginator(airports, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    airports = Airport.objects.all()
+    ordering = ('name', 'icao_code')
+    results = airports
+    if query:
+        # Совпадения ищет поисковый индекс (FTS5 в SQLite, pg_trgm в PostgreSQL),
+        # результаты идут по релевантности, страницы - keyset по (ранг, ..., icao_code)
+        backend = get_search_backend()
+        airports = backend.filter(airports, query)
+        results = backend.search(query)
+        ordering = backend.ordering(query)
+    
+    page_obj = keyset_page(results, request.GET.get('cursor'), per_page=20, ordering=ordering)
     
-    return render(request, { ##после request стояло 'frontend/search_results.html',
+    return render(request, 'frontend/search_results.html', {
         'form': form,
         'page_obj': page_obj,
-        'query': query if 'query' in locals() else '',
-        'total_results': airports.count()
+        'query': query,
+        # Количество - без ранжирования, оно для подсчета не нужно
+        'total_results': approximate_count(airports, f'search:{query}')
     })
 
 
@@ -102,48 +111,26 @@ def autocomplete_airports(request):
     if len(query) < 2:
         return JsonResponse({'results': []})
     
-    airports = Airport.objects.filter(
-        name__icontains=query
-    ) | Airport.objects.filter(
-        city__icontains=query
-    ) | Airport.objects.filter(
-        country__icontains=query.upper()
-    ) 
-    
-    airports = airports.distinct()[:10]
+    # Индекс в памяти: точный код, затем начало слова, затем подстрока
+    airports = get_autocomplete_index().search(query, limit=10)
     
+    return JsonResponse({'results': autocomplete_results(airports)})
+
+
+def autocomplete_results(airports):
     results = []
     for airport in airports:
         results.append({
-            'id': airport.icao_code,
-            'text': f"{airport.name} ({airport.icao_code}) - {airport.city}, {airport.country}",
-            'name': airport.name,
-            'city': airport.city,
-            'country': airport.country,  # Две буквы: "RU", "US" и т.д.
-            'icao': airport.icao_code,
-            'longitude':airport.longitude,
-            'latitude':airport.latitude
+            'id': airport['icao_code'],
+            'text': f"{airport['name']} ({airport['icao_code']}) - {airport['city']}, {airport['country']}",
+            'name': airport['name'],
+            'city': airport['city'],
+            'country': airport['country'],  # Две буквы: "RU", "US" и т.д.
+            'icao': airport['icao_code'],
+            'longitude':airport['longitude'],
+            'latitude':airport['latitude']
         })
-    
-
-    return JsonResponse({'results': results})
-
-# Вычисляет расстояние между двумя точками на Земле в км
-def haversine_distance(lat1, lon1, lat2, lon2):
-    
-    R = 6371  # радиус Земли в км
-   
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
-    
-    a = (math.sin(delta_lat/2)**2 + 
-         math.cos(lat1_rad) * math.cos(lat2_rad) * 
-         math.sin(delta_lon/2)**2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    
-    return R * c
+    return results
 
 # Возвращает аэропорты в радиусе от заданной точки
 def airports_in_radius(request):
@@ -152,26 +139,22 @@ def airports_in_radius(request):
     lon = float(request.GET.get('lon'))
     radius = float(request.GET.get('radius'))
 
-    all_airports = Airport.objects.all()
-
     airports_in_radius = []
-    for airport in all_airports:
-        # Вычисляем расстояние
-        distance = haversine_distance(lat, lon,airport.latitude, airport.longitude)
-        
-        if distance <= radius:
-            airports_in_radius.append({
-                'name': airport.name,
-                'icao': airport.icao_code,
-                'iata': airport.iata_code,
-                'latitude': airport.latitude,
-                'longitude': airport.longitude,
-                'city': airport.city,
-                'country': airport.country,
-                'distance': round(distance, 2)
-            })
-
-    return JsonResponse({
+    # Расстояние считается только для аэропортов рядом с точкой (индекс или SQL-фильтр),
+    # повторные запросы с той же точкой и корзиной радиуса берутся из кэша
+    for airport, distance in radius_cache.airports_in_radius(lat, lon, radius):
+        airports_in_radius.append({
+            'name': airport['name'],
+            'icao': airport['icao_code'],
+            'iata': airport['iata_code'],
+            'latitude': airport['latitude'],
+            'longitude': airport['longitude'],
+            'city': airport['city'],
+            'country': airport['country'],
+            'distance': round(distance, 2)
+        })
+
+    return json_response(request, {
         'success': True,
         'count': len(airports_in_radius),
         'airports': airports_in_radius
@@ -193,7 +176,7 @@ def get_flights_for_airport(request):
         
         # Получаем центральный аэропорт
         try:
-            center_airport = Airport.objects.get(icao=airport_icao)
+            center_airport = Airport.objects.get(icao_code=airport_icao)
         except Airport.DoesNotExist:
             logger.info('апишка не раб')
             return JsonResponse({
@@ -202,52 +185,21 @@ def get_flights_for_airport(request):
             }, status=404)
         
         # Получаем аэропорты в радиусе
-        airports_in_radius = airports_in_radius(
-            center_airport.latitude,
-            center_airport.longitude,
-            radius
-        )
+        nearby_icao = {
+            airport['icao_code']
+            for airport, _ in find_airports_in_radius(
+                center_airport.latitude,
+                center_airport.longitude,
+                radius,
+                exclude=center_airport.icao_code
+            )
+        }
         
-        # Получаем рейсы из OpenSky
+        # Получаем рейсы из OpenSky (ответ кэшируется, см. OpenSkyService)
         opensky = OpenSkyService()
         opensky_data = opensky.get_flights_by_airport(airport_icao, hours=12)
         
-        flights = []
-        
-        if opensky_data:
-            # Фильтруем рейсы только к аэропортам в радиусе
-            for flight_type in ['arrivals', 'departures']:
-                for flight_data in opensky_data.get(flight_type, []):
-                    other_airport_icao = flight_data.get(
-                        'estArrivalAirport' if flight_type == 'departures' else 'estDepartureAirport'
-                    )
-                    
-                    # Проверяем, есть ли этот аэропорт в радиусе
-                    if other_airport_icao and any(
-                        a['icao'] == other_airport_icao for a in airports_in_radius
-                    ):
-                        flights.append({
-                            'callsign': flight_data.get('callsign', ''),
-                            'type': 'departure' if flight_type == 'departures' else 'arrival',
-                            'from_icao': center_airport.icao if flight_type == 'departures' else other_airport_icao,
-                            'to_icao': other_airport_icao if flight_type == 'departures' else center_airport.icao,
-                            'duration': flight_data.get('lastSeen', 0) - flight_data.get('firstSeen', 0),
-                            'icao24': flight_data.get('icao24', '')
-                        })
-        else:
-            logger.error('Пустой opensky-data!')
-        
-        return JsonResponse({
-            'success': True,
-            'airport': {
-                'icao': center_airport.icao,
-                'name': center_airport.name,
-                'city': center_airport.city,
-                'country': center_airport.country
-            },
-            'flights': flights,
-            'total': len(flights)
-        })
+        return JsonResponse(airport_flights_response(center_airport, opensky_data, nearby_icao))
         
     except Exception as e:
         logger.error(f"Ошибка в get_flights_for_airport: {e}")
@@ -257,6 +209,44 @@ def get_flights_for_airport(request):
         }, status=500)
 
 
+# Ответ get_flights_for_airport: рейсы OpenSky только к аэропортам nearby_icao
+def airport_flights_response(center_airport, opensky_data, nearby_icao):
+    flights = []
+    
+    if opensky_data:
+        # Фильтруем рейсы только к аэропортам в радиусе
+        for flight_type in ['arrivals', 'departures']:
+            for flight_data in opensky_data.get(flight_type, []):
+                other_airport_icao = flight_data.get(
+                    'estArrivalAirport' if flight_type == 'departures' else 'estDepartureAirport'
+                )
+                
+                # Проверяем, есть ли этот аэропорт в радиусе
+                if other_airport_icao in nearby_icao:
+                    flights.append({
+                        'callsign': flight_data.get('callsign', ''),
+                        'type': 'departure' if flight_type == 'departures' else 'arrival',
+                        'from_icao': center_airport.icao_code if flight_type == 'departures' else other_airport_icao,
+                        'to_icao': other_airport_icao if flight_type == 'departures' else center_airport.icao_code,
+                        'duration': flight_data.get('lastSeen', 0) - flight_data.get('firstSeen', 0),
+                        'icao24': flight_data.get('icao24', '')
+                    })
+    else:
+        logger.error('Пустой opensky-data!')
+    
+    return {
+        'success': True,
+        'airport': {
+            'icao': center_airport.icao_code,
+            'name': center_airport.name,
+            'city': center_airport.city,
+            'country': center_airport.country
+        },
+        'flights': flights,
+        'total': len(flights)
+    }
+
+
  # API для получения рейсов между центральным аэропортом и аэропортами в радиусе
 @csrf_exempt
 @api_view(['GET'])
@@ -267,8 +257,6 @@ def get_flights_with_radius(request):
         center_icao = request.GET.get('center_icao', '').upper()
         radius_km = float(request.GET.get('radius', 500))
         
-        print(f"Запрос рейсов: center={center_icao}, radius={radius_km}km", flush=True)
-        
         if not center_icao:
             return JsonResponse({
                 'success': False,
@@ -276,121 +264,19 @@ def get_flights_with_radius(request):
             }, status=400)
         
         # 1. Находим центральный аэропорт
-        try:
-            center_airport = Airport.objects.get(icao_code=center_icao)
-        except Airport.DoesNotExist:
+        center_airport = radius_cache.center_airport(center_icao)
+        if center_airport is None:
             return JsonResponse({
                 'success': False,
                 'error': f'Аэропорт {center_icao} не найден'
             }, status=404)
          
-        # 2. Находим все аэропорты в радиусе
-        airports_in_radius_list = []
-        
-        all_airports = Airport.objects.exclude(icao_code=center_icao)
-        # print(f"{len(all_airports)}", flush=True)
-        for airport in all_airports:
-            distance = haversine_distance(
-                center_airport.latitude, 
-                center_airport.longitude, 
-                airport.latitude, 
-                airport.longitude
-            )
-            if distance <= radius_km:
-                # print(f"{airport.icao_code}", flush=True)
-                airports_in_radius_list.append({
-                    'icao': airport.icao_code,
-                    'name': airport.name,
-                    'latitude': airport.latitude,
-                    'longitude': airport.longitude,
-                    'city': airport.city,
-                    'country': airport.country,
-                    'distance_km': round(distance, 2)
-                })
-        print(f"Аэропорты в радиусе:{len(airports_in_radius_list)}", flush=True)
-        # 3. Получаем рейсы из БД для центрального аэропорта
-        flights_from_db = []
-        
-        # Рейсы ИЗ центрального аэропорта
-        departure_flights = Flight.objects.filter(departure_airport__icao_code=center_icao).select_related('arrival_airport')
-        print(f"Рейсы в из центрального аэропорта:{len(departure_flights)}", flush=True)
-        
-        for flight in departure_flights:
-            # Проверяем, находится ли аэропорт назначения в радиусе
-            dest_in_radius = any(
-                a['icao'] == flight.arrival_airport.icao_code 
-                for a in airports_in_radius_list
-            )
-            
-            if dest_in_radius:
-                flights_from_db.append({
-                    'callsign': flight.callsign,
-                    'type': 'departure',
-                    'from_icao': center_icao,
-                    'to_icao': flight.arrival_airport.icao_code,
-                    'duration_min': flight.duration_minutes if hasattr(flight, 'duration_minutes') else 0,
-                    'source': 'database'
-                })
-                print('добавляю в flights_from_db',flush=True)
+        # 2-3. Аэропорты в радиусе и рейсы между ними и центральным аэропортом
+        # (одним запросом, см. flights_between); результат кэшируется, пока
+        # не изменятся аэропорты или рейсы центрального аэропорта
+        nearby, flights_from_db = radius_cache.flights_in_radius(center_airport, radius_km, flights_between)
         
-        # Рейсы В центральный аэропорт
-        arrival_flights = Flight.objects.filter(
-            arrival_airport__icao_code=center_icao
-        ).select_related('departure_airport')
-        
-        for flight in arrival_flights:
-            # Проверяем, находится ли аэропорт отправления в радиусе
-            origin_in_radius = any(
-                a['icao'] == flight.departure_airport.icao_code 
-                for a in airports_in_radius_list
-            )
-            
-            if origin_in_radius:
-                flights_from_db.append({
-                    'callsign': flight.callsign,
-                    'type': 'arrival',
-                    'from_icao': flight.departure_airport.icao_code,
-                    'to_icao': center_icao,
-                    'duration_min': flight.duration_minutes if hasattr(flight, 'duration_minutes') else 0,
-                    'source': 'database'
-                })
-        
-        # 4. Если в БД нет рейсов, используем тестовые данные
-        flights_data = []
-        print(f"Найдено {len(flights_from_db)} рейсов из БД", flush=True)
-        if flights_from_db:
-            flights_data = flights_from_db
-            logger.info(f"Найдено {len(flights_data)} рейсов из БД")
-            print(f"Найдено {len(flights_data)} рейсов из БД", flush=True)
-        else:
-            print('ГЕНЕРИРУЮ!',flush=True)
-            # Генерируем тестовые рейсы
-            flights_data = generate_mock_flights(
-                center_icao, 
-                airports_in_radius_list,
-                max_flights=min(30, len(airports_in_radius_list)) #тут можно менять количество минимального количеества генерируеймых рейсов
-            )
-            logger.info(f"Сгенерировано {len(flights_data)} тестовых рейсов")
-        
-        return JsonResponse({
-            'success': True,
-            'center_airport': {
-                'icao': center_airport.icao_code,
-                'name': center_airport.name,
-                'city': center_airport.city,
-                'country': center_airport.country,
-                'latitude': center_airport.latitude,
-                'longitude': center_airport.longitude
-            },
-            'airports_in_radius': airports_in_radius_list,
-            'flights': flights_data,
-            'statistics': {
-                'total_flights': len(flights_data),
-                'total_airports_in_radius': len(airports_in_radius_list),
-                'departures': len([f for f in flights_data if f['type'] == 'departure']),
-                'arrivals': len([f for f in flights_data if f['type'] == 'arrival'])
-            }
-        })
+        return radius_result(request, center_airport, nearby, flights_from_db)
         
     except Exception as e:
         logger.error(f"Ошибка в get_flights_with_radius: {str(e)}")
@@ -402,6 +288,141 @@ def get_flights_with_radius(request):
             'error': str(e)
         }, status=500)
 
+
+# Ответ get_flights_with_radius по результату radius_cache.flights_in_radius
+def radius_result(request, center_airport, nearby, flights_from_db):
+    airports_in_radius_list = []
+    for airport, distance in nearby:
+        airports_in_radius_list.append({
+            'icao': airport['icao_code'],
+            'name': airport['name'],
+            'latitude': airport['latitude'],
+            'longitude': airport['longitude'],
+            'city': airport['city'],
+            'country': airport['country'],
+            'distance_km': round(distance, 2)
+        })
+    # 4. Если в БД нет рейсов, используем тестовые данные
+    if flights_from_db:
+        flights_data = flights_from_db
+        logger.info(f"Найдено {len(flights_data)} рейсов из БД")
+    else:
+        # Генерируем тестовые рейсы
+        flights_data = generate_mock_flights(
+            center_airport.icao_code, 
+            airports_in_radius_list,
+            max_flights=min(30, len(airports_in_radius_list)) #тут можно менять количество минимального количеества генерируеймых рейсов
+        )
+        logger.info(f"Сгенерировано {len(flights_data)} тестовых рейсов")
+    
+    return radius_response(request, {
+        'icao': center_airport.icao_code,
+        'name': center_airport.name,
+        'city': center_airport.city,
+        'country': center_airport.country,
+        'latitude': center_airport.latitude,
+        'longitude': center_airport.longitude
+    }, airports_in_radius_list, flights_data)
+
+
+# Ответ get_flights_with_radius.
+# compact=1 - аэропорты и рейсы массивами с именами полей один раз,
+# рейс ссылается на аэропорт индексом в airports_in_radius (поле airport)
+# вместо from_icao/to_icao. fields= - разделы и поля ответа (см. parse_fields).
+# Кодирование orjson и gzip - в json_response
+def radius_response(request, center_airport, airports, flights):
+    statistics = {
+        'total_flights': len(flights),
+        'total_airports_in_radius': len(airports),
+        'departures': len([f for f in flights if f['type'] == 'departure']),
+        'arrivals': len([f for f in flights if f['type'] == 'arrival'])
+    }
+    fields = parse_fields(request.GET.get('fields'))
+    sections = fields or dict.fromkeys(('center_airport', 'airports_in_radius', 'flights', 'statistics'))
+    # Не format=: этот параметр у api_view занят выбором рендерера DRF
+    compact = request.GET.get('compact') in ('1', 'true')
+
+    data = {'success': True}
+    if 'center_airport' in sections:
+        data['center_airport'] = project([center_airport], sections['center_airport'])[0]
+
+    extra = {}
+    if compact and 'flights' in sections:
+        airport_index = {airport['icao']: i for i, airport in enumerate(airports)}
+        extra['airport'] = [
+            airport_index.get(flight['to_icao'] if flight['type'] == 'departure' else flight['from_icao'])
+            for flight in flights
+        ]
+
+    for section, rows, default_fields in (
+        ('airports_in_radius', airports, COMPACT_AIRPORT_FIELDS),
+        ('flights', flights, COMPACT_FLIGHT_FIELDS),
+    ):
+        if section not in sections:
+            continue
+        if compact:
+            data[section] = to_columns(rows, sections[section] or default_fields, extra)
+        else:
+            data[section] = project(rows, sections[section])
+
+    if 'statistics' in sections:
+        data['statistics'] = project([statistics], sections['statistics'])[0]
+    if compact:
+        data['compact'] = True
+    return json_response(request, data)
+
+
+# Рейсы из center_icao в аэропорты nearby_icao и обратно.
+# Один запрос с проекцией values_list; при большом радиусе список аэропортов
+# не подставляется в IN, а рейсы центра фильтруются по множеству в Python
+def flights_between(center_icao, nearby_icao):
+    if not nearby_icao:
+        return []
+
+    rows = flights_between_query(center_icao, nearby_icao).values_list(*FLIGHT_ROW_FIELDS)
+    return classify_flights(rows, center_icao, nearby_icao)
+
+
+# Поля рейса для classify_flights
+FLIGHT_ROW_FIELDS = ('callsign', 'departure_airport_id', 'arrival_airport_id', 'duration_minutes')
+
+
+def flights_between_query(center_icao, nearby_icao):
+    flights = Flight.objects.order_by('-last_seen')
+    if len(nearby_icao) <= MAX_IN_AIRPORTS:
+        flights = flights.filter(
+            Q(departure_airport_id=center_icao, arrival_airport_id__in=nearby_icao) |
+            Q(arrival_airport_id=center_icao, departure_airport_id__in=nearby_icao)
+        )
+    else:
+        flights = flights.filter(Q(departure_airport_id=center_icao) | Q(arrival_airport_id=center_icao))
+
+    return flights
+
+
+# Строки (callsign, откуда, куда, длительность) -> рейсы ответа; рейсы
+# не к аэропортам nearby_icao (при большом радиусе в запросе нет IN) отбрасываются
+def classify_flights(rows, center_icao, nearby_icao):
+    nearby = set(nearby_icao)
+    result = []
+    for callsign, from_icao, to_icao, duration_min in rows:
+        if from_icao == center_icao and to_icao in nearby:
+            flight_type = 'departure'
+        elif to_icao == center_icao and from_icao in nearby:
+            flight_type = 'arrival'
+        else:
+            continue
+        result.append({
+            'callsign': callsign,
+            'type': flight_type,
+            'from_icao': from_icao,
+            'to_icao': to_icao,
+            'duration_min': duration_min,
+            'source': 'database'
+        })
+    return result
+
+
 # Генерация тестовых рейсов
 def generate_mock_flights(center_icao, airports_in_radius, max_flights=5):
     flights = []
@@ -428,4 +449,106 @@ def generate_mock_flights(center_icao, airports_in_radius, max_flights=5):
             'source': 'mock'
         })
     
-    return flights
\ No newline at end of file
+    return flights
+
+# Async-версии API для ASGI (airport_tracker/asgi.py): пока ждут БД или OpenSky,
+# не занимают поток воркера. Ответы те же, что у синхронных версий
+@csrf_exempt
+async def autocomplete_airports_async(request):
+    query = request.GET.get('q', '').strip()
+    
+    if len(query) < 2:
+        return JsonResponse({'results': []})
+    
+    # Индекс строится из БД только при первом обращении или после изменения
+    # аэропортов, сам поиск идет в памяти
+    index = await sync_to_async(get_autocomplete_index)()
+    return JsonResponse({'results': autocomplete_results(index.search(query, limit=10))})
+
+
+# Один сервис на адрес API на процесс: async views переиспользуют его сессию
+# aiohttp (соединения с OpenSky) вместо новой на каждый запрос
+_async_opensky_services = {}
+
+
+def async_opensky_service():
+    base_url = getattr(settings, 'OPENSKY_BASE_URL', None)
+    service = _async_opensky_services.get(base_url)
+    if service is None:
+        service = _async_opensky_services[base_url] = OpenSkyService()
+    return service
+
+
+async def get_flights_for_airport_async(request):
+    try:
+        airport_icao = request.GET.get('icao')
+        radius = float(request.GET.get('radius', 500))
+        
+        if not airport_icao:
+            return JsonResponse({
+                'success': False,
+                'error': 'Не указан код аэропорта'
+            }, status=400)
+        
+        center_airport = await Airport.objects.filter(icao_code=airport_icao).afirst()
+        if center_airport is None:
+            return JsonResponse({
+                'success': False,
+                'error': 'Аэропорт не найден'
+            }, status=404)
+        
+        nearby = await sync_to_async(find_airports_in_radius)(
+            center_airport.latitude, center_airport.longitude, radius, exclude=center_airport.icao_code
+        )
+        # Запрос к OpenSky через aiohttp, тот же кэш, что у синхронной версии
+        opensky_data = await async_opensky_service().aget_flights_by_airport(airport_icao, hours=12)
+        
+        return JsonResponse(airport_flights_response(
+            center_airport, opensky_data, {airport['icao_code'] for airport, _ in nearby}
+        ))
+        
+    except Exception as e:
+        logger.error(f"Ошибка в get_flights_for_airport_async: {e}")
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
+@csrf_exempt
+async def get_flights_with_radius_async(request):
+    try:
+        center_icao = request.GET.get('center_icao', '').upper()
+        radius_km = float(request.GET.get('radius', 500))
+        
+        if not center_icao:
+            return JsonResponse({
+                'success': False,
+                'error': 'Не указан центральный аэропорт'
+            }, status=400)
+        
+        center_airport = await radius_cache.acenter_airport(center_icao)
+        if center_airport is None:
+            return JsonResponse({
+                'success': False,
+                'error': f'Аэропорт {center_icao} не найден'
+            }, status=404)
+        
+        nearby, flights_from_db = await radius_cache.aflights_in_radius(center_airport, radius_km, aflights_between)
+        return radius_result(request, center_airport, nearby, flights_from_db)
+        
+    except Exception as e:
+        logger.error(f"Ошибка в get_flights_with_radius_async: {e}")
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
+# flights_between через async ORM
+async def aflights_between(center_icao, nearby_icao):
+    if not nearby_icao:
+        return []
+
+    rows = [row async for row in flights_between_query(center_icao, nearby_icao).values_list(*FLIGHT_ROW_FIELDS)]
+    return classify_flights(rows, center_icao, nearby_icao)